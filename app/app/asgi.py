@@ -3,14 +3,54 @@ ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests are routed through app.urls_asgi, which serves the recipe API
+reads from a thread pool instead of Django's single sync thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+
+class AsyncRequest(ASGIRequest):
+    """ASGI request resolved against the async URLconf."""
+    urlconf = 'app.urls_asgi'
+
+
+class AsyncHandler(ASGIHandler):
+    """ASGI handler creating AsyncRequest objects.
+
+    Bodies streamed from the recipe read pool are sent chunk by chunk as
+    they are read, which Django 3.2 cannot do for async iterators.
+    """
+    request_class = AsyncRequest
+
+    async def send_response(self, response, send):
+        content = getattr(response, 'async_streaming_content', None)
+        if content is None:
+            return await super().send_response(response, send)
+
+        async def send_streamed(message):
+            if (message['type'] == 'http.response.body'
+                    and not message.get('more_body')):
+                async for part in content:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            await send(message)
+
+        response.streaming_content = ()
+        await super().send_response(response, send_streamed)
+
+
+django.setup(set_prefix=False)
+application = AsyncHandler()
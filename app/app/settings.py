@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -46,7 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.tracing.TracingMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,15 +84,142 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections come from a per-process pool (core.db) shared by the WSGI
+# and ASGI request threads; DB_POOL_ENABLED=0 restores one connection per
+# request. Sizes are per worker process, which opens min_size connections
+# on its first query.
+DB_POOL_ENABLED = os.environ.get('DB_POOL_ENABLED', '1') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'core.db' if DB_POOL_ENABLED
+            else 'django.db.backends.postgresql'
+        ),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASSWORD')
+        'PASSWORD': os.environ.get('DB_PASSWORD'),
+        'POOL': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'max_lifetime': float(
+                os.environ.get('DB_POOL_MAX_LIFETIME', 3600)
+            ),
+            'check_interval': float(
+                os.environ.get('DB_POOL_CHECK_INTERVAL', 10)
+            ),
+        },
+    }
+}
+
+# Read replicas, as comma separated HOST or HOST:PORT entries, each added as
+# a replicaN alias with the default database's other settings. Safe reads
+# of the core models go to a replica unless the user wrote within the last
+# STICKY_SECONDS, as recorded in the shared cache; see core.db.router.
+DB_REPLICA_HOSTS = [
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host
+]
+
+for number, replica in enumerate(DB_REPLICA_HOSTS, 1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_REPLICAS = {
+    'ALIASES': [f'replica{n}' for n in range(1, len(DB_REPLICA_HOSTS) + 1)],
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5)),
+    'CACHE': os.environ.get('DB_REPLICA_STICKY_CACHE', 'shared'),
+}
+
+DATABASE_ROUTERS = ['core.db.router.ReplicaRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Per-user API responses, keyed on the user's data version in the
+    # database, so entries never go stale even when each process keeps its
+    # own. Local memory evicts least recently used entries past
+    # MAX_ENTRIES; point the backend at a shared cache (e.g. a Redis
+    # backend) to share entries and locks between processes.
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000)
+            ),
+        },
+    },
+    # State every process must see: token revocations and read-your-writes
+    # pins. Local memory is only right for a single process; point it at a
+    # shared backend (e.g. memcached) when running several.
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'shared'),
+    },
+}
+
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1',
+    'ALIAS': 'responses',
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+    'LOCK_TIMEOUT': 5,
+    'POLL_INTERVAL': 0.05,
+}
+
+
+# Signed tokens (see user.authentication), verified without database
+# queries. Revocations are read from a shared cache; revoking all of a
+# user's tokens is also stored on the user row, which is read again when
+# its cache entry is missing.
+
+SIGNED_TOKENS = {
+    'ACCESS_LIFETIME': int(os.environ.get('ACCESS_TOKEN_LIFETIME', 300)),
+    'REFRESH_LIFETIME': int(
+        os.environ.get('REFRESH_TOKEN_LIFETIME', 7 * 24 * 60 * 60)
+    ),
+    'REVOCATION_CACHE': os.environ.get('SIGNED_TOKENS_CACHE', 'shared'),
 }
+# Under ASGI the recipe API reads run on this many threads, each holding
+# its own database connection, instead of Django's single sync thread.
+ASYNC_READS = {
+    'THREADS': int(os.environ.get('ASYNC_READ_THREADS', 16)),
+}
+
+# Password hashing runs in a pool of worker processes so login storms do
+# not block request threads. MAX_PENDING bounds queued plus running hashes;
+# beyond it requests get a 503 with Retry-After. WORKERS=0 hashes inline.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 2)),
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 16)),
+    'ITERATIONS': int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000)),
+    'RETRY_AFTER': 1,
+}
+
+PASSWORD_HASHERS = [
+    'core.hashing.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
 
 
 # Password validation
@@ -141,6 +273,55 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.profiling.JSONRenderer',
+        'core.profiling.BrowsableAPIRenderer',
+    ],
+}
+
+# Fraction of requests profiled by core.profiling.ProfilingMiddleware, and
+# whether they get a Server-Timing header besides the log line.
+PROFILING = {
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01)),
+    'HEADER': os.environ.get('PROFILING_HEADER', '1') == '1',
+}
+
+# Recipe API queries slower than THRESHOLD_MS are logged on
+# core.slow_queries with their EXPLAIN plan; see `manage.py slow_queries`.
+SLOW_QUERIES = {
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200)),
+    'EXPLAIN': os.environ.get('SLOW_QUERY_EXPLAIN', '1') == '1',
+    'MAX_PENDING': 32,
+}
+
+# Request tracing by core.tracing.TracingMiddleware. Sampled traces are
+# appended as OTLP/JSON lines to FILE, or POSTed to an OTLP/HTTP ENDPOINT
+# such as http://collector:4318/v1/traces when EXPORTER is 'otlp'.
+TRACING = {
+    'ENABLED': os.environ.get('TRACING_ENABLED', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('TRACING_SAMPLE_RATE', 0.01)),
+    'EXPORTER': os.environ.get('TRACING_EXPORTER', 'file'),
+    'FILE': os.environ.get('TRACING_FILE', '/tmp/traces.jsonl'),
+    'ENDPOINT': os.environ.get(
+        'TRACING_ENDPOINT', 'http://localhost:4318/v1/traces'
+    ),
+    'TIMEOUT': 5,
+    'SERVICE_NAME': os.environ.get('TRACING_SERVICE_NAME', 'recipe-api'),
+    'MAX_SPANS': 1000,
+    'MAX_PENDING': 64,
+}
+
+# Prometheus metrics served at /metrics. Under multi-process servers set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers.
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', '0') == '1',
+}
+
+# Bulk recipe imports: rows validated and written per batch, and failed
+# rows reported back with their errors.
+RECIPE_IMPORT = {
+    'BATCH_SIZE': int(os.environ.get('RECIPE_IMPORT_BATCH_SIZE', 500)),
+    'MAX_ERRORS': 100,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -0,0 +1,17 @@
+"""app URL Configuration for the ASGI application
+
+The same routes as app.urls, except that the recipe API is served by the
+async views from recipe.urls.async_urlpatterns.
+"""
+from django.urls import path, include
+
+from app.urls import urlpatterns as wsgi_urlpatterns
+from recipe.urls import app_name, async_urlpatterns
+
+RECIPE_PREFIX = 'api/recipes/'
+
+urlpatterns = [
+    path(RECIPE_PREFIX, include((async_urlpatterns, app_name)))
+    if str(pattern.pattern) == RECIPE_PREFIX else pattern
+    for pattern in wsgi_urlpatterns
+]
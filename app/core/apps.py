@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from core.metrics import install_query_counter
+        from core.profiling import install_query_recorder
+        from core.slow_queries import install_slow_query_log
+        from core.tracing import install_query_tracer
+
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(install_query_counter)
+        connection_created.connect(install_slow_query_log)
+        connection_created.connect(install_query_tracer)
@@ -0,0 +1,54 @@
+"""
+PostgreSQL backend that takes its connections from a per-process pool.
+
+Use it as the ENGINE, with the pool configured by the POOL key of the
+database settings. Django's CONN_MAX_AGE should stay 0: the pool keeps
+connections open between requests, and closing returns them to the pool.
+"""
+from django.db.backends.postgresql import base, creation
+
+from core.db import pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Creation that closes pooled connections before dropping a database."""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        pool.close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection wrapper backed by a ConnectionPool."""
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def get_new_connection(self, conn_params):
+        key = tuple(sorted((k, str(v)) for k, v in conn_params.items()))
+        self.pool = pool.get_pool(
+            conn_params.get('database'),
+            key,
+            self.settings_dict.get('POOL', {}),
+        )
+
+        def connect():
+            return super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+
+        connection = self.pool.checkout(connect)
+        # Opens the pool's min_size connections on its first use.
+        self.pool.prewarm(connect)
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.checkin(self.connection)
@@ -0,0 +1,281 @@
+"""
+Process-wide pool of Postgres connections shared by all request threads.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from core.metrics import DB_POOL_CONNECTIONS, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pools = {}
+
+
+class PoolTimeout(OperationalError):
+    """No connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of connections with health checks and idle reaping.
+
+    Idle connections are reused most-recently-used first, so the ones left
+    unused age out and are closed after ``max_idle`` seconds, never going
+    below ``min_size`` open connections; prewarm() opens that many up
+    front. A connection idle for longer than ``check_interval`` seconds is
+    pinged before it is handed out.
+
+    The in-use and idle counts, checkout waits and timeouts are exported
+    as the db_pool_* metrics of core.metrics.
+    """
+
+    def __init__(self, name, min_size=0, max_size=20, timeout=10.0,
+                 max_idle=300.0, max_lifetime=3600.0, check_interval=10.0):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.closed = False
+        self._cond = threading.Condition()
+        self._idle = collections.deque()
+        self._created = {}
+        self._size = 0
+        self._waiting = 0
+        self._prewarmed = False
+        self._counters = collections.Counter()
+
+    def _export(self):
+        """Update the connection gauges; call with the lock held."""
+        idle = len(self._idle)
+        DB_POOL_CONNECTIONS.labels(self.name, 'idle').set(idle)
+        DB_POOL_CONNECTIONS.labels(self.name, 'in_use').set(self._size - idle)
+
+    def _discard(self, conn):
+        """Close ``conn`` and free its slot; call with the lock held."""
+        self._created.pop(id(conn), None)
+        self._size -= 1
+        self._counters['closed'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._cond.notify()
+        self._export()
+
+    def _reap(self, now):
+        """Close idle connections past max_idle, keeping min_size open."""
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][1] > self.max_idle):
+            conn, last_used = self._idle.popleft()
+            self._counters['reaped'] += 1
+            self._discard(conn)
+
+    def _is_healthy(self, conn, last_used, now):
+        if conn.closed:
+            return False
+        if now - self._created.get(id(conn), now) > self.max_lifetime:
+            return False
+        if now - last_used <= self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+
+        return True
+
+    def _acquire(self, start, deadline):
+        """Take an idle connection or a free slot, waiting for either.
+
+        Returns ``(conn, last_used)``, or ``(None, None)`` when the caller
+        should open a new connection in the slot it was given.
+        """
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._reap(now)
+                if self._idle or self._size < self.max_size:
+                    break
+                if now >= deadline:
+                    self._counters['timeouts'] += 1
+                    DB_POOL_TIMEOUTS.labels(self.name).inc()
+                    raise PoolTimeout(
+                        f'No connection available in pool {self.name!r} '
+                        f'after {self.timeout}s ({self.max_size} in use).'
+                    )
+                if not waited:
+                    waited = True
+                    self._counters['waits'] += 1
+                self._waiting += 1
+                try:
+                    self._cond.wait(deadline - now)
+                finally:
+                    self._waiting -= 1
+            if waited:
+                self._counters['wait_ms'] += int((now - start) * 1000)
+            DB_POOL_WAIT.labels(self.name).observe(
+                now - start if waited else 0
+            )
+            self._counters['checkouts'] += 1
+            if self._idle:
+                idle = self._idle.pop()
+            else:
+                idle = None, None
+                self._size += 1
+            self._export()
+
+            return idle
+
+    def checkout(self, connect):
+        """Return an idle connection, or a new one made by ``connect()``.
+
+        Waits up to ``timeout`` seconds when all ``max_size`` connections
+        are in use, then raises PoolTimeout.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            conn, last_used = self._acquire(start, deadline)
+            if conn is None:
+                break
+            # Ping outside the lock so a slow check does not stall others.
+            if self._is_healthy(conn, last_used, time.monotonic()):
+                return conn
+            with self._cond:
+                self._counters['health_check_failures'] += 1
+                self._discard(conn)
+
+        try:
+            conn = connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+                self._export()
+            raise
+        with self._cond:
+            self._created[id(conn)] = time.monotonic()
+            self._counters['created'] += 1
+
+        return conn
+
+    def prewarm(self, connect):
+        """Open idle connections with ``connect()`` up to ``min_size``.
+
+        Only the first call does anything. A failed connect is logged and
+        left to the checkouts to retry.
+        """
+        with self._cond:
+            if self._prewarmed:
+                return
+            self._prewarmed = True
+        while True:
+            with self._cond:
+                if self.closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = connect()
+            except Exception:
+                logger.warning(
+                    'Could not prewarm pool %r.', self.name, exc_info=True
+                )
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return
+            now = time.monotonic()
+            with self._cond:
+                self._created[id(conn)] = now
+                self._counters['created'] += 1
+                self._idle.appendleft((conn, now))
+                self._cond.notify()
+                self._export()
+
+    def checkin(self, conn):
+        """Return ``conn`` to the pool, rolling back any open transaction."""
+        reusable = not self.closed and not conn.closed
+        status = conn.info.transaction_status if reusable else None
+        if reusable and status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        with self._cond:
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                self._export()
+            else:
+                self._discard(conn)
+
+    def close(self):
+        """Close idle connections; in-use ones close when checked in."""
+        with self._cond:
+            self.closed = True
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        """Return the pool's size, saturation and lifetime counters."""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **{
+                    key: self._counters[key] for key in (
+                        'checkouts', 'created', 'closed', 'reaped',
+                        'health_check_failures', 'waits', 'wait_ms',
+                        'timeouts',
+                    )
+                },
+            }
+
+
+def get_pool(name, key, options):
+    """Return this process's pool for ``key``, creating it from ``options``.
+
+    Pools are per process, so forked workers never share connections.
+    """
+    key = (os.getpid(), key)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(name, **options)
+            logger.debug('Created connection pool %r: %s', name, options)
+
+    return pool
+
+
+def close_pools(name=None):
+    """Close and forget this process's pools, or only those for ``name``."""
+    pid = os.getpid()
+    with _lock:
+        for key, pool in list(_pools.items()):
+            if key[0] == pid and name in (None, pool.name):
+                pool.close()
+                del _pools[key]
+
+
+def stats():
+    """Return the stats of every pool in this process, keyed by name."""
+    pid = os.getpid()
+    with _lock:
+        pools = [pool for key, pool in _pools.items() if key[0] == pid]
+
+    return {pool.name: pool.stats() for pool in pools}
@@ -0,0 +1,156 @@
+"""
+Route safe reads of the recipe models to read replicas.
+
+After a successful write the user's reads are pinned to the primary for
+a few seconds, so they see their own writes whichever process serves the
+next request. The pin is kept in a shared cache keyed by the user, and
+also set as a signed cookie for clients that keep cookies.
+"""
+import asyncio
+import contextvars
+import random
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.core import signing
+from django.core.cache import caches
+from django.utils.functional import LazyObject
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Apps whose models may be read from a replica: users, recipes, tags and
+# ingredients. Tokens and sessions always come from the primary, so a
+# fresh login is never missing on a lagging replica.
+REPLICATED_APPS = {'core'}
+
+STICKY_COOKIE = 'db_sticky'
+_STICKY_SALT = 'core.db.router.sticky'
+
+_current = contextvars.ContextVar('replica_routing', default=None)
+
+
+def _sticky_key(user):
+    return f'db-sticky:{user.pk}'
+
+
+def _request_user(request):
+    """Return the authenticated user, without evaluating lazy ones."""
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, LazyObject):
+        return None
+
+    return user if user.is_authenticated else None
+
+
+def mark_sticky(response, user):
+    """Pin ``user``'s reads to the primary for the sticky window."""
+    config = settings.DATABASE_REPLICAS
+    seconds = config['STICKY_SECONDS']
+    caches[config['CACHE']].set(_sticky_key(user), True, timeout=seconds)
+    response.set_signed_cookie(
+        STICKY_COOKIE, str(user.pk), salt=_STICKY_SALT, max_age=seconds,
+        httponly=True, samesite='Lax',
+    )
+
+
+def is_sticky(request, user):
+    """Return whether ``user``'s reads are pinned to the primary."""
+    config = settings.DATABASE_REPLICAS
+    try:
+        pinned = request.get_signed_cookie(
+            STICKY_COOKIE, default=None, salt=_STICKY_SALT,
+            max_age=config['STICKY_SECONDS'],
+        )
+    except signing.BadSignature:
+        pinned = None
+    if pinned == str(user.pk):
+        return True
+
+    return bool(caches[config['CACHE']].get(_sticky_key(user)))
+
+
+class _Routing:
+    """Per-request routing decision, made at the first routed read."""
+
+    def __init__(self, request):
+        self.request = request
+        self.alias = None
+
+    def read_alias(self):
+        if self.alias is not None:
+            return self.alias
+        replicas = settings.DATABASE_REPLICAS['ALIASES']
+        if not replicas or self.request.method not in SAFE_METHODS:
+            return DEFAULT_DB_ALIAS
+        user = _request_user(self.request)
+        if user is None:
+            # Not authenticated yet; decide again on the next read.
+            return DEFAULT_DB_ALIAS
+        if is_sticky(self.request, user):
+            self.alias = DEFAULT_DB_ALIAS
+        else:
+            self.alias = random.choice(replicas)
+
+        return self.alias
+
+
+class ReplicaRouter:
+    """Send safe request reads to a replica unless the user just wrote."""
+
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if routing is None or model._meta.app_label not in REPLICATED_APPS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Scope replica routing to the request and mark writers sticky."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _wrote(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        return _request_user(request)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _current.set(_Routing(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        user = self._wrote(request, response)
+        if user is not None:
+            mark_sticky(response, user)
+
+        return response
+
+    async def __acall__(self, request):
+        token = _current.set(_Routing(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        user = self._wrote(request, response)
+        if user is not None:
+            await sync_to_async(mark_sticky)(response, user)
+
+        return response
@@ -0,0 +1,161 @@
+"""
+Password hashing in a bounded worker process pool.
+"""
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Hashes computed ahead of a view by an async caller, keyed by the call
+# that would otherwise have to hash on the request thread.
+precomputed = contextvars.ContextVar('precomputed_hashes', default=None)
+
+_lock = threading.Lock()
+_pool = None
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 hasher whose work factor comes from settings."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['ITERATIONS']
+
+
+class HashingBusy(APIException):
+    """Every hashing worker is busy and the queue is full."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, try again shortly.'
+    default_code = 'hashing_busy'
+
+
+def _init_worker():
+    django.setup()
+
+
+def _make(raw_password):
+    return hashers.make_password(raw_password)
+
+
+def _check(raw_password, encoded):
+    rehashed = []
+    valid = hashers.check_password(
+        raw_password, encoded,
+        setter=lambda raw: rehashed.append(hashers.make_password(raw)),
+    )
+
+    return valid, (rehashed[0] if rehashed else None)
+
+
+def _get_pool():
+    """Return the (executor, slots) pair for this process and settings."""
+    global _pool
+    config = settings.PASSWORD_HASHING
+    key = (os.getpid(), config['WORKERS'], config['MAX_PENDING'])
+    with _lock:
+        if _pool is None or _pool[0] != key:
+            if _pool is not None and _pool[0][0] == key[0]:
+                _pool[1].shutdown(wait=False)
+            executor = ProcessPoolExecutor(
+                max_workers=config['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            slots = threading.BoundedSemaphore(config['MAX_PENDING'])
+            _pool = (key, executor, slots)
+
+        return _pool[1], _pool[2]
+
+
+def _reset_pool(executor):
+    global _pool
+    with _lock:
+        if _pool is not None and _pool[1] is executor:
+            _pool = None
+
+
+def _busy():
+    exc = HashingBusy()
+    exc.wait = settings.PASSWORD_HASHING['RETRY_AFTER']
+    return exc
+
+
+def _submit(fn, *args):
+    """Queue ``fn`` on the pool, or raise HashingBusy when it is full."""
+    for attempt in range(2):
+        executor, slots = _get_pool()
+        if not slots.acquire(blocking=False):
+            raise _busy()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            slots.release()
+            _reset_pool(executor)
+            continue
+        future.add_done_callback(lambda f: slots.release())
+        return future
+
+    raise _busy()
+
+
+def _precomputed(key):
+    memo = precomputed.get()
+    if not memo or key not in memo:
+        return None
+
+    return memo.pop(key)
+
+
+def _inline(raw_password, encoded=None):
+    if not settings.PASSWORD_HASHING['WORKERS'] or raw_password is None:
+        return True
+    return encoded is not None and not hashers.is_password_usable(encoded)
+
+
+def make_password(raw_password):
+    """Return the encoded ``raw_password``, hashed off the request thread."""
+    result = _precomputed(('make', raw_password))
+    if result is not None:
+        return result
+    if _inline(raw_password):
+        return _make(raw_password)
+
+    return _submit(_make, raw_password).result()
+
+
+def check_password(raw_password, encoded):
+    """Return ``(valid, rehashed)``, where ``rehashed`` is a new encoding
+    when the stored one uses an outdated hasher or cost."""
+    result = _precomputed(('check', raw_password, encoded))
+    if result is not None:
+        return result
+    if _inline(raw_password, encoded):
+        return _check(raw_password, encoded)
+
+    return _submit(_check, raw_password, encoded).result()
+
+
+async def _await(fn, *args):
+    if _inline(*args):
+        return fn(*args)
+
+    return await asyncio.wrap_future(_submit(fn, *args))
+
+
+async def amake_password(raw_password):
+    """Async make_password() that leaves the event loop free."""
+    return await _await(_make, raw_password)
+
+
+async def acheck_password(raw_password, encoded):
+    """Async check_password() that leaves the event loop free."""
+    return await _await(_check, raw_password, encoded)
@@ -0,0 +1,351 @@
+"""
+Django command to benchmark the API end to end on a seeded test database.
+"""
+import contextlib
+import io
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.management.commands.loadtest import percentile
+from core.models import Ingredient, Recipe, Tag
+
+PASSWORD = 'bench-pass-123'
+
+SCENARIOS = (
+    'token', 'list', 'filtered_list', 'detail', 'create', 'patch',
+    'upload_image',
+)
+
+WORDS = (
+    'spicy', 'roast', 'lemon', 'garlic', 'chicken', 'tofu', 'curry', 'pasta',
+    'salad', 'soup', 'ginger', 'honey', 'smoked', 'crispy', 'summer', 'bean',
+)
+
+
+def _png():
+    out = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(out, format='PNG')
+    return out.getvalue()
+
+
+def seed(rng, users, recipes, tags, ingredients, tags_per_recipe,
+         ingredients_per_recipe, images):
+    """Create the benchmark dataset and return it by user.
+
+    Returns a list of ``{'user', 'token', 'recipes', 'tags', 'tag_names',
+    'ingredient_names'}`` dicts with the ids of each user's recipes and
+    tags and the names of their tags and ingredients.
+    """
+    password = make_password(PASSWORD)
+    image = default_storage.save('uploads/recipe/bench.png',
+                                 ContentFile(_png()))
+    dataset = []
+    for i in range(users):
+        user = get_user_model().objects.create(
+            email=f'bench{i}@example.com', name=f'Bench {i}',
+            password=password,
+        )
+        user_tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag-{j}') for j in range(tags)
+        )
+        user_ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'ingredient-{j}')
+            for j in range(ingredients)
+        )
+        user_recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=' '.join(rng.sample(WORDS, 3)),
+                description=' '.join(rng.choices(WORDS, k=12)),
+                time_minutes=rng.randint(5, 120),
+                price=Decimal(rng.randint(100, 5000)) / 100,
+                image=image if rng.random() < images else None,
+            )
+            for _ in range(recipes)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in user_recipes
+            for tag in rng.sample(user_tags, min(tags_per_recipe, tags))
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id, ingredient_id=ingredient.id
+            )
+            for recipe in user_recipes
+            for ingredient in rng.sample(
+                user_ingredients, min(ingredients_per_recipe, ingredients)
+            )
+        )
+        dataset.append({
+            'user': user,
+            'token': Token.objects.create(user=user).key,
+            'recipes': [recipe.id for recipe in user_recipes],
+            'tags': [tag.id for tag in user_tags],
+            'tag_names': [tag.name for tag in user_tags],
+            'ingredient_names': [
+                ingredient.name for ingredient in user_ingredients
+            ],
+        })
+
+    return dataset
+
+
+class Scenarios:
+    """Request makers of the benchmarked endpoints."""
+
+    def __init__(self, png):
+        self.png = png
+
+    def token(self, client, data, rng):
+        return client.post(reverse('user:token'), {
+            'email': data['user'].email, 'password': PASSWORD,
+        })
+
+    def list(self, client, data, rng):
+        return client.get(reverse('recipe:recipe-list'))
+
+    def filtered_list(self, client, data, rng):
+        tags = rng.sample(data['tags'], min(2, len(data['tags'])))
+        return client.get(
+            reverse('recipe:recipe-list'),
+            {'tags': ','.join(map(str, tags))},
+        )
+
+    def detail(self, client, data, rng):
+        recipe = rng.choice(data['recipes'])
+        return client.get(reverse('recipe:recipe-detail', args=[recipe]))
+
+    def create(self, client, data, rng):
+        tags = data['tag_names']
+        ingredients = data['ingredient_names']
+        return client.post(reverse('recipe:recipe-list'), {
+            'title': ' '.join(rng.sample(WORDS, 3)),
+            'time_minutes': rng.randint(5, 120),
+            'price': '9.99',
+            'tags': [
+                {'name': name}
+                for name in rng.sample(tags, min(2, len(tags)))
+            ],
+            'ingredients': [
+                {'name': name}
+                for name in rng.sample(ingredients, min(3, len(ingredients)))
+            ],
+        }, format='json')
+
+    def patch(self, client, data, rng):
+        recipe = rng.choice(data['recipes'])
+        return client.patch(
+            reverse('recipe:recipe-detail', args=[recipe]),
+            {'title': ' '.join(rng.sample(WORDS, 3))},
+            format='json',
+        )
+
+    def upload_image(self, client, data, rng):
+        recipe = rng.choice(data['recipes'])
+        image = SimpleUploadedFile('bench.png', self.png, 'image/png')
+        return client.post(
+            reverse('recipe:recipe-upload-image', args=[recipe]),
+            {'image': image},
+            format='multipart',
+        )
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API end to end."""
+    help = (
+        'Seed a throwaway test database, send each scenario\'s requests '
+        'through the full middleware stack from concurrent clients and '
+        'print latency, throughput and queries per request as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4)
+        parser.add_argument('--recipes', type=int, default=250,
+                            help='Recipes per user.')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user.')
+        parser.add_argument('--ingredients', type=int, default=40,
+                            help='Ingredients per user.')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--images', type=float, default=0.2,
+                            help='Fraction of recipes with an image.')
+        parser.add_argument('-c', '--concurrency', type=int, default=4)
+        parser.add_argument('-n', '--requests', type=int, default=200,
+                            help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Unmeasured requests per scenario.')
+        parser.add_argument(
+            '-s', '--scenario', action='append', choices=SCENARIOS,
+            help='Scenario to run, may be repeated; all by default.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database between runs.')
+        parser.add_argument('-o', '--output',
+                            help='Write the JSON report to this file.')
+
+    def _worker(self, request, data, count, rng, results):
+        """Send ``count`` requests on one client, counting their queries."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        latencies, statuses, query_counts = [], [], []
+        try:
+            with contextlib.ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(count_query)
+                    )
+                for _ in range(count):
+                    queries[0] = 0
+                    start = time.perf_counter()
+                    response = request(client, data, rng)
+                    latencies.append(time.perf_counter() - start)
+                    statuses.append(response.status_code)
+                    query_counts.append(queries[0])
+        finally:
+            connections.close_all()
+        results.append((latencies, statuses, query_counts))
+
+    def _run(self, request, dataset, options, seed):
+        """Run one scenario and return its statistics."""
+        for cache in caches.all():
+            cache.clear()
+        concurrency = options['concurrency']
+        total = options['requests']
+        if options['warmup']:
+            self._worker(
+                request, dataset[0], options['warmup'],
+                random.Random(seed - 1), [],
+            )
+        results = []
+        threads = [
+            threading.Thread(target=self._worker, args=(
+                request,
+                dataset[i % len(dataset)],
+                total // concurrency + (i < total % concurrency),
+                random.Random(seed + i),
+                results,
+            ))
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(t * 1000 for r in results for t in r[0])
+        statuses = [s for r in results for s in r[1]]
+        queries = [q for r in results for q in r[2]]
+        codes = {}
+        for code in sorted(statuses):
+            codes[str(code)] = codes.get(str(code), 0) + 1
+
+        return {
+            'requests': len(latencies),
+            'errors': sum(code >= 400 for code in statuses),
+            'status_codes': codes,
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'latency_ms': {
+                'mean': round(statistics.mean(latencies), 2),
+                'p50': round(percentile(latencies, 0.5), 2),
+                'p95': round(percentile(latencies, 0.95), 2),
+                'p99': round(percentile(latencies, 0.99), 2),
+            },
+            'queries_per_request': round(statistics.mean(queries), 2),
+        }
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('--users and --recipes must be at least 1.')
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError(
+                '--concurrency and --requests must be at least 1.'
+            )
+        names = [
+            name for name in SCENARIOS
+            if name in (options['scenario'] or SCENARIOS)
+        ]
+        config = {
+            key: options[key] for key in (
+                'users', 'recipes', 'tags', 'ingredients', 'tags_per_recipe',
+                'ingredients_per_recipe', 'images', 'concurrency',
+                'requests', 'warmup', 'seed',
+            )
+        }
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keepdb']
+        )
+        try:
+            # A kept database still holds the previous run's data.
+            call_command('flush', interactive=False, verbosity=0)
+            with tempfile.TemporaryDirectory() as media, \
+                    override_settings(MEDIA_ROOT=media):
+                rng = random.Random(options['seed'])
+                dataset = seed(
+                    rng, options['users'], options['recipes'],
+                    options['tags'], options['ingredients'],
+                    options['tags_per_recipe'],
+                    options['ingredients_per_recipe'], options['images'],
+                )
+                scenarios = Scenarios(_png())
+                results = {
+                    name: self._run(
+                        getattr(scenarios, name), dataset, options,
+                        options['seed'] * 1000 + i * 100,
+                    )
+                    for i, name in enumerate(names)
+                }
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0,
+                               keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = json.dumps(
+            {'config': config, 'scenarios': results},
+            indent=2, sort_keys=True,
+        )
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(report + '\n')
+        else:
+            self.stdout.write(report)
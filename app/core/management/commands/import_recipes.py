@@ -0,0 +1,78 @@
+"""
+Django command to import recipes from a JSON Lines or CSV file.
+"""
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import importer
+
+
+class Command(BaseCommand):
+    """Django command to bulk import recipes for a user."""
+    help = (
+        'Import recipes for a user from a JSON Lines or CSV file, or - for '
+        'stdin. Rows are written in batches; rows that fail are reported '
+        'with their line number and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--user', required=True, help='Email of the recipes owner.',
+        )
+        parser.add_argument(
+            '--format', choices=sorted(importer.READERS),
+            help='Defaults to csv for .csv files, otherwise jsonl.',
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--max-errors', type=int, default=None,
+            help='Number of failed rows to print.',
+        )
+
+    def _import(self, user, lines, options):
+        reader = importer.READERS[
+            options['format'] or importer.format_of(options['path'])
+        ]
+        return importer.import_recipes(
+            user, reader(lines),
+            batch_size=options['batch_size'],
+            max_errors=options['max_errors'],
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}.')
+
+        start = time.perf_counter()
+        if options['path'] == '-':
+            report = self._import(user, sys.stdin.buffer, options)
+        else:
+            try:
+                with open(options['path'], 'rb') as lines:
+                    report = self._import(user, lines, options)
+            except OSError as exc:
+                raise CommandError(f'Cannot read {options["path"]}: {exc}')
+        elapsed = time.perf_counter() - start
+
+        for error in report.errors:
+            self.stderr.write(
+                f'line {error["line"]}: {json.dumps(error["errors"])}'
+            )
+        if report.failed > len(report.errors):
+            self.stderr.write(
+                f'... {report.failed - len(report.errors)} more failed rows'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} recipes, {report.failed} failed, '
+            f'in {elapsed:.1f}s.'
+        ))
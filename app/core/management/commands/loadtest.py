@@ -0,0 +1,104 @@
+"""
+Django command to measure HTTP throughput under concurrent connections.
+"""
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, fraction):
+    """Return the ``fraction`` percentile of sorted ``values``."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    """Django command to load test a running server."""
+    help = (
+        'Send GET requests to URL over CONCURRENCY keep-alive connections '
+        'for DURATION seconds and report throughput and latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('-c', '--concurrency', type=int, default=50)
+        parser.add_argument('-d', '--duration', type=float, default=10.0)
+        parser.add_argument(
+            '-H', '--header', action='append', default=[],
+            help='Extra "Name: value" request header, may be repeated.',
+        )
+
+    def _worker(self, url, headers, deadline, results):
+        """Issue requests on one connection until ``deadline``."""
+        latencies, errors = [], 0
+        conn = None
+        path = url.path or '/'
+        if url.query:
+            path = f'{path}?{url.query}'
+        while time.perf_counter() < deadline:
+            if conn is None:
+                conn = http.client.HTTPConnection(url.netloc, timeout=30)
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                res = conn.getresponse()
+                res.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn, errors = None, errors + 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if res.status >= 400:
+                errors += 1
+        if conn is not None:
+            conn.close()
+        results.append((latencies, errors))
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported.')
+        headers = {}
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f'Invalid header: {header!r}')
+            headers[name.strip()] = value.strip()
+
+        results = []
+        deadline = time.perf_counter() + options['duration']
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(url, headers, deadline, results),
+            )
+            for _ in range(options['concurrency'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(t for result in results for t in result[0])
+        errors = sum(result[1] for result in results)
+        self.stdout.write(
+            f'{len(latencies)} requests, {errors} errors in {elapsed:.1f}s '
+            f'over {options["concurrency"]} connections'
+        )
+        self.stdout.write(f'{len(latencies) / elapsed:.1f} requests/s')
+        if latencies:
+            ms = [t * 1000 for t in latencies]
+            self.stdout.write(
+                f'latency ms: mean {statistics.mean(ms):.1f} '
+                f'p50 {percentile(ms, 0.5):.1f} '
+                f'p95 {percentile(ms, 0.95):.1f} '
+                f'p99 {percentile(ms, 0.99):.1f}'
+            )
@@ -0,0 +1,144 @@
+"""
+Django command to run the micro-benchmarks and compare them to a baseline.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from recipe.benchmarks import BENCHMARKS
+
+
+def measure(run, number, repeat):
+    """Return the milliseconds per call of each of ``repeat`` runs.
+
+    Like timeit, the garbage collector is off while timing, so a
+    collection triggered by earlier allocations does not skew a run.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        timings.append(elapsed * 1000 / number)
+
+    return timings
+
+
+class Command(BaseCommand):
+    """Django command to run the micro-benchmarks."""
+    help = (
+        'Time the recipe micro-benchmarks on a throwaway test database and '
+        'fail when one is slower than its baseline by more than the '
+        'tolerance. Use --save to record the results as the new baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-k', dest='patterns', action='append',
+            help='Only run benchmarks whose name contains this, repeatable.',
+        )
+        parser.add_argument('-r', '--repeat', type=int, default=5)
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks.json'),
+        )
+        parser.add_argument(
+            '-t', '--tolerance', type=float, default=0.25,
+            help='Allowed slowdown of the best time, as a fraction.',
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Write the results to the baseline file.',
+        )
+
+    def _load(self, path):
+        try:
+            with open(path) as baseline:
+                return json.load(baseline)['benchmarks']
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Invalid baseline {path}: {exc}')
+
+    def _run(self, names, repeat):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = {}
+            for name in names:
+                setup, number = BENCHMARKS[name]
+                timings = measure(setup(), number, repeat)
+                results[name] = {
+                    'best_ms': round(min(timings), 4),
+                    'median_ms': round(statistics.median(timings), 4),
+                }
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        return results
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        names = [
+            name for name in BENCHMARKS
+            if not options['patterns']
+            or any(pattern in name for pattern in options['patterns'])
+        ]
+        if not names:
+            raise CommandError('No benchmark matches.')
+
+        baseline = self._load(options['baseline'])
+        results = self._run(names, options['repeat'])
+
+        regressions = []
+        for name, result in results.items():
+            line = (
+                f'{name:<32} best {result["best_ms"]:10.4f} ms  '
+                f'median {result["median_ms"]:10.4f} ms'
+            )
+            base = baseline.get(name)
+            if base:
+                change = result['best_ms'] / base['best_ms'] - 1
+                line += f'  baseline {base["best_ms"]:10.4f} ms {change:+.1%}'
+                if change > options['tolerance']:
+                    regressions.append(name)
+                    line = self.style.ERROR(f'{line}  REGRESSED')
+            self.stdout.write(line)
+
+        if options['save']:
+            with open(options['baseline'], 'w') as out:
+                json.dump({
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'benchmarks': {**baseline, **results},
+                }, out, indent=2, sort_keys=True)
+                out.write('\n')
+            self.stdout.write(f'Saved baseline to {options["baseline"]}')
+        elif regressions:
+            raise CommandError(
+                f'{len(regressions)} benchmark(s) regressed by more than '
+                f'{options["tolerance"]:.0%}: {", ".join(regressions)}'
+            )
@@ -0,0 +1,369 @@
+"""
+Django command to load a large synthetic dataset with Postgres COPY.
+"""
+import io
+import itertools
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Ingredient, Recipe, Tag
+
+ADJECTIVES = (
+    'Spicy', 'Smoky', 'Creamy', 'Crispy', 'Zesty', 'Rustic', 'Quick',
+    'Hearty', 'Roasted', 'Grilled', 'Sticky', 'Herby', 'Golden', 'Classic',
+)
+MAINS = (
+    'chicken', 'tofu', 'salmon', 'lentil', 'mushroom', 'chickpea', 'beef',
+    'halloumi', 'prawn', 'aubergine', 'pork', 'sweet potato', 'egg', 'bean',
+)
+DISHES = (
+    'curry', 'stew', 'salad', 'tacos', 'pasta', 'soup', 'traybake', 'bowl',
+    'risotto', 'stir fry', 'pie', 'burger', 'noodles', 'flatbread',
+)
+TAG_NAMES = (
+    'vegan', 'vegetarian', 'quick', 'dinner', 'lunch', 'breakfast',
+    'dessert', 'spicy', 'gluten free', 'dairy free', 'healthy', 'budget',
+    'family', 'batch cooking', 'one pot', 'summer', 'winter', 'baking',
+    'high protein', 'low carb',
+)
+INGREDIENT_NAMES = (
+    'salt', 'pepper', 'olive oil', 'garlic', 'onion', 'butter', 'flour',
+    'sugar', 'egg', 'milk', 'lemon', 'ginger', 'chilli', 'tomato', 'rice',
+    'cumin', 'paprika', 'coriander', 'basil', 'soy sauce', 'honey',
+    'carrot', 'potato', 'spinach', 'cheese', 'yoghurt', 'stock', 'vinegar',
+)
+TITLES = [
+    f'{adjective} {main} {dish}'
+    for adjective in ADJECTIVES for main in MAINS for dish in DISHES
+]
+
+# COPY text format escapes.
+_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r',
+})
+
+
+def copy_text(value):
+    """Return the string ``value`` escaped for the COPY text format."""
+    return value.translate(_ESCAPES)
+
+
+def zipf_weights(count, exponent):
+    """Return cumulative Zipf weights of ranks 1..count.
+
+    An exponent of 0 weighs every rank the same.
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def name(pool, index):
+    """Return a readable name for ``index``, unique per index."""
+    base = pool[index % len(pool)]
+    return base if index < len(pool) else f'{base} {index // len(pool) + 1}'
+
+
+class Command(BaseCommand):
+    """Django command to seed the database."""
+    help = (
+        'Generate users, tags, ingredients, recipes and their links and '
+        'load them with COPY in streaming batches, in one transaction. '
+        'Recipes per user and tag and ingredient popularity follow Zipf '
+        'distributions. Foreign keys, and for large loads secondary '
+        'indexes, of the seeded tables are dropped while loading and '
+        'validated and built again in one pass each, so the tables are '
+        'locked until the load commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=100000,
+                            help='Recipes in total.')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user.')
+        parser.add_argument('--ingredients', type=int, default=40,
+                            help='Ingredients per user.')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument(
+            '--user-skew', type=float, default=1.0,
+            help='Zipf exponent of recipes per user; 0 is uniform.',
+        )
+        parser.add_argument(
+            '--tag-skew', type=float, default=1.1,
+            help='Zipf exponent of tag and ingredient popularity.',
+        )
+        parser.add_argument(
+            '--indexes', choices=('auto', 'drop', 'keep'), default='auto',
+            help='Drop secondary indexes while loading and rebuild them; '
+                 'auto does so when the load at least doubles the recipes.',
+        )
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--password', default='seedpass123')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def _reserve_ids(self, cursor, model, count):
+        """Take ``count`` ids from the table's sequence; return the first."""
+        table = model._meta.db_table
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            "nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+            [table, table, count],
+        )
+
+        return cursor.fetchone()[0] - count + 1
+
+    def _drop_foreign_keys(self, cursor, models):
+        """Drop the foreign keys of ``models``; return how to re-add them."""
+        tables = [model._meta.db_table for model in models]
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname, "
+            "pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid::regclass::text = ANY(%s)",
+            [tables],
+        )
+        constraints = cursor.fetchall()
+        qn = connection.ops.quote_name
+        for table, constraint, _ in constraints:
+            cursor.execute(
+                f'ALTER TABLE {qn(table)} DROP CONSTRAINT {qn(constraint)}'
+            )
+
+        return [
+            f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(constraint)} '
+            f'{definition}'
+            for table, constraint, definition in constraints
+        ]
+
+    def _rebuild_indexes(self, cursor, mode, recipes):
+        """Return whether to drop the indexes and build them afterwards.
+
+        Rebuilding covers the rows already there too, so in ``auto`` mode
+        it is only done when the load at least doubles the recipes.
+        """
+        if mode != 'auto':
+            return mode == 'drop'
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [Recipe._meta.db_table],
+        )
+
+        return recipes >= max(cursor.fetchone()[0], 0)
+
+    def _drop_indexes(self, cursor, models):
+        """Drop indexes of ``models`` that back no constraint.
+
+        Returns the statements that build them again, which is much
+        faster in bulk afterwards than updating them row by row.
+        """
+        tables = [model._meta.db_table for model in models]
+        cursor.execute(
+            "SELECT i.indexrelid::regclass::text, "
+            "pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "WHERE i.indrelid::regclass::text = ANY(%s) AND NOT EXISTS ("
+            "SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)",
+            [tables],
+        )
+        indexes = cursor.fetchall()
+        for index, _ in indexes:
+            cursor.execute(f'DROP INDEX {index}')
+
+        return [definition for _, definition in indexes]
+
+    def _copy(self, cursor, model, columns, lines):
+        """COPY the text format ``lines`` into the table of ``model``."""
+        if not lines:
+            return 0
+        cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN',
+            io.StringIO(''.join(lines)),
+        )
+
+        return len(lines)
+
+    def _load(self, cursor, model, columns, lines, batch_size):
+        """COPY the generated ``lines`` in batches of ``batch_size``."""
+        total = 0
+        lines = iter(lines)
+        while True:
+            batch = list(itertools.islice(lines, batch_size))
+            if not batch:
+                return total
+            total += self._copy(cursor, model, columns, batch)
+
+    def _links(self, rng, owners, first_recipe, first_id, per_user,
+               per_recipe, weights):
+        """Return link lines of consecutive recipes owned by ``owners``.
+
+        Each recipe draws ``per_recipe`` of its owner's items by Zipf
+        rank; repeated draws collapse, as links are unique.
+        """
+        if not per_user or not per_recipe:
+            return []
+        ranks = rng.choices(
+            range(per_user), cum_weights=weights,
+            k=len(owners) * per_recipe,
+        )
+        lines = []
+        for i, owner in enumerate(owners):
+            base = first_id + owner * per_user
+            recipe = first_recipe + i
+            lines.extend(
+                f'{recipe}\t{base + rank}\n'
+                for rank in set(ranks[i * per_recipe:(i + 1) * per_recipe])
+            )
+
+        return lines
+
+    def _recipes(self, rng, owners, first_recipe, first_user, descriptions):
+        """Return recipe lines of consecutive recipes owned by ``owners``."""
+        random_ = rng.random
+        lines = []
+        for i, owner in enumerate(owners):
+            cents = int(random_() * 9900) + 100
+            lines.append(
+                f'{first_recipe + i}\t{first_user + owner}\t'
+                f'{TITLES[int(random_() * len(TITLES))]}\t'
+                f'{descriptions[int(random_() * len(descriptions))]}\t'
+                f'{int(random_() * 175) + 5}\t{cents // 100}.{cents % 100:02}'
+                f'\t\t\\N\n'
+            )
+
+        return lines
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users, recipes = options['users'], options['recipes']
+        tags, ingredients = options['tags'], options['ingredients']
+        if users < 1 or recipes < 0 or tags < 0 or ingredients < 0:
+            raise CommandError('Counts must not be negative; --users >= 1.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed needs PostgreSQL COPY.')
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        password = copy_text(make_password(options['password']))
+        User = get_user_model()
+        tag_names = [copy_text(name(TAG_NAMES, j)) for j in range(tags)]
+        ingredient_names = [
+            copy_text(name(INGREDIENT_NAMES, j)) for j in range(ingredients)
+        ]
+        words = [copy_text(word) for word in INGREDIENT_NAMES]
+        descriptions = [
+            ' '.join(rng.choices(words, k=8)) for _ in range(4096)
+        ]
+        recipe_tags = Recipe.tags.through
+        recipe_ingredients = Recipe.ingredients.through
+
+        start = time.perf_counter()
+        counts = dict.fromkeys((
+            'users', 'tags', 'ingredients', 'recipes', 'recipe_tags',
+            'recipe_ingredients',
+        ), 0)
+        with transaction.atomic(), connection.cursor() as cursor:
+            first_user = self._reserve_ids(cursor, User, users)
+            first_tag = self._reserve_ids(cursor, Tag, users * tags or 1)
+            first_ingredient = self._reserve_ids(
+                cursor, Ingredient, users * ingredients or 1
+            )
+            first_recipe = self._reserve_ids(cursor, Recipe, recipes or 1)
+            seeded = (
+                Tag, Ingredient, Recipe, recipe_tags, recipe_ingredients,
+            )
+            foreign_keys = self._drop_foreign_keys(cursor, seeded)
+            indexes = []
+            if self._rebuild_indexes(cursor, options['indexes'], recipes):
+                indexes = self._drop_indexes(cursor, seeded)
+
+            counts['users'] = self._load(
+                cursor, User,
+                ['id', 'password', 'is_superuser', 'email', 'name',
+                 'is_active', 'is_staff'],
+                (
+                    f'{pk}\t{password}\tf\tseed-{pk}@example.com\t'
+                    f'Seed user {pk}\tt\tf\n'
+                    for pk in range(first_user, first_user + users)
+                ),
+                batch_size,
+            )
+            for key, model, first, names in (
+                ('tags', Tag, first_tag, tag_names),
+                ('ingredients', Ingredient, first_ingredient,
+                 ingredient_names),
+            ):
+                counts[key] = self._load(
+                    cursor, model, ['id', 'name', 'user_id'],
+                    (
+                        f'{first + u * len(names) + j}\t{item}\t'
+                        f'{first_user + u}\n'
+                        for u in range(users)
+                        for j, item in enumerate(names)
+                    ),
+                    batch_size,
+                )
+
+            owner_weights = zipf_weights(users, options['user_skew'])
+            tag_weights = zipf_weights(tags, options['tag_skew'])
+            ingredient_weights = zipf_weights(
+                ingredients, options['tag_skew']
+            )
+            # Shuffled, so the busiest owners are not the lowest user ids.
+            ranked_users = list(range(users))
+            rng.shuffle(ranked_users)
+            for offset in range(0, recipes, batch_size):
+                owners = rng.choices(
+                    ranked_users, cum_weights=owner_weights,
+                    k=min(batch_size, recipes - offset),
+                )
+                first = first_recipe + offset
+                counts['recipes'] += self._copy(
+                    cursor, Recipe,
+                    ['id', 'user_id', 'title', 'description',
+                     'time_minutes', 'price', 'link', 'image'],
+                    self._recipes(
+                        rng, owners, first, first_user, descriptions
+                    ),
+                )
+                counts['recipe_tags'] += self._copy(
+                    cursor, recipe_tags, ['recipe_id', 'tag_id'],
+                    self._links(
+                        rng, owners, first, first_tag, tags,
+                        options['tags_per_recipe'], tag_weights,
+                    ),
+                )
+                counts['recipe_ingredients'] += self._copy(
+                    cursor, recipe_ingredients,
+                    ['recipe_id', 'ingredient_id'],
+                    self._links(
+                        rng, owners, first, first_ingredient, ingredients,
+                        options['ingredients_per_recipe'],
+                        ingredient_weights,
+                    ),
+                )
+                self.stdout.write(f'{offset + len(owners)} recipes loaded...')
+
+            cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+            for statement in indexes + foreign_keys:
+                cursor.execute(statement)
+
+        with connection.cursor() as cursor:
+            for model in (User, Tag, Ingredient, Recipe, recipe_tags,
+                          recipe_ingredients):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        elapsed = time.perf_counter() - start
+
+        rows = sum(counts.values())
+        self.stdout.write(', '.join(
+            f'{count} {table}' for table, count in counts.items()
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {rows} rows in {elapsed:.1f}s '
+            f'({rows / elapsed:.0f} rows/s).'
+        ))
@@ -0,0 +1,122 @@
+"""
+Django command to report the slowest queries found in the slow query log.
+"""
+import collections
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class QueryStats:
+    """Aggregated log entries of one normalized query."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.views = collections.Counter()
+        self.params = None
+        self.plan = None
+
+    def add(self, entry):
+        duration = entry['duration_ms']
+        self.count += 1
+        self.total_ms += duration
+        self.views[entry.get('view')] += 1
+        if duration >= self.max_ms:
+            self.max_ms = duration
+            self.params = entry.get('params')
+            # Keep the plan of the slowest run; fall back to any plan.
+            self.plan = entry.get('plan') or self.plan
+        elif self.plan is None:
+            self.plan = entry.get('plan')
+
+
+def parse_entries(lines):
+    """Yield the slow query entries among log ``lines``.
+
+    Lines may carry a formatter prefix before the JSON object; other lines
+    are skipped.
+    """
+    for line in lines:
+        start = line.find('{')
+        if start == -1:
+            continue
+        try:
+            entry = json.loads(line[start:])
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and entry.get('event') == 'slow_query':
+            yield entry
+
+
+class Command(BaseCommand):
+    """Django command to aggregate the slow query log."""
+    help = (
+        'Aggregate slow_query log lines by normalized SQL and print the '
+        'top queries by total time, with the views running them and a plan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'logs', nargs='*',
+            help='Log files to read; standard input when omitted.',
+        )
+        parser.add_argument('-n', '--top', type=int, default=10)
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total',
+        )
+        parser.add_argument(
+            '--no-plans', action='store_true', help='Omit query plans.',
+        )
+
+    def _read(self, paths):
+        if not paths:
+            yield from sys.stdin
+            return
+        for path in paths:
+            try:
+                with open(path) as log:
+                    yield from log
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        stats = {}
+        for entry in parse_entries(self._read(options['logs'])):
+            sql = entry['sql']
+            if sql not in stats:
+                stats[sql] = QueryStats(sql)
+            stats[sql].add(entry)
+
+        key = {
+            'total': lambda s: s.total_ms,
+            'count': lambda s: s.count,
+            'max': lambda s: s.max_ms,
+        }[options['sort']]
+        top = sorted(stats.values(), key=key, reverse=True)[:options['top']]
+        if not top:
+            self.stdout.write('No slow queries found.')
+            return
+
+        for rank, query in enumerate(top, 1):
+            views = ', '.join(
+                f'{view} ({count})'
+                for view, count in query.views.most_common()
+            )
+            self.stdout.write(
+                f'#{rank} total {query.total_ms:.1f} ms, {query.count} '
+                f'calls, mean {query.total_ms / query.count:.1f} ms, '
+                f'max {query.max_ms:.1f} ms'
+            )
+            self.stdout.write(f'  views: {views}')
+            self.stdout.write(f'  params: {query.params}')
+            self.stdout.write(f'  sql: {query.sql}')
+            if query.plan and not options['no_plans']:
+                self.stdout.write('  plan:')
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'    {line}')
+            self.stdout.write('')
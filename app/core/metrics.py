@@ -0,0 +1,161 @@
+"""
+Prometheus metrics for the API and the opt-in /metrics endpoint.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a directory
+shared by them (emptied before start) so every worker writes its samples
+there and the endpoint aggregates all of them.
+"""
+import asyncio
+import contextvars
+import os
+import time
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by view and action.',
+    ['view', 'action', 'method'],
+)
+RESPONSES = Counter(
+    'http_responses_total',
+    'Responses by view, action and status code.',
+    ['view', 'action', 'method', 'status'],
+)
+DB_QUERIES = Counter(
+    'db_queries_total',
+    'Database queries run by requests, by view and action.',
+    ['view', 'action'],
+)
+AUTH_FAILURES = Counter(
+    'auth_token_failures_total',
+    'Failed token requests to CreateTokenView by reason.',
+    ['reason'],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections',
+    'Open connections of each database pool, in use or idle.',
+    ['pool', 'state'],
+    multiprocess_mode='livesum',
+)
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled connection, by pool.',
+    ['pool'],
+    buckets=(0, .001, .005, .01, .05, .1, .5, 1, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Checkouts that gave up waiting for a pooled connection.',
+    ['pool'],
+)
+
+_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """Database execute wrapper counting a request's queries."""
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver adding count_query to the connection."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def view_labels(request):
+    """Return the (view, action) labels of the resolved request.
+
+    Viewset routes map the method to their action, e.g. ``list`` or
+    ``upload_image``; other views use the lowercased method.
+    """
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', request.method.lower()
+    cls = getattr(match.func, 'cls', None)
+    view = cls.__name__ if cls is not None else match.view_name
+    actions = getattr(match.func, 'actions', None) or {}
+
+    return view, actions.get(request.method.lower(), request.method.lower())
+
+
+class MetricsMiddleware:
+    """Record latency, status and query count of every request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _observe(self, request, response, start, queries):
+        view, action = view_labels(request)
+        method = request.method
+        REQUEST_LATENCY.labels(view, action, method).observe(
+            time.perf_counter() - start
+        )
+        RESPONSES.labels(view, action, method, response.status_code).inc()
+        if queries:
+            DB_QUERIES.labels(view, action).inc(queries)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        counter = [0]
+        token = _queries.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self._observe(request, response, start, counter[0])
+
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        counter = [0]
+        token = _queries.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self._observe(request, response, start, counter[0])
+
+        return response
+
+
+def metrics_view(request):
+    """Export the metrics in the Prometheus text format."""
+    if not settings.METRICS['ENABLED']:
+        raise Http404
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients whose names only differ by case."""
+    Recipe = apps.get_model('core', 'Recipe')
+    pairs = (('Tag', 'tags'), ('Ingredient', 'ingredients'))
+    for model_name, field_name in pairs:
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        column = f'{model_name.lower()}_id'
+        names = model.objects.annotate(name_lower=Lower('name'))
+        duplicates = names.values('user_id', 'name_lower').annotate(
+            keep_id=Min('id'),
+            total=Count('id'),
+        ).filter(total__gt=1)
+
+        for duplicate in duplicates:
+            keep_id = duplicate['keep_id']
+            merged_ids = names.filter(
+                user_id=duplicate['user_id'],
+                name_lower=duplicate['name_lower'],
+            ).exclude(id=keep_id).values_list('id', flat=True)
+            linked = set(through.objects.filter(
+                **{f'{column}__in': merged_ids}
+            ).values_list('recipe_id', flat=True))
+            linked -= set(through.objects.filter(
+                **{column: keep_id}
+            ).values_list('recipe_id', flat=True))
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{column: keep_id})
+                for recipe_id in linked
+            ])
+            model.objects.filter(id__in=list(merged_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
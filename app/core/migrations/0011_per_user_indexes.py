@@ -0,0 +1,92 @@
+import importlib
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import IntegrityError, migrations, models, transaction
+
+merge_duplicate_names = importlib.import_module(
+    'core.migrations.0010_merge_duplicate_names'
+).merge_duplicate_names
+
+UNIQUE_NAME_INDEXES = (
+    ('tag_user_lower_name_uniq', 'core_tag'),
+    ('ingredient_user_lower_name_uniq', 'core_ingredient'),
+)
+BUILD_ATTEMPTS = 3
+
+
+def _index_is_valid(schema_editor, name):
+    """Return whether index ``name`` is valid, or None if it is missing."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indisvalid FROM pg_index '
+            'WHERE indexrelid = to_regclass(%s);',
+            [name],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def create_unique_name_indexes(apps, schema_editor):
+    """Build the case-insensitive unique name indexes.
+
+    Names created between 0010 and this migration may again differ only by
+    case, so the duplicates are merged right before each build. A build
+    that still fails on a duplicate written meanwhile leaves an INVALID
+    index behind; it is dropped, and the merge and build retried, here and
+    on any later run of this migration.
+    """
+    alias = schema_editor.connection.alias
+    for name, table in UNIQUE_NAME_INDEXES:
+        for attempt in range(BUILD_ATTEMPTS):
+            valid = _index_is_valid(schema_editor, name)
+            if valid:
+                break
+            if valid is False:
+                schema_editor.execute(f'DROP INDEX CONCURRENTLY {name};')
+
+            with transaction.atomic(using=alias):
+                merge_duplicate_names(apps, schema_editor)
+            try:
+                schema_editor.execute(
+                    f'CREATE UNIQUE INDEX CONCURRENTLY {name} '
+                    f'ON {table} (user_id, lower(name));'
+                )
+                break
+            except IntegrityError:
+                if attempt == BUILD_ATTEMPTS - 1:
+                    raise
+
+
+def drop_unique_name_indexes(apps, schema_editor):
+    for name, _ in UNIQUE_NAME_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name};')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. Building
+    # the indexes this way does not lock the tables against writes.
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_merge_duplicate_names'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='tag_user_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], name='ingredient_user_name_idx'),
+        ),
+        migrations.RunPython(
+            create_unique_name_indexes,
+            drop_unique_name_indexes,
+            atomic=False,
+        ),
+    ]
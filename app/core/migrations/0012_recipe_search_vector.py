@@ -0,0 +1,71 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, transaction
+from django.db.models import F, Max
+
+CREATE_TRIGGER = '''
+CREATE FUNCTION core_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_vector
+    BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+    FOR EACH ROW EXECUTE PROCEDURE core_recipe_search_vector_update();
+'''
+
+DROP_TRIGGER = '''
+DROP TRIGGER IF EXISTS core_recipe_search_vector ON core_recipe;
+DROP FUNCTION IF EXISTS core_recipe_search_vector_update();
+'''
+
+BATCH_SIZE = 10000
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Fill the search vector of existing recipes, a range of ids at a time.
+
+    Touching the title fires the trigger. Each batch commits on its own, so
+    no single statement holds row locks across the whole table.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    alias = schema_editor.connection.alias
+    recipes = Recipe.objects.using(alias)
+    last_id = recipes.aggregate(last_id=Max('id'))['last_id'] or 0
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=alias):
+            recipes.filter(
+                id__gte=start, id__lt=start + BATCH_SIZE,
+            ).update(title=F('title'))
+
+
+class Migration(migrations.Migration):
+    # The GIN index is built concurrently, which cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.RunPython(
+            backfill_search_vector,
+            migrations.RunPython.noop,
+            atomic=False,
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+from django.db import migrations, models
+
+# Transition tables hold every row a statement changed, so a bulk insert or
+# COPY bumps each affected user once rather than once per row.
+CREATE_TRIGGERS = '''
+ALTER TABLE core_user ALTER COLUMN data_version SET DEFAULT 0;
+
+CREATE FUNCTION core_bump_data_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE core_user SET data_version = data_version + 1
+        WHERE id IN (SELECT user_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE core_user SET data_version = data_version + 1
+        WHERE id IN (SELECT user_id FROM old_rows);
+    ELSE
+        UPDATE core_user SET data_version = data_version + 1
+        WHERE id IN (
+            SELECT user_id FROM new_rows
+            UNION SELECT user_id FROM old_rows
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_bump_data_version_via_recipe() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE core_user SET data_version = data_version + 1
+        WHERE id IN (
+            SELECT r.user_id FROM core_recipe r
+            JOIN new_rows l ON l.recipe_id = r.id
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE core_user SET data_version = data_version + 1
+        WHERE id IN (
+            SELECT r.user_id FROM core_recipe r
+            JOIN old_rows l ON l.recipe_id = r.id
+        );
+    ELSE
+        UPDATE core_user SET data_version = data_version + 1
+        WHERE id IN (
+            SELECT r.user_id FROM core_recipe r
+            JOIN (
+                SELECT recipe_id FROM new_rows
+                UNION SELECT recipe_id FROM old_rows
+            ) l ON l.recipe_id = r.id
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+DROP_TRIGGERS = '''
+DROP FUNCTION IF EXISTS core_bump_data_version() CASCADE;
+DROP FUNCTION IF EXISTS core_bump_data_version_via_recipe() CASCADE;
+'''
+
+# Tables whose changes bump the owner's data_version, and the function
+# finding the owner. A trigger cannot have transition tables for more than
+# one event, hence one trigger per event.
+TABLES = [
+    ('core_recipe', 'core_bump_data_version'),
+    ('core_tag', 'core_bump_data_version'),
+    ('core_ingredient', 'core_bump_data_version'),
+    ('core_recipe_tags', 'core_bump_data_version_via_recipe'),
+    ('core_recipe_ingredients', 'core_bump_data_version_via_recipe'),
+]
+EVENTS = [
+    ('insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('update', 'UPDATE', 'NEW TABLE AS new_rows OLD TABLE AS old_rows'),
+    ('delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+CREATE_TRIGGERS += ''.join(
+    f'''
+CREATE TRIGGER {table}_data_version_{name}
+    AFTER {event} ON {table} REFERENCING {tables}
+    FOR EACH STATEMENT EXECUTE PROCEDURE {function}();
+'''
+    for table, function in TABLES
+    for name, event, tables in EVENTS
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='data_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -4,6 +4,8 @@ Database models.
 import uuid
 import os
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import (
@@ -12,6 +14,8 @@ from django.contrib.auth.models import (
     PermissionsMixin
 )
 
+from core import hashing
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path to new recipe image."""
@@ -53,11 +57,54 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Bumped by database triggers, in the same transaction, on every change
+    # to the user's recipes, tags, ingredients or their links, however it
+    # is made; see migration 0014. Versions cached responses and ETags.
+    data_version = models.BigIntegerField(default=0, editable=False)
+    # Signed tokens issued up to this time are revoked; see
+    # user.authentication.revoke_user_tokens.
+    tokens_revoked_at = models.DateTimeField(null=True, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    # Columns only written by the database or by targeted updates, which a
+    # save() of an instance loaded earlier must not overwrite.
+    UNSAVED_FIELDS = frozenset(['data_version', 'tokens_revoked_at'])
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """Save the user, leaving out UNSAVED_FIELDS once it exists."""
+        if update_fields is None and not force_insert \
+                and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.attname not in self.UNSAVED_FIELDS
+            ]
+        super().save(
+            force_insert=force_insert, force_update=force_update,
+            using=using, update_fields=update_fields,
+        )
+
+    def set_password(self, raw_password):
+        """Hash the password in the worker pool."""
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Check the password in the worker pool, upgrading its hash."""
+        valid, rehashed = hashing.check_password(raw_password, self.password)
+        if rehashed:
+            self.password = rehashed
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return valid
+
 
 class Recipe(models.Model):
     """Recipe object."""
@@ -73,6 +120,15 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Weighted title/description tsvector, kept up to date by the
+    # core_recipe_search_vector trigger created in migration 0012.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -86,6 +142,18 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        # Names are also unique per user ignoring case, enforced by the
+        # tag_user_lower_name_uniq index created in migration 0011.
+        indexes = [
+            models.Index(fields=['user', 'name'], name='tag_user_name_idx'),
+            GinIndex(
+                fields=['name'],
+                name='tag_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -98,5 +166,20 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        # Names are also unique per user ignoring case, enforced by the
+        # ingredient_user_lower_name_uniq index created in migration 0011.
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                name='ingredient_user_name_idx',
+            ),
+            GinIndex(
+                fields=['name'],
+                name='ingredient_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
+
     def __str__(self):
         return self.name
@@ -0,0 +1,179 @@
+"""
+Sampled per-request profiling reported as Server-Timing and log lines.
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from rest_framework import renderers, serializers
+
+from core import tracing
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+# Order of the Server-Timing metrics; names are the span names.
+METRICS = ('db', 'auth', 'serialize', 'render')
+
+
+class Profile:
+    """Timings and query count collected for one sampled request."""
+    __slots__ = ('start', 'timings', 'queries')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = dict.fromkeys(METRICS, 0.0)
+        self.queries = 0
+
+
+@contextlib.contextmanager
+def span(name):
+    """Add the time spent in the block to ``name`` of a sampled request."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing queries."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.timings['db'] += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver adding record_query to the connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfiledViewMixin:
+    """Time authentication of an API view."""
+
+    def perform_authentication(self, request):
+        with span('auth'):
+            super().perform_authentication(request)
+
+
+class ProfiledListSerializer(serializers.ListSerializer):
+    """List serializer timing ``.data``."""
+
+    @property
+    def data(self):
+        with span('serialize'):
+            return super().data
+
+
+class ProfiledSerializerMixin:
+    """Time ``.data``; set Meta.list_serializer_class for many=True."""
+
+    @property
+    def data(self):
+        with span('serialize'):
+            return super().data
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSON renderer timing rendering."""
+
+    def render(self, *args, **kwargs):
+        with span('render'), tracing.span(f'render {self.format}'):
+            return super().render(*args, **kwargs)
+
+
+class BrowsableAPIRenderer(renderers.BrowsableAPIRenderer):
+    """Browsable API renderer timing rendering."""
+
+    def render(self, *args, **kwargs):
+        with span('render'), tracing.span(f'render {self.format}'):
+            return super().render(*args, **kwargs)
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests.
+
+    A sampled request gets a Server-Timing header with its SQL, auth,
+    serializer and render time and a JSON log line on ``core.profiling``.
+    Unsampled requests cost one random() call; the hooks above then only
+    look up an unset context variable.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        rate = settings.PROFILING['SAMPLE_RATE']
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def _report(self, request, response, profile):
+        total = time.perf_counter() - profile.start
+        ms = {name: round(t * 1000, 2) for name, t in profile.timings.items()}
+        if settings.PROFILING['HEADER']:
+            metrics = [
+                f'{name};dur={ms[name]}' for name in METRICS
+            ]
+            metrics[0] += f';desc="{profile.queries} queries"'
+            metrics.append(f'total;dur={round(total * 1000, 2)}')
+            response['Server-Timing'] = ', '.join(metrics)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'event': 'request_profile',
+            'method': request.method,
+            'route': match.route if match else None,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.queries,
+            **{f'{name}_ms': ms[name] for name in METRICS},
+            'total_ms': round(total * 1000, 2),
+        }))
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._report(request, response, profile)
+
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._report(request, response, profile)
+
+        return response
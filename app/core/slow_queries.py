@@ -0,0 +1,150 @@
+"""
+Log slow queries of the recipe API views along with their query plan.
+"""
+import concurrent.futures
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('slow_query_view', default=None)
+
+_lock = threading.Lock()
+_executor = None
+_pending = 0
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Return ``sql`` with literals and placeholders replaced by ``?``.
+
+    Placeholder lists such as ``IN (?, ?, ?)`` collapse to ``IN (...)`` so
+    the same query with differently sized filters groups together.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql.replace('%s', '?'))
+    sql = _PLACEHOLDER_LIST.sub('...', sql)
+
+    return _SPACE.sub(' ', sql).strip()
+
+
+def param_shape(value):
+    """Return the type of a bound parameter, with the size of sequences."""
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+
+class SlowQueryLogMixin:
+    """Check the queries run while the view handles a request."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _current.set(self)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _current.reset(token)
+
+
+def _view_name(view):
+    action = getattr(view, 'action', None)
+    name = type(view).__name__
+
+    return f'{name}.{action}' if action else name
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='slow-query-explain'
+            )
+
+    return _executor
+
+
+def _explain(alias, sql, params):
+    """Return the plan of ``sql`` on a connection of this thread."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+    finally:
+        # Slow queries are rare; do not keep a connection open for them.
+        connection.close()
+
+
+def _log(entry, alias, sql, params):
+    global _pending
+    try:
+        entry['plan'] = _explain(alias, sql, params)
+    except Exception as exc:
+        entry['plan_error'] = str(exc)
+    finally:
+        with _lock:
+            _pending -= 1
+    logger.warning(json.dumps(entry))
+
+
+def flush(timeout=None):
+    """Wait until the query plans queued so far are logged."""
+    _get_executor().submit(lambda: None).result(timeout)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Database execute wrapper logging slow queries of scoped views.
+
+    The log line is written from a background thread once the ``EXPLAIN``
+    (without ANALYZE, so the query is not run again) has returned; when
+    too many plans are queued the line is written without one.
+    """
+    global _pending
+    view = _current.get()
+    if view is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - start
+
+    config = settings.SLOW_QUERIES
+    if duration * 1000 < config['THRESHOLD_MS'] or many:
+        return result
+    entry = {
+        'event': 'slow_query',
+        'view': _view_name(view),
+        'duration_ms': round(duration * 1000, 2),
+        'sql': normalize_sql(sql),
+        'params': [param_shape(value) for value in params or ()],
+    }
+    explain = config['EXPLAIN'] and sql.lstrip()[:6].upper() == 'SELECT'
+    if explain:
+        with _lock:
+            explain = _pending < config['MAX_PENDING']
+            if explain:
+                _pending += 1
+    if explain:
+        alias = context['connection'].alias
+        _get_executor().submit(_log, entry, alias, sql, params)
+    else:
+        logger.warning(json.dumps(entry))
+
+    return result
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """connection_created receiver adding log_slow_query to the connection."""
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
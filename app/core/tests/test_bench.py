@@ -0,0 +1,67 @@
+"""
+Tests for the bench management command.
+"""
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+
+from core.management.commands.bench import SCENARIOS
+from core.models import Ingredient, Tag
+
+
+@patch('core.management.commands.bench.teardown_test_environment')
+@patch('core.management.commands.bench.setup_test_environment')
+@patch('core.management.commands.bench.teardown_databases')
+@patch('core.management.commands.bench.setup_databases')
+class BenchCommandTests(TransactionTestCase):
+    """Test the benchmark on the test database the runner created."""
+
+    def bench(self, *args, **options):
+        out = StringIO()
+        call_command(
+            'bench', *args, users=2, recipes=5, requests=4, concurrency=2,
+            warmup=1, stdout=out, **options,
+        )
+        return json.loads(out.getvalue())
+
+    def test_report(self, *mocks):
+        """Test every scenario is reported with its statistics."""
+        report = self.bench('-s', 'list', '-s', 'create', '-s', 'detail')
+
+        self.assertEqual(report['config']['requests'], 4)
+        self.assertEqual(list(report['scenarios']),
+                         ['create', 'detail', 'list'])
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['requests'], 4, name)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries_per_request'], 0, name)
+            self.assertEqual(set(result['latency_ms']),
+                             {'mean', 'p50', 'p95', 'p99'})
+        self.assertEqual(
+            report['scenarios']['create']['status_codes'], {'201': 4}
+        )
+
+    def test_all_scenarios(self, *mocks):
+        """Test all endpoints succeed by default."""
+        report = self.bench(tags=3, ingredients=3)
+
+        self.assertEqual(set(report['scenarios']), set(SCENARIOS))
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['errors'], 0, name)
+
+    def test_create_uses_seeded_names(self, *mocks):
+        """Test created recipes link the seeded tags and ingredients."""
+        report = self.bench('-s', 'create', tags=3, ingredients=4)
+
+        self.assertEqual(report['scenarios']['create']['errors'], 0)
+        self.assertEqual(Tag.objects.count(), 2 * 3)
+        self.assertEqual(Ingredient.objects.count(), 2 * 4)
+
+    def test_invalid_options(self, *mocks):
+        """Test a benchmark without requests is refused."""
+        with self.assertRaises(CommandError):
+            call_command('bench', requests=0, stdout=StringIO())
@@ -0,0 +1,290 @@
+"""
+Tests for the database connection pool.
+"""
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from prometheus_client import REGISTRY
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INTRANS,
+)
+
+from core.db import pool
+
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection."""
+
+    def __init__(self):
+        self.closed = 0
+        self.healthy = True
+        self.pings = 0
+        self.rollbacks = 0
+        self.info = type('Info', (), {})()
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.pings += 1
+        if not self.healthy:
+            raise pool.OperationalError('server closed the connection')
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the pool with fake connections and a fake clock."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch('core.db.pool.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.made = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.made.append(conn)
+        return conn
+
+    def make_pool(self, **options):
+        return pool.ConnectionPool('test', **options)
+
+    def gauge(self, state):
+        return REGISTRY.get_sample_value(
+            'db_pool_connections', {'pool': 'test', 'state': state}
+        )
+
+    def test_reuses_checked_in_connection(self):
+        """Test a returned connection is handed out again."""
+        p = self.make_pool()
+        conn = p.checkout(self.connect)
+        p.checkin(conn)
+
+        self.assertIs(p.checkout(self.connect), conn)
+        self.assertEqual(len(self.made), 1)
+        self.assertEqual(p.stats()['checkouts'], 2)
+
+    def test_timeout_when_saturated(self):
+        """Test checkout gives up once max_size connections are in use."""
+        p = self.make_pool(max_size=1, timeout=0)
+        p.checkout(self.connect)
+
+        with self.assertRaises(pool.PoolTimeout):
+            p.checkout(self.connect)
+        self.assertEqual(p.stats()['timeouts'], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        """Test a waiting checkout is served by the next checkin."""
+        p = self.make_pool(max_size=1, timeout=5)
+        conn = p.checkout(self.connect)
+        got = []
+        waiter = threading.Thread(
+            target=lambda: got.append(p.checkout(self.connect))
+        )
+        waiter.start()
+        while p.stats()['waiting'] == 0:
+            threading.Event().wait(0.001)
+
+        p.checkin(conn)
+        waiter.join()
+
+        self.assertEqual(got, [conn])
+        self.assertEqual(p.stats()['waits'], 1)
+
+    def test_health_check_replaces_dead_connection(self):
+        """Test a connection that fails its ping is replaced."""
+        p = self.make_pool(check_interval=10)
+        conn = p.checkout(self.connect)
+        p.checkin(conn)
+        conn.healthy = False
+        self.now += 11
+
+        fresh = p.checkout(self.connect)
+
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(p.stats()['health_check_failures'], 1)
+        self.assertEqual(p.stats()['size'], 1)
+
+    def test_recently_used_connection_not_pinged(self):
+        """Test no ping is spent within the check interval."""
+        p = self.make_pool(check_interval=10)
+        conn = p.checkout(self.connect)
+        p.checkin(conn)
+        self.now += 5
+
+        p.checkout(self.connect)
+
+        self.assertEqual(conn.pings, 0)
+
+    def test_idle_connections_reaped_above_min_size(self):
+        """Test idle connections are closed down to min_size."""
+        p = self.make_pool(min_size=1, max_idle=60, check_interval=1000)
+        conns = [p.checkout(self.connect) for _ in range(3)]
+        for conn in conns:
+            p.checkin(conn)
+        self.now += 61
+
+        p.checkout(self.connect)
+
+        stats = p.stats()
+        self.assertEqual(stats['reaped'], 2)
+        self.assertEqual(stats['size'], 1)
+
+    def test_old_connection_recycled(self):
+        """Test a connection past max_lifetime is replaced."""
+        p = self.make_pool(max_lifetime=100, check_interval=1000)
+        conn = p.checkout(self.connect)
+        p.checkin(conn)
+        self.now += 101
+
+        self.assertIsNot(p.checkout(self.connect), conn)
+
+    def test_checkin_rolls_back_open_transaction(self):
+        """Test a connection returned mid-transaction is rolled back."""
+        p = self.make_pool()
+        conn = p.checkout(self.connect)
+        conn.info.transaction_status = TRANSACTION_STATUS_INTRANS
+
+        p.checkin(conn)
+
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(p.stats()['idle'], 1)
+
+    def test_prewarm_opens_min_size(self):
+        """Test prewarm fills the pool to min_size once."""
+        p = self.make_pool(min_size=3)
+        conn = p.checkout(self.connect)
+
+        p.prewarm(self.connect)
+        p.prewarm(self.connect)
+
+        self.assertEqual(len(self.made), 3)
+        self.assertEqual(p.stats()['idle'], 2)
+        self.assertIn(p.checkout(self.connect), self.made[1:])
+        self.assertEqual(len(self.made), 3)
+        self.assertIs(self.made[0], conn)
+
+    def test_failed_prewarm_frees_slots(self):
+        """Test a failing prewarm leaves the pool usable."""
+        p = self.make_pool(min_size=2, max_size=1, timeout=0)
+
+        def broken():
+            raise pool.OperationalError('refused')
+
+        p.prewarm(broken)
+
+        self.assertEqual(p.stats()['size'], 0)
+        self.assertIsNotNone(p.checkout(self.connect))
+
+    def test_connection_gauges(self):
+        """Test the in-use and idle counts are exported."""
+        p = self.make_pool()
+        first = p.checkout(self.connect)
+        p.checkout(self.connect)
+        self.assertEqual(self.gauge('in_use'), 2)
+
+        p.checkin(first)
+
+        self.assertEqual(self.gauge('in_use'), 1)
+        self.assertEqual(self.gauge('idle'), 1)
+
+    def test_wait_time_exported(self):
+        """Test checkout waits and timeouts are exported."""
+        labels = {'pool': 'test'}
+        checkouts = REGISTRY.get_sample_value(
+            'db_pool_checkout_wait_seconds_count', labels
+        ) or 0
+        timeouts = REGISTRY.get_sample_value(
+            'db_pool_timeouts_total', labels
+        ) or 0
+        p = self.make_pool(max_size=1, timeout=0)
+        p.checkout(self.connect)
+
+        with self.assertRaises(pool.PoolTimeout):
+            p.checkout(self.connect)
+
+        self.assertEqual(REGISTRY.get_sample_value(
+            'db_pool_checkout_wait_seconds_count', labels
+        ), checkouts + 1)
+        self.assertEqual(REGISTRY.get_sample_value(
+            'db_pool_timeouts_total', labels
+        ), timeouts + 1)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a failing connect does not leak pool capacity."""
+        p = self.make_pool(max_size=1, timeout=0)
+
+        def broken():
+            raise pool.OperationalError('refused')
+
+        with self.assertRaises(pool.OperationalError):
+            p.checkout(broken)
+        self.assertIsNotNone(p.checkout(self.connect))
+
+
+@skipUnless(settings.DB_POOL_ENABLED, 'Connection pooling is disabled.')
+class PooledBackendTests(TransactionTestCase):
+    """Test the core.db backend against the real database."""
+
+    def backend_pid(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_connection_reused_after_close(self):
+        """Test closing returns the session to the pool for reuse."""
+        first = self.backend_pid()
+        connection.close()
+
+        self.assertEqual(self.backend_pid(), first)
+        stats = pool.stats()[connection.settings_dict['NAME']]
+        self.assertGreaterEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_min_size_opened_on_first_use(self):
+        """Test the backend prewarms its pool to min_size."""
+        self.backend_pid()
+
+        stats = pool.stats()[connection.settings_dict['NAME']]
+        self.assertGreaterEqual(
+            stats['size'], connection.settings_dict['POOL']['min_size']
+        )
+
+    def test_threads_get_separate_connections(self):
+        """Test concurrent threads each check out their own session."""
+        pids = []
+        barrier = threading.Barrier(2)
+
+        def work():
+            barrier.wait()
+            pids.append(self.backend_pid())
+            barrier.wait()
+            connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(pids)), 2)
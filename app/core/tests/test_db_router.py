@@ -0,0 +1,146 @@
+"""
+Tests for routing reads to a replica.
+"""
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.router import STICKY_COOKIE
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+REPLICA = 'replica'
+
+
+@override_settings(
+    DATABASE_REPLICAS={
+        'ALIASES': [REPLICA], 'STICKY_SECONDS': 5, 'CACHE': 'shared',
+    },
+    RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'ENABLED': False},
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test routing with a second local database standing in as replica.
+
+    The stand-in is not replicated, so a row only visible through the API
+    shows which database served the read.
+    """
+    # The replica alias is added in setUpClass, after the test runner has
+    # created the databases it knows about.
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases[REPLICA] = {
+            **connections.databases['default'],
+            'NAME': 'replica_standin',
+            'TEST': {'NAME': 'test_replica_standin'},
+        }
+        connections[REPLICA].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].creation.destroy_test_db(
+            'replica_standin', verbosity=0
+        )
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        get_user_model().objects.using(REPLICA).create(
+            id=self.user.id, email=self.user.email
+        )
+        # Tokens are only on the primary: authentication never uses the
+        # replica.
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def titles(self):
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, 200)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_safe_reads_use_replica(self):
+        """Test list reads are served by the replica."""
+        Recipe.objects.using(REPLICA).create(
+            user_id=self.user.id,
+            title='On replica',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+        self.assertEqual(self.titles(), ['On replica'])
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test a writer reads their own writes until the window ends."""
+        payload = {'title': 'Fresh', 'time_minutes': 5, 'price': '1.00'}
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(
+            Recipe.objects.using('default').filter(title='Fresh').exists()
+        )
+        self.assertEqual(self.titles(), ['Fresh'])
+
+        caches['shared'].delete(f'db-sticky:{self.user.pk}')
+        with patch('django.core.signing.time.time',
+                   return_value=time.time() + 10):
+            self.assertEqual(self.titles(), [])
+
+    def test_pin_kept_without_cookies(self):
+        """Test clients that drop cookies still read their own writes."""
+        payload = {'title': 'Fresh', 'time_minutes': 5, 'price': '1.00'}
+        self.client.post(RECIPES_URL, payload)
+
+        self.client.cookies.clear()
+
+        self.assertEqual(self.titles(), ['Fresh'])
+
+    def test_cookie_pins_without_cache_entry(self):
+        """Test the signed cookie alone also pins reads."""
+        payload = {'title': 'Fresh', 'time_minutes': 5, 'price': '1.00'}
+        res = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(res.cookies[STICKY_COOKIE]['max-age'], 5)
+
+        caches['shared'].clear()
+
+        self.assertEqual(self.titles(), ['Fresh'])
+
+    def test_forged_pin_ignored(self):
+        """Test an unsigned cookie does not pin reads to the primary."""
+        Recipe.objects.create(
+            user=self.user, title='Primary', time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        self.client.cookies[STICKY_COOKIE] = str(self.user.pk)
+
+        self.assertEqual(self.titles(), [])
+
+    def test_failed_write_does_not_stick(self):
+        """Test a rejected write keeps reads on the replica."""
+        res = self.client.post(RECIPES_URL, {'title': ''})
+
+        self.assertNotIn(STICKY_COOKIE, res.cookies)
+        self.assertIsNone(caches['shared'].get(f'db-sticky:{self.user.pk}'))
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test code outside a request, like commands, reads the primary."""
+        self.assertEqual(Recipe.objects.all().db, 'default')
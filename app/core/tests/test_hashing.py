@@ -0,0 +1,73 @@
+"""
+Tests for password hashing in the worker pool.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core import hashing
+
+
+def hashing_settings(**params):
+    """Return PASSWORD_HASHING overridden with ``params``."""
+    return {**settings.PASSWORD_HASHING, **params}
+
+
+class PasswordHashingTests(TestCase):
+    """Test hashing passwords off the request thread."""
+
+    def test_pool_hashes_and_checks(self):
+        """Test a password hashed in the pool checks out."""
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'testpass123'
+        )
+
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('testpass123'))
+        self.assertFalse(user.check_password('wrong'))
+
+    @override_settings(
+        PASSWORD_HASHING=hashing_settings(WORKERS=0, ITERATIONS=1000)
+    )
+    def test_iterations_from_settings(self):
+        """Test the hasher cost is configurable."""
+        encoded = hashing.make_password('testpass123')
+
+        self.assertEqual(encoded.split('$')[1], '1000')
+
+    def test_outdated_cost_rehashed_on_check(self):
+        """Test a successful check upgrades a hash with an old cost."""
+        with self.settings(
+            PASSWORD_HASHING=hashing_settings(WORKERS=0, ITERATIONS=1000)
+        ):
+            user = get_user_model().objects.create_user(
+                'test@example.com', 'testpass123'
+            )
+
+        with self.settings(
+            PASSWORD_HASHING=hashing_settings(WORKERS=0, ITERATIONS=2000)
+        ):
+            self.assertTrue(user.check_password('testpass123'))
+
+        user.refresh_from_db()
+        self.assertEqual(user.password.split('$')[1], '2000')
+
+    @override_settings(
+        PASSWORD_HASHING=hashing_settings(WORKERS=1, MAX_PENDING=0)
+    )
+    def test_full_queue_raises_busy(self):
+        """Test hashing is refused once the queue is full."""
+        with self.assertRaises(hashing.HashingBusy) as cm:
+            hashing.make_password('testpass123')
+
+        self.assertEqual(cm.exception.status_code, 503)
+        self.assertEqual(cm.exception.wait, 1)
+
+    def test_precomputed_result_skips_pool(self):
+        """Test a hash computed ahead of time is used once."""
+        token = hashing.precomputed.set({('make', 'secret'): 'encoded'})
+        try:
+            self.assertEqual(hashing.make_password('secret'), 'encoded')
+            self.assertNotEqual(hashing.make_password('secret'), 'encoded')
+        finally:
+            hashing.precomputed.reset(token)
@@ -0,0 +1,133 @@
+"""
+Tests for the Prometheus metrics.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+
+def sample(name, **labels):
+    """Return the current value of a sample, 0 when not recorded yet."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(METRICS={'ENABLED': True})
+class MetricsTests(TestCase):
+    """Test requests are recorded and exported."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_latency_and_status_per_action(self):
+        """Test list and retrieve are labelled with their viewset action."""
+        labels = {'view': 'RecipeViewSet', 'method': 'GET'}
+        before = {
+            action: sample(
+                'http_request_duration_seconds_count',
+                action=action, **labels,
+            )
+            for action in ('list', 'retrieve')
+        }
+        ok = sample('http_responses_total', action='list', status='200',
+                    **labels)
+
+        self.client.get(RECIPES_URL)
+        self.client.get(reverse('recipe:recipe-detail', args=[self.recipe.id]))
+
+        for action in ('list', 'retrieve'):
+            self.assertEqual(
+                sample('http_request_duration_seconds_count',
+                       action=action, **labels),
+                before[action] + 1,
+            )
+        self.assertEqual(
+            sample('http_responses_total', action='list', status='200',
+                   **labels),
+            ok + 1,
+        )
+
+    def test_db_queries_counted(self):
+        """Test the queries run by a request are counted."""
+        labels = {'view': 'RecipeViewSet', 'action': 'list'}
+        before = sample('db_queries_total', **labels)
+
+        self.client.get(RECIPES_URL)
+
+        self.assertGreater(sample('db_queries_total', **labels), before)
+
+    def test_unmatched_requests(self):
+        """Test unrouted requests share one label."""
+        labels = {'view': 'unmatched', 'action': 'get', 'method': 'GET'}
+        before = sample('http_responses_total', status='404', **labels)
+
+        self.client.get('/no-such-page/')
+
+        self.assertEqual(
+            sample('http_responses_total', status='404', **labels),
+            before + 1,
+        )
+
+    def test_token_auth_failures(self):
+        """Test bad credentials and bad requests are counted apart."""
+        credentials = sample(
+            'auth_token_failures_total', reason='invalid_credentials'
+        )
+        invalid = sample('auth_token_failures_total', reason='invalid_request')
+        client = APIClient()
+
+        client.post(TOKEN_URL, {'email': 'user@example.com',
+                                'password': 'wrong'})
+        client.post(TOKEN_URL, {'email': 'user@example.com', 'password': ''})
+        res = client.post(TOKEN_URL, {'email': 'user@example.com',
+                                      'password': 'testpass123'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            sample('auth_token_failures_total', reason='invalid_credentials'),
+            credentials + 1,
+        )
+        self.assertEqual(
+            sample('auth_token_failures_total', reason='invalid_request'),
+            invalid + 1,
+        )
+
+    def test_metrics_endpoint(self):
+        """Test the endpoint serves the Prometheus text format."""
+        self.client.get(RECIPES_URL)
+
+        res = APIClient().get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{', body)
+        self.assertIn('view="RecipeViewSet"', body)
+
+    @override_settings(METRICS={'ENABLED': False})
+    def test_metrics_disabled(self):
+        """Test the endpoint is not served unless enabled."""
+        res = APIClient().get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
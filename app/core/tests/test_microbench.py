@@ -0,0 +1,111 @@
+"""
+Tests for the micro-benchmarks and the microbench command.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Tag
+from recipe import benchmarks, serializers
+
+
+class BenchmarkTests(TestCase):
+    """Test the benchmarks measure what they claim to."""
+
+    def test_recipes_serialize_without_queries(self):
+        """Test the in-memory recipes serialize with their relations."""
+        recipes = benchmarks.make_recipes(3, tags=2, ingredients=4)
+
+        with self.assertNumQueries(0):
+            data = serializers.RecipeDetailSerializer(
+                recipes, many=True,
+                context={'request': benchmarks.make_request()},
+            ).data
+
+        self.assertEqual(len(data), 3)
+        self.assertEqual(len(data[0]['tags']), 2)
+        self.assertEqual(len(data[0]['ingredients']), 4)
+        self.assertEqual(data[0]['tags'][0]['name'], 'tag-2')
+
+    def test_get_or_create_rolls_back(self):
+        """Test runs leave the table as the setup left it."""
+        run = benchmarks.BENCHMARKS['get_or_create_tags_100'][0]()
+        count = Tag.objects.count()
+
+        run()
+
+        self.assertEqual(count, 50)
+        self.assertEqual(Tag.objects.count(), count)
+
+    def test_get_queryset_sql(self):
+        """Test the queryset benchmark compiles the filtered query."""
+        run = benchmarks.BENCHMARKS['get_queryset_sql'][0]()
+
+        sql, params = run()
+
+        self.assertIn('EXISTS', sql)
+        self.assertIn('spicy', str(params))
+
+
+@patch('core.management.commands.microbench.teardown_test_environment')
+@patch('core.management.commands.microbench.setup_test_environment')
+@patch('core.management.commands.microbench.teardown_databases')
+@patch('core.management.commands.microbench.setup_databases')
+class MicrobenchCommandTests(TestCase):
+    """Test results are compared to and saved in the baseline."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.baseline = os.path.join(tmp.name, 'baseline.json')
+
+    def microbench(self, *args):
+        out = StringIO()
+        call_command(
+            'microbench', '-k', 'params_to_ints', '-r', '1',
+            '--baseline', self.baseline, *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def write_baseline(self, best_ms):
+        with open(self.baseline, 'w') as out:
+            json.dump({'benchmarks': {
+                'params_to_ints': {'best_ms': best_ms, 'median_ms': best_ms},
+            }}, out)
+
+    def test_save_baseline(self, *mocks):
+        """Test --save records the selected benchmarks."""
+        output = self.microbench('--save')
+
+        self.assertIn('params_to_ints', output)
+        with open(self.baseline) as baseline:
+            saved = json.load(baseline)['benchmarks']
+        self.assertEqual(list(saved), ['params_to_ints'])
+        self.assertGreater(saved['params_to_ints']['best_ms'], 0)
+
+    def test_within_tolerance(self, *mocks):
+        """Test a run faster than the baseline passes."""
+        self.write_baseline(1000.0)
+
+        output = self.microbench()
+
+        self.assertIn('baseline', output)
+        self.assertNotIn('REGRESSED', output)
+
+    def test_regression_fails(self, *mocks):
+        """Test a run slower than baseline plus tolerance fails."""
+        self.write_baseline(1e-9)
+
+        with self.assertRaisesMessage(CommandError, 'params_to_ints'):
+            self.microbench('--tolerance', '0.5')
+
+    def test_no_match(self, *mocks):
+        """Test an unknown benchmark name is an error."""
+        with self.assertRaises(CommandError):
+            call_command('microbench', '-k', 'nope', stdout=StringIO())
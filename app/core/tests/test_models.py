@@ -4,6 +4,7 @@ Test for models.
 from unittest.mock import patch
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -94,6 +95,31 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_name_unique_per_user_ignoring_case(self):
+        """Test a user cannot have two tags differing only by case."""
+        user = create_user()
+        models.Tag.objects.create(user=user, name="Vegan")
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name="vegan")
+
+    def test_ingredient_name_unique_per_user_ignoring_case(self):
+        """Test a user cannot have two ingredients differing by case."""
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name="Salt")
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name="SALT")
+
+    def test_same_tag_name_for_different_users(self):
+        """Test different users can use the same tag name."""
+        user1 = create_user()
+        user2 = create_user(email="other@example.com")
+        models.Tag.objects.create(user=user1, name="Vegan")
+        models.Tag.objects.create(user=user2, name="Vegan")
+
+        self.assertEqual(models.Tag.objects.filter(name="Vegan").count(), 2)
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test generatin image path."""
@@ -102,3 +128,68 @@ class ModelTest(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+
+class DataVersionTests(TestCase):
+    """Test the triggers bumping a user's data version."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user(email="other@example.com")
+
+    def version(self, user=None):
+        user = user or self.user
+        return get_user_model().objects.get(pk=user.pk).data_version
+
+    def test_bumped_on_every_kind_of_write(self):
+        """Test inserts, updates and deletes all bump the version."""
+        versions = [self.version()]
+        recipe = models.Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5,
+            price=Decimal("1.00"),
+        )
+        versions.append(self.version())
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        versions.append(self.version())
+        recipe.tags.add(tag)
+        versions.append(self.version())
+        models.Tag.objects.filter(pk=tag.pk).update(name="Plant")
+        versions.append(self.version())
+        recipe.tags.remove(tag)
+        versions.append(self.version())
+        recipe.delete()
+        versions.append(self.version())
+
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_bulk_write_bumps_once(self):
+        """Test a multi-row statement bumps each owner once."""
+        before = self.version()
+
+        models.Tag.objects.bulk_create(
+            models.Tag(user=self.user, name=f"Tag {i}") for i in range(50)
+        )
+
+        self.assertEqual(self.version(), before + 1)
+
+    def test_save_of_stale_user_keeps_version(self):
+        """Test saving a user loaded before a write keeps the new version."""
+        stale = get_user_model().objects.get(pk=self.user.pk)
+        models.Tag.objects.create(user=self.user, name="Vegan")
+        bumped = self.version()
+
+        stale.name = "Renamed"
+        stale.save()
+
+        self.assertEqual(self.version(), bumped)
+        self.assertEqual(
+            get_user_model().objects.get(pk=self.user.pk).name, "Renamed"
+        )
+
+    def test_other_users_untouched(self):
+        """Test only the owner's version changes."""
+        before = self.version(self.other)
+
+        models.Ingredient.objects.create(user=self.user, name="Salt")
+
+        self.assertEqual(self.version(self.other), before)
@@ -0,0 +1,107 @@
+"""
+Tests for the request profiling middleware.
+"""
+import json
+import re
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def profiling(**params):
+    """Return PROFILING overridden with ``params``."""
+    return override_settings(PROFILING={**settings.PROFILING, **params})
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics as {name: (dur, desc)}."""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc'))
+
+    return metrics
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test sampled requests report where their time went."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @profiling(SAMPLE_RATE=1)
+    def test_sampled_request_has_server_timing(self):
+        """Test a sampled request reports every metric."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(
+            list(metrics), ['db', 'auth', 'serialize', 'render', 'total']
+        )
+        self.assertEqual(
+            metrics['db'][1], f'"{len(queries.captured_queries)} queries"'
+        )
+        self.assertGreater(metrics['serialize'][0], 0)
+        self.assertGreater(metrics['render'][0], 0)
+        self.assertGreaterEqual(
+            metrics['total'][0],
+            metrics['serialize'][0] + metrics['render'][0],
+        )
+
+    @profiling(SAMPLE_RATE=1)
+    def test_sampled_request_logged(self):
+        """Test a sampled request writes a JSON log line."""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(RECIPES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'request_profile')
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['status'], 200)
+        self.assertRegex(record['route'], re.escape('recipes'))
+        self.assertGreater(record['queries'], 0)
+        for key in ('db_ms', 'auth_ms', 'serialize_ms', 'render_ms'):
+            self.assertIn(key, record)
+
+    @profiling(SAMPLE_RATE=0)
+    def test_unsampled_request_untouched(self):
+        """Test requests outside the sample are not reported."""
+        with patch('core.profiling.logger') as logger:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        logger.info.assert_not_called()
+
+    @profiling(SAMPLE_RATE=1, HEADER=False)
+    def test_header_can_be_disabled(self):
+        """Test the header can be left off while still logging."""
+        with self.assertLogs('core.profiling', 'INFO'):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
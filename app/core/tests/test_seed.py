@@ -0,0 +1,121 @@
+"""
+Tests for the seed management command.
+"""
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+
+from core.management.commands.seed import copy_text, zipf_weights
+from core.models import Ingredient, Recipe, Tag
+
+
+def schema():
+    """Return the foreign keys and indexes of the core tables."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE contype = 'f' "
+            "AND conrelid::regclass::text LIKE 'core_%%'"
+        )
+        foreign_keys = {row[0] for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename LIKE 'core_%%'"
+        )
+        indexes = {row[0] for row in cursor.fetchall()}
+
+    return foreign_keys, indexes
+
+
+class SeedHelperTests(SimpleTestCase):
+    """Test the value helpers."""
+
+    def test_copy_text(self):
+        """Test COPY special characters are escaped."""
+        self.assertEqual(copy_text('a\tb\nc\\d\re'), 'a\\tb\\nc\\\\d\\re')
+
+    def test_zipf_weights(self):
+        """Test the cumulative weights follow the exponent."""
+        self.assertEqual(zipf_weights(3, 0), [1, 2, 3])
+        self.assertEqual(zipf_weights(3, 1), [1, 1.5, 1 + 1 / 2 + 1 / 3])
+
+
+class SeedCommandTests(TestCase):
+    """Test the generated data and the restored schema."""
+
+    def seed(self, **options):
+        out = StringIO()
+        params = {
+            'users': 5, 'recipes': 200, 'tags': 4, 'ingredients': 6,
+            'seed': 1, 'stdout': out, **options,
+        }
+        call_command('seed', **params)
+
+        return out.getvalue()
+
+    def test_rows_loaded(self):
+        """Test every table gets its rows and users can log in."""
+        output = self.seed(batch_size=64)
+
+        self.assertIn('200 recipes', output)
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 20)
+        self.assertEqual(Ingredient.objects.count(), 30)
+        self.assertEqual(Recipe.objects.count(), 200)
+        user = get_user_model().objects.first()
+        self.assertTrue(user.check_password('seedpass123'))
+        self.assertFalse(
+            Recipe.objects.filter(search_vector__isnull=True).exists()
+        )
+
+    def test_links_use_owners_items(self):
+        """Test recipes only link the tags and ingredients of their owner."""
+        self.seed()
+
+        tags = Recipe.tags.through.objects
+        ingredients = Recipe.ingredients.through.objects
+        self.assertTrue(tags.exists())
+        self.assertTrue(ingredients.exists())
+        self.assertFalse(
+            tags.exclude(recipe__user=F('tag__user')).exists()
+        )
+        self.assertFalse(
+            ingredients.exclude(recipe__user=F('ingredient__user')).exists()
+        )
+
+    def test_tag_skew(self):
+        """Test tag popularity follows the Zipf exponent."""
+        self.seed(recipes=500, tag_skew=2.0)
+
+        counts = Counter(
+            Recipe.tags.through.objects.values_list('tag__name', flat=True)
+        )
+        ranked = [counts[name] for name in Tag.objects.filter(
+            user=get_user_model().objects.first()
+        ).order_by('id').values_list('name', flat=True)]
+        self.assertGreater(ranked[0], ranked[-1] * 4)
+
+    def test_schema_restored(self):
+        """Test dropped indexes and foreign keys are all created again."""
+        before = schema()
+
+        self.seed(indexes='drop')
+
+        self.assertEqual(schema(), before)
+
+    def test_appends_to_existing_data(self):
+        """Test a second run adds rows without clashing ids or emails."""
+        self.seed()
+        self.seed(indexes='keep')
+
+        self.assertEqual(Recipe.objects.count(), 400)
+        self.assertEqual(get_user_model().objects.count(), 10)
+
+    def test_invalid_options(self):
+        """Test impossible counts are refused."""
+        with self.assertRaises(CommandError):
+            self.seed(users=0)
@@ -0,0 +1,177 @@
+"""
+Tests for the slow query log.
+"""
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+def slow_query_log(**params):
+    """Return SLOW_QUERIES overridden with ``params``."""
+    return override_settings(SLOW_QUERIES={**settings.SLOW_QUERIES, **params})
+
+
+class NormalizeTests(SimpleTestCase):
+    """Test queries are normalized for grouping."""
+
+    def test_literals_and_placeholders(self):
+        """Test literals and parameters become ``?``."""
+        sql = (
+            'SELECT "core_recipe"."id" FROM "core_recipe" '
+            'WHERE ("core_recipe"."user_id" = %s AND\n  T3."tag_id" '
+            "IN (%s, %s, %s) AND title = 'it''s') LIMIT 21"
+        )
+
+        self.assertEqual(
+            slow_queries.normalize_sql(sql),
+            'SELECT "core_recipe"."id" FROM "core_recipe" '
+            'WHERE ("core_recipe"."user_id" = ? AND T3."tag_id" '
+            'IN (...) AND title = ?) LIMIT ?',
+        )
+
+    def test_param_shape(self):
+        """Test parameters are reported by type and size."""
+        shapes = [
+            slow_queries.param_shape(value)
+            for value in (1, 'a', [1, 2], (3,), None)
+        ]
+
+        self.assertEqual(
+            shapes, ['int', 'str', 'list[2]', 'tuple[1]', 'NoneType']
+        )
+
+
+class SlowQueryLogTests(TestCase):
+    """Test slow queries of the recipe views are logged."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _entries(self, logger):
+        slow_queries.flush(timeout=10)
+        return [
+            json.loads(call.args[0])
+            for call in logger.warning.call_args_list
+        ]
+
+    @slow_query_log(THRESHOLD_MS=0)
+    @patch('core.slow_queries.logger')
+    def test_slow_queries_logged_with_plan(self, logger):
+        """Test queries over the threshold are logged with a plan."""
+        self.client.get(RECIPES_URL, {'tags': '1,2'})
+
+        entries = self._entries(logger)
+        recipes = [e for e in entries if 'FROM "core_recipe"' in e['sql']]
+        self.assertTrue(recipes)
+        entry = recipes[0]
+        self.assertEqual(entry['view'], 'RecipeViewSet.list')
+        self.assertIn('IN (...)', entry['sql'])
+        self.assertEqual(set(entry['params']), {'int'})
+        self.assertIn('core_recipe', entry['plan'])
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+
+    @slow_query_log(THRESHOLD_MS=0)
+    @patch('core.slow_queries.logger')
+    def test_attribute_views_logged(self, logger):
+        """Test tag and ingredient views are covered."""
+        self.client.get(TAGS_URL)
+
+        views = {entry['view'] for entry in self._entries(logger)}
+        self.assertEqual(views, {'TagViewSet.list'})
+
+    @slow_query_log(THRESHOLD_MS=0)
+    @patch('core.slow_queries.logger')
+    def test_other_views_not_logged(self, logger):
+        """Test queries outside the recipe views are ignored."""
+        self.client.get(ME_URL)
+
+        self.assertEqual(self._entries(logger), [])
+
+    @slow_query_log(THRESHOLD_MS=60000)
+    @patch('core.slow_queries.logger')
+    def test_fast_queries_not_logged(self, logger):
+        """Test queries under the threshold are not logged."""
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(self._entries(logger), [])
+
+    @slow_query_log(THRESHOLD_MS=0, EXPLAIN=False)
+    @patch('core.slow_queries.logger')
+    def test_explain_disabled(self, logger):
+        """Test entries are logged without a plan when EXPLAIN is off."""
+        self.client.get(RECIPES_URL)
+
+        entries = self._entries(logger)
+        self.assertTrue(entries)
+        self.assertTrue(all('plan' not in entry for entry in entries))
+
+
+class SlowQueriesCommandTests(SimpleTestCase):
+    """Test the top-N report of the slow query log."""
+
+    def _entry(self, sql, duration, view='RecipeViewSet.list', plan=None):
+        return json.dumps({
+            'event': 'slow_query', 'view': view, 'sql': sql,
+            'duration_ms': duration, 'params': ['int'], 'plan': plan,
+        })
+
+    def test_report_ranks_by_total_time(self):
+        """Test queries are grouped and ranked by total duration."""
+        lines = [
+            'WARNING core.slow_queries ' + self._entry('SELECT a', 300),
+            self._entry('SELECT b', 200, plan='Seq Scan on b'),
+            self._entry('SELECT b', 250, view='TagViewSet.list'),
+            'unrelated line',
+            '{"event": "request_profile"}',
+            self._entry('SELECT c', 10),
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log:
+            log.write('\n'.join(lines))
+            log.flush()
+            out = StringIO()
+
+            call_command('slow_queries', log.name, top=2, stdout=out)
+
+        report = out.getvalue()
+        self.assertLess(report.index('SELECT b'), report.index('SELECT a'))
+        self.assertNotIn('SELECT c', report)
+        self.assertIn('#1 total 450.0 ms, 2 calls', report)
+        self.assertIn('Seq Scan on b', report)
+        self.assertIn('TagViewSet.list (1)', report)
+
+    def test_report_empty(self):
+        """Test an empty log reports no queries."""
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log:
+            out = StringIO()
+
+            call_command('slow_queries', log.name, stdout=out)
+
+        self.assertIn('No slow queries found.', out.getvalue())
@@ -0,0 +1,203 @@
+"""
+Tests for request tracing.
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import tracing
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+class TracingTests(TestCase):
+    """Test sampled requests are exported as OTLP/JSON traces."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'traces.jsonl')
+        self.tracing(SAMPLE_RATE=1)
+
+    def tracing(self, **params):
+        """Override TRACING with ``params`` for the rest of the test."""
+        config = {
+            **settings.TRACING, 'ENABLED': True, 'EXPORTER': 'file',
+            'FILE': self.path, **params,
+        }
+        override = override_settings(TRACING=config)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def exported(self):
+        """Return the spans of each exported trace."""
+        tracing.flush(timeout=10)
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as traces:
+            return [
+                json.loads(line)['resourceSpans'][0]['scopeSpans'][0]['spans']
+                for line in traces
+            ]
+
+    def test_sampled_request_spans(self):
+        """Test a sampled request records every instrumented step."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, 200)
+        traces = self.exported()
+        self.assertEqual(len(traces), 1)
+        spans = {span['spanId']: span for span in traces[0]}
+        names = [span['name'] for span in traces[0]]
+        self.assertIn('authenticate TokenAuthentication', names)
+        self.assertIn('RecipeViewSet.get_queryset', names)
+        self.assertIn('db.query', names)
+        self.assertIn('serialize TagSerializer', names)
+        self.assertIn('render json', names)
+
+        root = [s for s in spans.values() if 'parentSpanId' not in s]
+        self.assertEqual(len(root), 1)
+        root = root[0]
+        self.assertEqual(root['kind'], tracing.SERVER)
+        self.assertTrue(root['name'].startswith('GET '))
+        trace_id = root['traceId']
+        for span in spans.values():
+            self.assertEqual(span['traceId'], trace_id)
+            if span is not root:
+                self.assertIn(span['parentSpanId'], spans)
+            self.assertLessEqual(
+                int(span['startTimeUnixNano']), int(span['endTimeUnixNano'])
+            )
+        self.assertEqual(
+            res['traceresponse'], f'00-{trace_id}-{root["spanId"]}-01'
+        )
+
+    def test_sql_spans_are_children(self):
+        """Test statements nest under the step that ran them."""
+        self.client.get(RECIPES_URL)
+
+        spans = self.exported()[0]
+        by_id = {span['spanId']: span for span in spans}
+        queries = [s for s in spans if s['name'] == 'db.query']
+        self.assertTrue(queries)
+        for query in queries:
+            self.assertEqual(query['kind'], tracing.CLIENT)
+            attributes = {
+                a['key']: a['value']['stringValue']
+                for a in query['attributes']
+            }
+            self.assertEqual(attributes['db.system'], 'postgresql')
+            self.assertIn('SELECT', attributes['db.statement'])
+            self.assertIn(query['parentSpanId'], by_id)
+
+    def test_unsampled_request(self):
+        """Test unsampled requests carry a trace id but are not exported."""
+        self.tracing(SAMPLE_RATE=0)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertRegex(res['traceresponse'], r'^00-[0-9a-f]{32}-'
+                                               r'[0-9a-f]{16}-00$')
+        self.assertEqual(self.exported(), [])
+
+    def test_incoming_traceparent_sampled(self):
+        """Test an incoming sampled trace is continued."""
+        self.tracing(SAMPLE_RATE=0)
+
+        res = self.client.get(
+            RECIPES_URL, HTTP_TRACEPARENT=f'00-{TRACE_ID}-{PARENT_ID}-01'
+        )
+
+        self.assertTrue(res['traceresponse'].startswith(f'00-{TRACE_ID}-'))
+        spans = self.exported()[0]
+        root = [s for s in spans if s.get('parentSpanId') == PARENT_ID]
+        self.assertEqual(len(root), 1)
+        self.assertTrue(all(s['traceId'] == TRACE_ID for s in spans))
+
+    def test_incoming_traceparent_not_sampled(self):
+        """Test the caller's decision not to sample is honoured."""
+        res = self.client.get(
+            RECIPES_URL, HTTP_TRACEPARENT=f'00-{TRACE_ID}-{PARENT_ID}-00'
+        )
+
+        self.assertTrue(res['traceresponse'].startswith(f'00-{TRACE_ID}-'))
+        self.assertTrue(res['traceresponse'].endswith('-00'))
+        self.assertEqual(self.exported(), [])
+
+    def test_invalid_traceparent_ignored(self):
+        """Test a malformed traceparent starts a new trace."""
+        res = self.client.get(RECIPES_URL, HTTP_TRACEPARENT='00-zz-yy-01')
+
+        self.assertNotIn('zz', res['traceresponse'])
+        self.assertEqual(len(self.exported()), 1)
+
+    def test_max_spans(self):
+        """Test spans past MAX_SPANS are dropped and counted."""
+        self.tracing(SAMPLE_RATE=1, MAX_SPANS=2)
+
+        self.client.get(RECIPES_URL)
+
+        spans = self.exported()[0]
+        self.assertEqual(len(spans), 3)
+        root = spans[-1]
+        attributes = {a['key']: a['value'] for a in root['attributes']}
+        self.assertGreater(
+            int(attributes['trace.dropped_spans']['intValue']), 0
+        )
+
+    @patch('core.tracing.urllib.request.urlopen')
+    def test_otlp_exporter(self, urlopen):
+        """Test traces are POSTed to the collector endpoint."""
+        self.tracing(
+            SAMPLE_RATE=1, EXPORTER='otlp',
+            ENDPOINT='http://collector:4318/v1/traces',
+        )
+
+        self.client.get(RECIPES_URL)
+        tracing.flush(timeout=10)
+
+        urlopen.assert_called_once()
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.full_url, 'http://collector:4318/v1/traces')
+        self.assertEqual(request.get_header('Content-type'),
+                         'application/json')
+        body = json.loads(request.data)
+        self.assertTrue(body['resourceSpans'][0]['scopeSpans'][0]['spans'])
+
+    def test_disabled(self):
+        """Test no trace header is added unless tracing is enabled."""
+        self.tracing(ENABLED=False)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('traceresponse', res)
+        self.assertEqual(self.exported(), [])
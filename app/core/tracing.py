@@ -0,0 +1,363 @@
+"""
+Head-sampled request tracing exported as OTLP/JSON.
+
+A sampled request records spans for authentication, get_queryset, every
+SQL statement, nested tag and ingredient serialization and rendering.
+When the request ends they are exported in the OTLP/JSON encoding, either
+appended as one line per trace to a file, which the OpenTelemetry
+collector can read, or POSTed to a collector's ``/v1/traces`` endpoint.
+
+Incoming W3C ``traceparent`` headers are honoured, and every response
+carries the trace id in a ``traceresponse`` header.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.request
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds and status codes.
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_TRACEPARENT = re.compile(
+    r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$'
+)
+
+_trace = contextvars.ContextVar('trace', default=None)
+_parent = contextvars.ContextVar('trace_parent_span', default=None)
+
+_lock = threading.Lock()
+_executor = None
+_pending = 0
+
+
+def _new_id(size):
+    return f'{random.getrandbits(size * 8):0{size * 2}x}'
+
+
+class Span:
+    """One timed operation of a trace."""
+    __slots__ = (
+        'span_id', 'parent_id', 'name', 'kind', 'start', 'end',
+        'attributes', 'status',
+    )
+
+    def __init__(self, name, parent_id, kind=INTERNAL, attributes=None):
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.status = None
+
+    def to_otlp(self, trace_id):
+        span = {
+            'traceId': trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': _attributes(self.attributes),
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status is not None:
+            span['status'] = {'code': self.status}
+
+        return span
+
+
+class Trace:
+    """Spans of one sampled request, up to TRACING['MAX_SPANS']."""
+    __slots__ = ('trace_id', 'spans', 'dropped')
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, span):
+        if len(self.spans) < settings.TRACING['MAX_SPANS']:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes):
+    return [
+        {'key': key, 'value': _value(value)}
+        for key, value in attributes.items()
+    ]
+
+
+@contextlib.contextmanager
+def span(name, kind=INTERNAL, **attributes):
+    """Record the block as a child of the current span of a sampled trace.
+
+    Yields the Span, or None when the request is not sampled.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    current = Span(name, _parent.get(), kind, attributes)
+    token = _parent.set(current.span_id)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = STATUS_ERROR
+        current.attributes['exception.type'] = type(exc).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        current.end = time.time_ns()
+        trace.add(current)
+
+
+def trace_query(execute, sql, params, many, context):
+    """Database execute wrapper recording each statement as a span."""
+    if _trace.get() is None:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    with span(
+        'db.query', CLIENT,
+        **{
+            'db.system': connection.vendor,
+            'db.name': connection.alias,
+            'db.statement': sql,
+        },
+    ):
+        return execute(sql, params, many, context)
+
+
+def install_query_tracer(sender, connection, **kwargs):
+    """connection_created receiver adding trace_query to the connection."""
+    if trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_query)
+
+
+def traced(method):
+    """Record calls of a view method as ``<ViewClass>.<method>`` spans."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with span(f'{type(self).__name__}.{method.__name__}'):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class TracedViewMixin:
+    """Trace the authentication of an API view's requests.
+
+    The span is named after the authenticator that succeeded. The
+    authenticators themselves are left as they are, so views can still
+    tell them apart.
+    """
+
+    def perform_authentication(self, request):
+        with span('authenticate') as current:
+            super().perform_authentication(request)
+            if current is not None and request.successful_authenticator:
+                name = type(request.successful_authenticator).__name__
+                current.name = f'authenticate {name}'
+
+
+class TracedSerializerMixin:
+    """Trace serialization of the object when nested in another one."""
+
+    def to_representation(self, instance):
+        if (
+            _trace.get() is None
+            or self.parent is None
+            or self.parent is self.root
+        ):
+            return super().to_representation(instance)
+        with span(f'serialize {type(self).__name__}'):
+            return super().to_representation(instance)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='trace-export'
+            )
+
+    return _executor
+
+
+def to_otlp(trace):
+    """Return ``trace`` as an OTLP/JSON ExportTraceServiceRequest."""
+    resource = {'service.name': settings.TRACING['SERVICE_NAME']}
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _attributes(resource)},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [s.to_otlp(trace.trace_id) for s in trace.spans],
+            }],
+        }],
+    }
+
+
+def _write(payload):
+    config = settings.TRACING
+    if config['EXPORTER'] == 'otlp':
+        request = urllib.request.Request(
+            config['ENDPOINT'],
+            data=payload.encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=config['TIMEOUT']):
+            pass
+    else:
+        # Written by the single export thread only.
+        with open(config['FILE'], 'a') as out:
+            out.write(payload + '\n')
+
+
+def _export(trace):
+    global _pending
+    try:
+        _write(json.dumps(to_otlp(trace), separators=(',', ':')))
+    except Exception:
+        logger.exception('Failed to export trace %s', trace.trace_id)
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+def export(trace):
+    """Queue ``trace`` for export, dropping it when too many are queued."""
+    global _pending
+    with _lock:
+        if _pending >= settings.TRACING['MAX_PENDING']:
+            logger.warning('Dropped trace %s: export queue full',
+                           trace.trace_id)
+            return
+        _pending += 1
+    _get_executor().submit(_export, trace)
+
+
+def flush(timeout=None):
+    """Wait until the traces queued so far are exported."""
+    _get_executor().submit(lambda: None).result(timeout)
+
+
+def _sampled():
+    rate = settings.TRACING['SAMPLE_RATE']
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class TracingMiddleware:
+    """Start a trace for each request and export the sampled ones.
+
+    A valid incoming ``traceparent`` decides the sampling (parent-based);
+    otherwise a fraction TRACING['SAMPLE_RATE'] of requests is sampled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TRACING['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _begin(self, request):
+        match = _TRACEPARENT.match(request.META.get('HTTP_TRACEPARENT', ''))
+        if match and set(match[1]) != {'0'} and set(match[2]) != {'0'}:
+            trace_id, parent_id = match[1], match[2]
+            sampled = bool(int(match[3], 16) & 1)
+        else:
+            trace_id, parent_id, sampled = _new_id(16), None, _sampled()
+        root = Span(f'{request.method} {request.path}', parent_id, SERVER, {
+            'http.method': request.method,
+            'http.target': request.get_full_path(),
+        })
+        trace = Trace(trace_id) if sampled else None
+        tokens = (_trace.set(trace), _parent.set(root.span_id))
+
+        return trace_id, trace, root, tokens
+
+    def _reset(self, tokens):
+        _trace.reset(tokens[0])
+        _parent.reset(tokens[1])
+
+    def _header(self, trace_id, trace, root):
+        flags = '01' if trace is not None else '00'
+        return f'00-{trace_id}-{root.span_id}-{flags}'
+
+    def _end(self, request, response, trace, root):
+        if trace is None:
+            return
+        match = request.resolver_match
+        if match is not None:
+            root.name = f'{request.method} {match.route or request.path}'
+            root.attributes['http.route'] = match.route
+        root.end = time.time_ns()
+        if response is None:
+            root.status = STATUS_ERROR
+        else:
+            root.attributes['http.status_code'] = response.status_code
+            if response.status_code >= 500:
+                root.status = STATUS_ERROR
+        if trace.dropped:
+            root.attributes['trace.dropped_spans'] = trace.dropped
+        trace.spans.append(root)
+        export(trace)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        trace_id, trace, root, tokens = self._begin(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self._reset(tokens)
+            self._end(request, response, trace, root)
+        response['traceresponse'] = self._header(trace_id, trace, root)
+
+        return response
+
+    async def __acall__(self, request):
+        trace_id, trace, root, tokens = self._begin(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._reset(tokens)
+            self._end(request, response, trace, root)
+        response['traceresponse'] = self._header(trace_id, trace, root)
+
+        return response
@@ -0,0 +1,179 @@
+"""
+Async entry points for the recipe API, served by the ASGI application.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Chunks of a streamed body that may be read ahead of the client.
+STREAM_BUFFER = 8
+
+_END = object()
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_READS['THREADS'],
+                thread_name_prefix='recipe-read',
+            )
+
+    return _executor
+
+
+class _Pump:
+    """Pass a response, and then its streamed body, to the event loop.
+
+    A streamed body is read on the pool thread that ran the view, since
+    that thread's connection holds the server-side cursor, and is handed
+    over one chunk at a time. At most STREAM_BUFFER chunks wait for the
+    client, so the body is never held in memory.
+
+    The pump also stands in for the response's sync body: closing the
+    response stops the reading, even if the body was never sent.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.started = loop.create_future()
+        self.chunks = asyncio.Queue()
+        self.space = threading.Semaphore(STREAM_BUFFER)
+        self.stopped = False
+
+    def start(self, response):
+        self.loop.call_soon_threadsafe(self.started.set_result, response)
+
+    def put(self, item):
+        """Queue ``item``, waiting for space; False once the client left."""
+        if self.stopped:
+            return False
+        self.space.acquire()
+        if self.stopped:
+            return False
+        self.loop.call_soon_threadsafe(self.chunks.put_nowait, item)
+        return True
+
+    def drain(self, response, content):
+        """Read ``content``, the body of ``response``, into the queue."""
+        stopped = True
+        try:
+            for chunk in content:
+                if not self.put(chunk):
+                    break
+            else:
+                stopped = False
+        finally:
+            if stopped:
+                # Close the rows' cursor here, on its connection's thread.
+                response.close()
+            self.put(_END)
+
+    async def stream(self, task):
+        """Yield the chunks, then wait for the pool thread to finish."""
+        try:
+            while True:
+                chunk = await self.chunks.get()
+                self.space.release()
+                if chunk is _END:
+                    break
+                yield chunk
+        finally:
+            self.close()
+            await task
+
+    async def response(self, task):
+        """Return the response once the view returned it."""
+        await asyncio.wait(
+            [task, self.started], return_when=asyncio.FIRST_COMPLETED
+        )
+        if not self.started.done():
+            return task.result()
+        response = self.started.result()
+        response.async_streaming_content = self.stream(task)
+        response.streaming_content = self
+
+        return response
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raise RuntimeError(
+            'The body is read in the pool, use async_streaming_content.'
+        )
+
+    def close(self):
+        """Stop reading, waking the thread if it waits for space."""
+        self.stopped = True
+        self.space.release()
+
+
+def _read(view, request, *args, pump, **kwargs):
+    """Run a read in a pool thread with its own database connection.
+
+    A streamed response is handed to ``pump`` and its body read here.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if not response.streaming:
+            return response
+        content = response.streaming_content
+        pump.start(response)
+        pump.drain(response, content)
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """Return an async view that runs reads of ``view`` in a thread pool.
+
+    Under ASGI, Django runs every sync view on one shared thread, so a
+    request waiting on Postgres holds up all the others. Reads run on
+    ASYNC_READS['THREADS'] threads instead; writes keep the shared thread.
+    A streamed body is sent as it is read, see AsyncHandler.
+    """
+    write = sync_to_async(view)
+
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await write(request, *args, **kwargs)
+        read = sync_to_async(
+            _read, thread_sensitive=False, executor=_get_executor()
+        )
+        pump = _Pump(asyncio.get_running_loop())
+        task = asyncio.ensure_future(
+            read(view, request, *args, pump=pump, **kwargs)
+        )
+
+        return await pump.response(task)
+
+    return functools.update_wrapper(wrapper, view)
+
+
+def async_reads(urlpatterns):
+    """Return ``urlpatterns`` with every view wrapped by async_read_view()."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        for pattern in urlpatterns
+    ]
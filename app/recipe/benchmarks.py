@@ -0,0 +1,174 @@
+"""
+Micro-benchmarks of the recipe API's hot Python paths.
+
+Each benchmark is a setup function registered with @benchmark that
+prepares its data and returns the callable to time. Run them with
+``manage.py microbench``.
+"""
+import itertools
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import serializers
+from recipe.views import RecipeViewSet
+
+BENCHMARKS = {}
+
+_ids = itertools.count(1)
+
+
+def benchmark(name, number=1):
+    """Register a setup function as benchmark ``name``.
+
+    The returned callable is timed ``number`` times per repeat.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+
+    return register
+
+
+def _prefetched(instance, name, objects):
+    """Cache ``objects`` as the prefetched ``name`` relation of instance."""
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance._prefetched_objects_cache[name] = queryset
+
+
+def make_recipes(count, tags=3, ingredients=5):
+    """Return unsaved recipes with prefetched tags and ingredients.
+
+    Serializing them runs no query, so only the Python side is measured.
+    """
+    user = get_user_model()(id=next(_ids), email='bench@example.com')
+    tag_pool = [Tag(id=i, user=user, name=f'tag-{i}') for i in range(1, 51)]
+    ingredient_pool = [
+        Ingredient(id=i, user=user, name=f'ingredient-{i}')
+        for i in range(1, 101)
+    ]
+    recipes = []
+    for i in range(1, count + 1):
+        recipe = Recipe(
+            id=i, user=user, title=f'Recipe {i}', description='Simmer.',
+            time_minutes=i % 120 + 5, price=Decimal('9.99'),
+            link='https://example.com/recipe', image=None,
+        )
+        recipe._prefetched_objects_cache = {}
+        _prefetched(recipe, 'tags', (
+            tag_pool[(i + j) % len(tag_pool)] for j in range(tags)
+        ))
+        _prefetched(recipe, 'ingredients', (
+            ingredient_pool[(i + j) % len(ingredient_pool)]
+            for j in range(ingredients)
+        ))
+        recipes.append(recipe)
+
+    return recipes
+
+
+def make_request(path='/api/recipes/recipes/', data=None, user=None):
+    """Return a DRF GET request authenticated as ``user``."""
+    request = Request(APIRequestFactory().get(path, data))
+    request.user = user or get_user_model()(id=1)
+
+    return request
+
+
+def _serialize(serializer_class, count):
+    recipes = make_recipes(count)
+    context = {'request': make_request()}
+
+    return lambda: serializer_class(recipes, many=True, context=context).data
+
+
+@benchmark('serialize_recipe_1k')
+def serialize_recipe_1k():
+    return _serialize(serializers.RecipeSerializer, 1000)
+
+
+@benchmark('serialize_recipe_10k')
+def serialize_recipe_10k():
+    return _serialize(serializers.RecipeSerializer, 10000)
+
+
+@benchmark('serialize_recipe_detail_1k')
+def serialize_recipe_detail_1k():
+    return _serialize(serializers.RecipeDetailSerializer, 1000)
+
+
+@benchmark('serialize_recipe_detail_10k')
+def serialize_recipe_detail_10k():
+    return _serialize(serializers.RecipeDetailSerializer, 10000)
+
+
+@benchmark('params_to_ints', number=10000)
+def params_to_ints():
+    view = RecipeViewSet()
+    ids = ','.join(str(i) for i in range(1, 21))
+
+    return lambda: view._params_to_ints(ids)
+
+
+def _view(action, data):
+    view = RecipeViewSet(action=action, format_kwarg=None)
+    view.request = make_request(data=data)
+
+    return view
+
+
+@benchmark('get_queryset_sql', number=200)
+def get_queryset_sql():
+    """Build and compile the filtered, searched list queryset."""
+    view = _view('list', {
+        'tags': '1,2,3', 'ingredients': '4,5', '-tags': '6',
+        'match': 'all', 'search': 'spicy -mild',
+    })
+
+    return lambda: view.get_queryset().query.sql_with_params()
+
+
+def _get_or_create(field, model, count):
+    """Time linking ``count`` items, half of them existing, to a recipe.
+
+    Every run is rolled back, so each one starts from the same rows.
+    """
+    user = get_user_model().objects.create_user(
+        f'bench-{field}-{next(_ids)}@example.com', 'bench-pass-123'
+    )
+    prefix = model.__name__.lower()
+    model.objects.bulk_create(
+        model(user=user, name=f'{prefix}-{i}') for i in range(count // 2)
+    )
+    items = [{'name': f'{prefix}-{i}'} for i in range(count)]
+    serializer = serializers.RecipeSerializer(
+        context={'request': make_request(user=user)}
+    )
+    method = getattr(serializer, f'_get_or_create_{field}')
+
+    def run():
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                user=user, title='Bench', time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            method(items, recipe)
+            transaction.set_rollback(True)
+
+    return run
+
+
+@benchmark('get_or_create_tags_100', number=20)
+def get_or_create_tags_100():
+    return _get_or_create('tags', Tag, 100)
+
+
+@benchmark('get_or_create_ingredients_100', number=20)
+def get_or_create_ingredients_100():
+    return _get_or_create('ingredients', Ingredient, 100)
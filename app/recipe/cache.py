@@ -0,0 +1,167 @@
+"""
+Per-user response cache for the recipe APIs.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE['ALIAS']]
+
+
+def get_version(user):
+    """Return the user's data version, read from the database.
+
+    Triggers bump it in the same transaction as any change to the user's
+    recipes, tags, ingredients or links, whichever process or code path
+    made it, so it always describes what a read would return.
+    """
+    return get_user_model().objects.filter(pk=user.pk).values_list(
+        'data_version', flat=True
+    ).first()
+
+
+def _request_digest(view, request, kwargs):
+    """Return what identifies a read besides the user and their data."""
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    digest = hashlib.sha1(
+        repr((request.get_host(), params)).encode()
+    ).hexdigest()
+
+    return ':'.join([
+        view.basename,
+        view.action,
+        str(kwargs.get(view.lookup_url_kwarg or view.lookup_field, '')),
+        digest,
+    ])
+
+
+def response_key(view, request, kwargs, version):
+    """Return the cache key of a read of the user's data at ``version``."""
+    return ':'.join([
+        'recipe-api:resp',
+        str(request.user.pk),
+        str(version),
+        _request_digest(view, request, kwargs),
+    ])
+
+
+def response_etag(view, request, kwargs, version):
+    """Return the ETag of a read of the user's data at ``version``."""
+    validator = ':'.join([
+        str(request.user.pk),
+        str(version),
+        _request_digest(view, request, kwargs),
+    ])
+
+    return quote_etag(hashlib.sha1(validator.encode()).hexdigest())
+
+
+def get_or_compute(key, compute):
+    """Return the cached value of ``key``, computing it on a miss.
+
+    ``compute`` returns ``(value, cacheable)``. Only one caller computes a
+    missing key at a time: the others poll the cache until the value shows
+    up, and compute it themselves once the lock is released without one,
+    e.g. because the result was not cacheable, or after the configured
+    lock timeout.
+    """
+    cache = _cache()
+    options = settings.RESPONSE_CACHE
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=options['LOCK_TIMEOUT']):
+        deadline = time.monotonic() + options['LOCK_TIMEOUT']
+        while time.monotonic() < deadline:
+            time.sleep(options['POLL_INTERVAL'])
+            found = cache.get_many([key, lock_key])
+            if key in found:
+                return found[key]
+            if lock_key not in found:
+                break
+
+        return compute()[0]
+
+    try:
+        value, cacheable = compute()
+        if cacheable:
+            cache.set(key, value, timeout=options['TIMEOUT'])
+    finally:
+        cache.delete(lock_key)
+
+    return value
+
+
+def _etag_matches(request, etag):
+    """Return whether ``If-None-Match`` holds ``etag`` (weak comparison)."""
+    tags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in tags or etag in (tag.replace('W/', '', 1) for tag in tags)
+
+
+def cached_read(method):
+    """Serve a viewset read action from the per-user response cache.
+
+    The key covers the user, their data version, the action, the object
+    and the normalized query parameters, so any committed write, from
+    any process, makes every earlier entry unreachable. Only ``200``
+    responses with serializable data are stored.
+
+    The ETag comes from the user's data version in the database, so it
+    changes with any write, not only those made through these views. A
+    request whose ``If-None-Match`` holds the current ETag gets
+    ``304 Not Modified`` after that one lookup, before anything else is
+    read or serialized.
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        version = get_version(request.user)
+        etag = response_etag(self, request, kwargs, version)
+        if _etag_matches(request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+            )
+
+        key = response_key(self, request, kwargs, version)
+        responses = []
+        # Streamed lists are never stored, so there is nothing to share
+        # with concurrent identical requests and no lock worth taking.
+        use_cache = settings.RESPONSE_CACHE['ENABLED'] \
+            and request.query_params.get('stream') != '1'
+
+        def compute():
+            response = method(self, request, *args, **kwargs)
+            responses.append(response)
+            cacheable = (
+                isinstance(response, Response)
+                and response.status_code == status.HTTP_200_OK
+            )
+            return (response.data if cacheable else None), cacheable
+
+        if use_cache:
+            data = get_or_compute(key, compute)
+            response = responses[0] if responses else Response(data)
+        else:
+            compute()
+            response = responses[0]
+
+        if response.status_code == status.HTTP_200_OK \
+                and isinstance(response, Response):
+            response['ETag'] = etag
+
+        return response
+
+    return wrapper
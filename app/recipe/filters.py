@@ -0,0 +1,107 @@
+"""
+Filters for the recipe APIs.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db.models import (
+    BooleanField,
+    CharField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Lookup,
+    OuterRef,
+    Q,
+)
+from django.db.models.functions import Cast
+
+from core.models import Recipe
+
+
+@CharField.register_lookup
+class IPrefix(Lookup):
+    """``field__iprefix=text``: the value starts with ``text``, any case.
+
+    Compiles to ``field ILIKE 'text%'``, which a ``gin_trgm_ops`` index on
+    the column can answer. Django's ``istartswith`` compiles to
+    ``UPPER(field) LIKE UPPER(...)`` instead, which that index cannot.
+    """
+    lookup_name = 'iprefix'
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        prefix = f'{connection.ops.prep_for_like_query(self.rhs)}%'
+
+        return f'{lhs} ILIKE %s', [*params, prefix]
+
+
+def linked_to(field, ids, match_all=False):
+    """Return an EXISTS expression for recipes linked to ``ids``.
+
+    ``field`` names a many-to-many field of Recipe. The subquery is
+    correlated on the recipe and answered from the through table's
+    (recipe_id, <related>_id) index, so filtering never joins the related
+    rows into the outer query or needs DISTINCT. With ``match_all`` the
+    recipe's matching links are counted and it must be linked to every id.
+    """
+    m2m = Recipe._meta.get_field(field)
+    recipe_column = m2m.m2m_column_name()
+    links = m2m.remote_field.through.objects.filter(**{
+        recipe_column: OuterRef('pk'),
+        f'{m2m.m2m_reverse_name()}__in': ids,
+    })
+    if match_all:
+        links = links.values(recipe_column).annotate(
+            matched=Count('*'),
+        ).filter(matched=len(set(ids)))
+
+    return Exists(links)
+
+
+def assigned_to_recipe(field):
+    """Return an EXISTS expression for objects linked to any recipe.
+
+    ``field`` names the Recipe many-to-many field pointing at the model
+    being filtered. The semi-join stops at the first link found through
+    the index on the related column, so its cost follows the number of
+    objects rather than the number of recipe links.
+    """
+    m2m = Recipe._meta.get_field(field)
+    links = m2m.remote_field.through.objects.filter(**{
+        m2m.m2m_reverse_name(): OuterRef('pk'),
+    })
+
+    return Exists(links)
+
+
+def ranked_search(queryset, text):
+    """Return recipes in ``queryset`` matching ``text``, annotated by rank.
+
+    ``text`` uses web search syntax (quoted phrases, ``or``, ``-word``)
+    and is matched against the GIN-indexed ``search_vector`` column, in
+    which title words weigh more than description words. The rank is
+    cast to double precision so it can be compared exactly when paging.
+    """
+    query = SearchQuery(text, config='english', search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+    )
+
+
+def autocomplete(queryset, text):
+    """Return objects in ``queryset`` whose name completes ``text``.
+
+    Names starting with ``text`` (ignoring case) or similar to it by
+    trigrams match, both answered by the ``gin_trgm_ops`` index on name.
+    Prefix matches come first, then the closest fuzzy matches.
+    """
+    prefix = Q(name__iprefix=text)
+    return queryset.filter(prefix | Q(name__trigram_similar=text)).annotate(
+        is_prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+        similarity=TrigramSimilarity('name', text),
+    ).order_by('-is_prefix', '-similarity', 'name')
@@ -0,0 +1,252 @@
+"""
+Bulk import of recipes from JSON Lines or CSV.
+
+Readers turn an iterable of byte lines, such as a request body or an
+open file, into ``(line, data)`` pairs one row at a time. import_recipes()
+validates the rows in batches and writes each batch with a handful of
+bulk queries, however many recipes, tags and ingredients it holds.
+"""
+import csv
+import itertools
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+
+from core import tracing
+from core.models import Ingredient, Recipe, Tag
+from recipe.serializers import RecipeImportSerializer, get_or_create_by_name
+
+# CSV columns holding comma separated names.
+CSV_LISTS = ('tags', 'ingredients')
+
+
+class RowError:
+    """Stands in for the data of a row that could not be read."""
+
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def _decode(line):
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+
+def read_jsonl(lines):
+    """Yield ``(line, data)`` for each JSON object in ``lines``.
+
+    Blank lines are skipped. Lines that are not a JSON object yield a
+    RowError in place of the data.
+    """
+    for number, line in enumerate(lines, 1):
+        text = _decode(line)
+        if text is None:
+            yield number, RowError({'non_field_errors': [
+                _('Invalid UTF-8.')
+            ]})
+            continue
+        if number == 1:
+            text = text.lstrip('\ufeff')
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            yield number, RowError({'non_field_errors': [
+                _('Invalid JSON: %(error)s') % {'error': exc}
+            ]})
+            continue
+        if not isinstance(data, dict):
+            yield number, RowError({'non_field_errors': [
+                _('Expected a JSON object.')
+            ]})
+            continue
+
+        yield number, data
+
+
+def read_csv(lines):
+    """Yield ``(line, data)`` for each record of a CSV with a header row.
+
+    ``line`` is the line the record ends on. Empty cells are left out so
+    the field defaults apply, and the tags and ingredients cells are
+    split on commas into lists of names.
+    """
+    invalid = set()
+
+    def decoded():
+        for number, line in enumerate(lines, 1):
+            text = _decode(line)
+            if text is None:
+                invalid.add(number)
+                text = line.decode('utf-8', 'replace')
+            yield text.lstrip('\ufeff') if number == 1 else text
+
+    reader = csv.DictReader(decoded())
+    number = 0
+    for record in reader:
+        first, number = number + 1, reader.line_num
+        if invalid.intersection(range(first, number + 1)):
+            yield number, RowError({'non_field_errors': [
+                _('Invalid UTF-8.')
+            ]})
+            continue
+        if None in record:
+            yield number, RowError({'non_field_errors': [
+                _('Too many columns.')
+            ]})
+            continue
+
+        data = {}
+        for field, value in record.items():
+            value = (value or '').strip()
+            if not value:
+                continue
+            if field in CSV_LISTS:
+                value = [
+                    {'name': name.strip()}
+                    for name in value.split(',') if name.strip()
+                ]
+            data[field] = value
+
+        yield number, data
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def format_of(name):
+    """Return the import format of a file named ``name``."""
+    return 'csv' if name.lower().endswith('.csv') else 'jsonl'
+
+
+class ImportReport:
+    """Counts of an import and the errors of its first failed rows."""
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def _validate(rows, report):
+    """Return ``(line, data)`` for the valid ``rows``, recording failures.
+
+    One serializer validates every row, so its fields are only built
+    once rather than for each row.
+    """
+    serializer = RecipeImportSerializer()
+    valid = []
+    for line, data in rows:
+        if isinstance(data, RowError):
+            report.fail(line, data.errors)
+            continue
+        try:
+            valid.append((line, serializer.run_validation(data)))
+        except ValidationError as exc:
+            report.fail(line, exc.detail)
+
+    return valid
+
+
+def _link(model, user, recipes, items_by_recipe):
+    """Link each of ``recipes`` to its named ``model`` items.
+
+    The names of the whole batch are resolved by one call to
+    get_or_create_by_name(), and each name is linked once per recipe.
+    """
+    field = model.__name__.lower()
+    through = getattr(Recipe, f'{field}s').through
+    objects = get_or_create_by_name(
+        model, user, itertools.chain.from_iterable(items_by_recipe)
+    )
+    ids = {obj.name.lower(): obj.id for obj in objects}
+
+    rows = []
+    for recipe, items in zip(recipes, items_by_recipe):
+        linked = {ids[item['name'].lower()] for item in items}
+        rows.extend(
+            through(recipe_id=recipe.id, **{f'{field}_id': item_id})
+            for item_id in linked
+        )
+    if rows:
+        through.objects.bulk_create(rows)
+
+
+def _write(user, batch):
+    """Insert the recipes of ``batch`` and link their tags and ingredients.
+
+    Runs at most nine queries: one insert of the recipes, then for tags
+    and ingredients each a lookup, an insert and a re-read of the missing
+    names, and an insert of the links. The batch commits on its own, and
+    the database triggers bump the user's data version with it, so cached
+    responses show each batch as soon as it is committed.
+    """
+    tags = [data.pop('tags', []) for data in batch]
+    ingredients = [data.pop('ingredients', []) for data in batch]
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(user=user, **data) for data in batch]
+        )
+        _link(Tag, user, recipes, tags)
+        _link(Ingredient, user, recipes, ingredients)
+
+    return len(recipes)
+
+
+def import_recipes(user, rows, batch_size=None, max_errors=None):
+    """Create recipes for ``user`` from ``(line, data)`` rows.
+
+    Rows are read ``batch_size`` at a time. Each batch is validated and
+    its valid rows are committed together, so a bad row is reported and
+    skipped without holding up the others. A batch whose tag or ingredient
+    names cannot be resolved is rolled back and its rows reported as
+    failed. Returns an ImportReport.
+    """
+    options = settings.RECIPE_IMPORT
+    batch_size = batch_size or options['BATCH_SIZE']
+    report = ImportReport(
+        options['MAX_ERRORS'] if max_errors is None else max_errors
+    )
+
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, batch_size))
+        if not chunk:
+            break
+        with tracing.span('import batch', rows=len(chunk)):
+            batch = _validate(chunk, report)
+            if not batch:
+                continue
+            try:
+                report.created += _write(user, [data for line, data in batch])
+            except IntegrityError:
+                errors = {'non_field_errors': [
+                    _('Tags or ingredients changed while saving, try again.')
+                ]}
+                for line, data in batch:
+                    report.fail(line, errors)
+
+    return report
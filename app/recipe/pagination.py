@@ -0,0 +1,142 @@
+"""
+Pagination for the recipe APIs.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def _reverse_ordering(ordering):
+    """Return ``ordering`` with every direction flipped."""
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination on a composite, unique ordering.
+
+    The cursor stores the value of every ordering field for the row at the
+    edge of the page, and the next page is fetched with a lexicographic
+    comparison against it, e.g. ``rank < r OR (rank = r AND id < i)``.
+    The ordering must end in a unique field so positions never tie, which
+    means a page never needs ``OFFSET`` and nothing is ever counted.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            queryset = queryset.filter(
+                self._after(ordering, self._decode_position())
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        has_cursor = self.cursor is not None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = has_cursor, has_more
+        else:
+            self.has_next, self.has_previous = has_more, has_cursor
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        position = self._get_position_from_instance(
+            self.page[-1], self.ordering
+        ) if self.page else self.cursor.position
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        position = self._get_position_from_instance(
+            self.page[0], self.ordering
+        ) if self.page else self.cursor.position
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=position)
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(instance[name])
+            else:
+                values.append(getattr(instance, name))
+
+        return json.dumps(values, cls=DjangoJSONEncoder)
+
+    def _decode_position(self):
+        """Return the ordering values stored in the current cursor."""
+        try:
+            values = json.loads(self.cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values
+
+    def _after(self, ordering, values):
+        """Return a filter for the rows that follow ``values``."""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values):
+                step &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= step
+
+        return condition
+
+
+class RecipeCursorPagination(KeysetPagination):
+    """Keyset pagination for recipes, newest first.
+
+    Pages are fetched with ``WHERE id < <cursor> LIMIT n`` so the cost of a
+    page does not depend on how deep into the list it is. Ranked search
+    results are paged on ``(rank, id)`` instead.
+    """
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', '-id')
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(KeysetPagination):
+    """Keyset pagination for tags and ingredients on ``(name, id)``."""
+    ordering = ('-name', '-id')
@@ -0,0 +1,25 @@
+"""
+Parsers for bulk recipe import bodies.
+"""
+from rest_framework.parsers import BaseParser
+
+from recipe.importer import read_csv, read_jsonl
+
+
+class JSONLinesParser(BaseParser):
+    """Parse a JSON Lines body into import rows.
+
+    The rows are read from the body as they are consumed, so a large
+    upload is never held in memory at once.
+    """
+    media_type = 'application/x-ndjson'
+    reader = staticmethod(read_jsonl)
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {'rows': self.reader(stream)}
+
+
+class CSVParser(JSONLinesParser):
+    """Parse a CSV body with a header row into import rows."""
+    media_type = 'text/csv'
+    reader = staticmethod(read_csv)
@@ -1,3 +1,7 @@
+from django.db import IntegrityError
+from django.db.models.functions import Lower
+from django.utils.translation import gettext as _
+
 from rest_framework import serializers
 
 from core.models import (
@@ -5,39 +9,134 @@ from core.models import (
     Tag,
     Ingredient,
 )
-
-
-class IngredientSerializer(serializers.ModelSerializer):
+from core.profiling import ProfiledListSerializer, ProfiledSerializerMixin
+from core.tracing import TracedSerializerMixin
+
+
+def filter_by_names(queryset, names):
+    """Filter ``queryset`` to the rows matching ``names``, ignoring case."""
+    return queryset.annotate(name_lower=Lower('name')).filter(
+        name_lower__in={name.lower() for name in names}
+    )
+
+
+def get_or_create_by_name(model, user, items):
+    """Return the user's ``model`` objects named in ``items``.
+
+    Names match ignoring case. Runs one query for the existing names and
+    one bulk insert plus one query for the missing ones, however many
+    items are given. Inserts skip rows that conflict with the per-user
+    unique name index and the missing names are re-read afterwards, so
+    two requests racing on the same name both end up with the row that
+    was committed first.
+
+    Raises IntegrityError when a name is still missing after the re-read,
+    e.g. because the conflicting row is not visible to this transaction,
+    rather than returning fewer objects than were asked for.
+    """
+    names = {}
+    for item in items:
+        names.setdefault(item['name'].lower(), item['name'])
+    if not names:
+        return []
+
+    found = {
+        obj.name.lower(): obj
+        for obj in filter_by_names(model.objects.filter(user=user), names)
+    }
+
+    missing = [name for key, name in names.items() if key not in found]
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        created = filter_by_names(model.objects.filter(user=user), missing)
+        found.update((obj.name.lower(), obj) for obj in created)
+
+    unresolved = [name for key, name in names.items() if key not in found]
+    if unresolved:
+        raise IntegrityError(
+            f'Could not resolve {model.__name__} names: '
+            f'{", ".join(unresolved)}'
+        )
+
+    return [found[key] for key in names]
+
+
+class IngredientSerializer(
+    TracedSerializerMixin,
+    ProfiledSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Ingredient Serializer Class."""
 
     class Meta:
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = ProfiledListSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(
+    TracedSerializerMixin,
+    ProfiledSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for tag model."""
 
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = ProfiledListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(
+    ProfiledSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Recipe Serializer class."""
 
     tags = TagSerializer(required=False, many=True)
     ingredients = IngredientSerializer(required=False, many=True)
+    add_tags = TagSerializer(required=False, many=True, write_only=True)
+    remove_tags = TagSerializer(required=False, many=True, write_only=True)
+    add_ingredients = IngredientSerializer(
+        required=False, many=True, write_only=True
+    )
+    remove_ingredients = IngredientSerializer(
+        required=False, many=True, write_only=True
+    )
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'title', 'time_minutes', 'price', 'link', 'tags',
-            'ingredients',
+            'ingredients', 'add_tags', 'remove_tags', 'add_ingredients',
+            'remove_ingredients',
         ]
         read_only_fields = ['id']
+        list_serializer_class = ProfiledListSerializer
+
+    def validate(self, attrs):
+        """Validate the add/remove operations on tags and ingredients."""
+        for field in ('tags', 'ingredients'):
+            ops = {f'add_{field}', f'remove_{field}'} & attrs.keys()
+            if not ops:
+                continue
+            if self.instance is None:
+                msg = _('%(op)s is only supported when updating a recipe.')
+                raise serializers.ValidationError(
+                    {op: msg % {'op': op} for op in ops}
+                )
+            if field in attrs:
+                msg = _('Cannot be combined with %(field)s.')
+                raise serializers.ValidationError(
+                    {op: msg % {'field': field} for op in ops}
+                )
+
+        return attrs
 
     def create(self, validated_data):
         """Create a recipe."""
@@ -52,34 +151,59 @@ class RecipeSerializer(serializers.ModelSerializer):
     def _get_or_create_tags(self, tags, recipe):
         """Handle creating or getting tags as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.add(*get_or_create_by_name(Tag, auth_user, tags))
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle creating or getting ingredients as needed."""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.add(
+            *get_or_create_by_name(Ingredient, auth_user, ingredients)
+        )
+
+    def _update_related(self, manager, model, items, add, remove):
+        """Apply only the changed links between a recipe and ``model``.
+
+        ``items`` replaces the whole set when given, otherwise ``add`` and
+        ``remove`` are applied to the current one. Links that stay are
+        left untouched, so an unchanged PATCH writes nothing.
+        """
+        if items is None and not add and not remove:
+            return
+
+        auth_user = self.context['request'].user
+        current = set(manager.values_list('id', flat=True))
+        if items is not None:
+            kept, added = set(), items
+        else:
+            removed = filter_by_names(
+                manager.all(), [item['name'] for item in remove]
+            ).values_list('id', flat=True)
+            kept, added = current - set(removed), add
+        wanted = kept | {
+            obj.id for obj in get_or_create_by_name(model, auth_user, added)
+        }
+
+        if current - wanted:
+            manager.remove(*(current - wanted))
+        if wanted - current:
+            manager.add(*(wanted - current))
 
     def update(self, instance, validated_data):
         """Update a recipe."""
-        tags = validated_data.pop('tags', None)
-        ingredients = validated_data.pop('ingredients', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+        self._update_related(
+            instance.tags,
+            Tag,
+            validated_data.pop('tags', None),
+            validated_data.pop('add_tags', []),
+            validated_data.pop('remove_tags', []),
+        )
+        self._update_related(
+            instance.ingredients,
+            Ingredient,
+            validated_data.pop('ingredients', None),
+            validated_data.pop('add_ingredients', []),
+            validated_data.pop('remove_ingredients', []),
+        )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -95,6 +219,20 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description', 'image']
 
 
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """Serializer validating one recipe of a bulk import."""
+
+    tags = TagSerializer(required=False, many=True)
+    ingredients = IngredientSerializer(required=False, many=True)
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'title', 'time_minutes', 'price', 'link', 'description', 'tags',
+            'ingredients',
+        ]
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer to upload image."""
 
@@ -0,0 +1,175 @@
+"""
+Tests for the async recipe API read path.
+"""
+import asyncio
+import json
+import threading
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+
+from app.asgi import AsyncRequest, application
+from core.models import Recipe, Tag
+from recipe.serializers import TagSerializer
+
+RECIPES_PATH = '/api/recipes/recipes/'
+TAGS_PATH = '/api/recipes/tags/'
+
+
+@override_settings(ROOT_URLCONF='app.urls_asgi')
+class AsyncReadTests(TransactionTestCase):
+    """Test reads served by the ASGI URLconf."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = AsyncClient()
+        self.auth = {'authorization': f'Token {token.key}'}
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+
+    async def stream_tags(self, send):
+        """Stream the tag list through the ASGI application to ``send``."""
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': TAGS_PATH,
+            'query_string': b'stream=1',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', self.auth['authorization'].encode()),
+            ],
+        }
+        await application(scope, receive, send)
+
+    def test_asgi_application_uses_async_urlconf(self):
+        """Test the ASGI application resolves against app.urls_asgi."""
+        self.assertIs(application.request_class, AsyncRequest)
+        match = resolve(RECIPES_PATH, urlconf=AsyncRequest.urlconf)
+
+        self.assertTrue(asyncio.iscoroutinefunction(match.func))
+        self.assertEqual(match.url_name, 'recipe-list')
+
+    async def test_reads_run_in_thread_pool(self):
+        """Test list and retrieve run outside the shared sync thread."""
+        threads = []
+
+        def record():
+            threads.append(threading.current_thread().name)
+            close_old_connections()
+
+        with patch('recipe.async_views.close_old_connections', record):
+            res = await self.client.get(RECIPES_PATH, **self.auth)
+            detail = await self.client.get(
+                f'{RECIPES_PATH}{self.recipe.id}/', **self.auth
+            )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['results'][0]['title'], 'Sample recipe')
+        self.assertEqual(detail.json()['id'], self.recipe.id)
+        self.assertEqual(len(threads), 4)
+        for name in threads:
+            self.assertTrue(name.startswith('recipe-read'))
+
+    async def test_concurrent_reads(self):
+        """Test concurrent reads each get their own connection."""
+        responses = await asyncio.gather(
+            *[self.client.get(RECIPES_PATH, **self.auth) for _ in range(8)]
+        )
+
+        for res in responses:
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(len(res.json()['results']), 1)
+
+    async def test_write_through_async_urlconf(self):
+        """Test writes still work through the async URLconf."""
+        payload = {'title': 'Async', 'time_minutes': 1, 'price': '1.00'}
+
+        res = await self.client.post(
+            RECIPES_PATH, payload, content_type='application/json',
+            **self.auth,
+        )
+
+        self.assertEqual(res.status_code, 201)
+        count = await sync_to_async(
+            Recipe.objects.filter(title='Async').count
+        )()
+        self.assertEqual(count, 1)
+
+    async def test_stream_read_in_pool(self):
+        """Test streamed lists are read off the event loop."""
+        await sync_to_async(Tag.objects.create)(user=self.user, name='Vegan')
+
+        res = await self.client.get(f'{TAGS_PATH}?stream=1', **self.auth)
+
+        self.assertEqual(res.status_code, 200)
+        content = b''.join(
+            [part async for part in res.async_streaming_content]
+        )
+        self.assertEqual(json.loads(content)[0]['name'], 'Vegan')
+
+    async def test_stream_sent_while_read(self):
+        """Test a streamed body reaches the client before it is all read."""
+        for name in ('A', 'B', 'C'):
+            await sync_to_async(Tag.objects.create)(user=self.user, name=name)
+        first_sent = threading.Event()
+        waited = []
+        to_representation = TagSerializer.to_representation
+
+        def slow_rows(serializer, tag):
+            if tag.name == 'B':
+                waited.append(first_sent.wait(timeout=5))
+            return to_representation(serializer, tag)
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+            if b'"C"' in message.get('body', b''):
+                first_sent.set()
+
+        with patch.object(TagSerializer, 'to_representation', slow_rows):
+            await self.stream_tags(send)
+
+        self.assertEqual(waited, [True])
+        self.assertEqual(messages[0]['status'], 200)
+        body = b''.join(m.get('body', b'') for m in messages[1:])
+        self.assertEqual(
+            [tag['name'] for tag in json.loads(body)], ['C', 'B', 'A']
+        )
+        self.assertFalse(messages[-1].get('more_body'))
+
+    async def test_stream_stops_when_client_leaves(self):
+        """Test the pool thread stops reading once sending fails."""
+        await sync_to_async(Tag.objects.bulk_create)([
+            Tag(user=self.user, name=f'Tag {i}') for i in range(50)
+        ])
+        read = []
+        to_representation = TagSerializer.to_representation
+
+        def record(serializer, tag):
+            read.append(tag.name)
+            return to_representation(serializer, tag)
+
+        async def send(message):
+            if message.get('body'):
+                raise OSError('Client went away.')
+
+        with patch.object(TagSerializer, 'to_representation', record):
+            with self.assertRaises(OSError):
+                await self.stream_tags(send)
+
+        self.assertLess(len(read), 50)
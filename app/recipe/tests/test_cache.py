@@ -0,0 +1,332 @@
+"""
+Tests for the per-user response cache.
+"""
+from decimal import Decimal
+from threading import Barrier, Thread
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import cache
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def recipe_detail(recipe_id):
+    """Return the recipe detail url."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample title',
+        'time_minutes': 5,
+        'price': Decimal('5.12'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching read responses per user."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        """Test an unchanged list costs only the data version lookup."""
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, first.data)
+
+    def test_query_params_normalized(self):
+        """Test the order of query parameters does not matter."""
+        self.client.get(RECIPES_URL + '?page_size=5&match=any')
+
+        with self.assertNumQueries(1):
+            self.client.get(RECIPES_URL + '?match=any&page_size=5')
+
+    def test_different_params_cached_separately(self):
+        """Test different filters are different cache entries."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag.id}'})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_create_invalidates(self):
+        """Test creating a recipe through the API clears the cache."""
+        self.client.get(RECIPES_URL)
+        payload = {
+            'title': 'New',
+            'time_minutes': 5,
+            'price': Decimal('1.00'),
+        }
+        self.client.post(RECIPES_URL, payload)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tag_update_invalidates_recipe_detail(self):
+        """Test renaming a tag refreshes recipes showing it."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        self.client.get(recipe_detail(recipe.id))
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Plant'}
+        )
+        res = self.client.get(recipe_detail(recipe.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Plant')
+
+    def test_delete_invalidates(self):
+        """Test deleting a recipe through the API clears the cache."""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        self.client.delete(recipe_detail(recipe.id))
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_cache_per_user(self):
+        """Test users never see each other's cached responses."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        other = APIClient()
+        other.force_authenticate(create_user(email='other@example.com'))
+
+        res = other.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_errors_not_cached(self):
+        """Test error responses are recomputed."""
+        self.client.get(recipe_detail(0))
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(recipe_detail(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_stream_not_cached(self):
+        """Test streamed lists bypass the cache."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.client.get(TAGS_URL, {'stream': 1})
+        res = self.client.get(TAGS_URL, {'stream': 1})
+
+        self.assertTrue(res.streaming)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False, 'ALIAS': 'responses'})
+    def test_cache_disabled(self):
+        """Test every request reaches the database when disabled."""
+        self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(2):
+            self.client.get(RECIPES_URL)
+
+    def test_write_outside_the_api_invalidates(self):
+        """Test writes that bypass the views, e.g. on another worker."""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        self.client.get(recipe_detail(recipe.id))
+
+        Recipe.objects.filter(pk=recipe.pk).update(title='Renamed')
+        create_recipe(user=self.user, title='Other')
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 2)
+        res = self.client.get(recipe_detail(recipe.id))
+        self.assertEqual(res.data['title'], 'Renamed')
+
+    def test_concurrent_misses_compute_once(self):
+        """Test only one of many concurrent misses computes the value."""
+        workers = 6
+        barrier = Barrier(workers)
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value', True
+
+        def read():
+            barrier.wait()
+            results.append(cache.get_or_compute('stampede-key', compute))
+
+        threads = [Thread(target=read) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * workers)
+
+
+class ConditionalRequestTests(TestCase):
+    """Test ETag / If-None-Match handling on read endpoints."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """Test a list matching the client's ETag is not resent."""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        # Only the data version is read.
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def test_detail_not_modified(self):
+        """Test a recipe matching the client's ETag is not resent."""
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(recipe_detail(recipe.id))['ETag']
+
+        res = self.client.get(
+            recipe_detail(recipe.id), HTTP_IF_NONE_MATCH=f'W/{etag}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_after_write(self):
+        """Test an update gives the recipe a new ETag."""
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(recipe_detail(recipe.id))['ETag']
+
+        self.client.patch(recipe_detail(recipe.id), {'title': 'New'})
+        res = self.client.get(
+            recipe_detail(recipe.id), HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['title'], 'New')
+
+    def test_etag_changes_after_write_outside_the_api(self):
+        """Test writes that bypass the views still change the ETag."""
+        recipe = create_recipe(user=self.user)
+        list_etag = self.client.get(RECIPES_URL)['ETag']
+        detail_etag = self.client.get(recipe_detail(recipe.id))['ETag']
+
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        create_recipe(user=self.user, title='Other')
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], list_etag)
+        res = self.client.get(
+            recipe_detail(recipe.id), HTTP_IF_NONE_MATCH=detail_etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], detail_etag)
+
+    def test_etag_survives_cache_loss(self):
+        """Test a lost cache, as on another worker, keeps ETags valid."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        caches['responses'].clear()
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_per_user(self):
+        """Test another user's ETag does not match."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = APIClient()
+        other.force_authenticate(create_user(email='other@example.com'))
+
+        res = other.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_differs_by_params(self):
+        """Test each filter combination has its own ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(
+            RECIPES_URL, {'search': 'soup'}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False, 'ALIAS': 'responses'})
+    def test_not_modified_without_response_cache(self):
+        """Test ETags work when response caching is turned off."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(RESPONSE_CACHE={
+        'ENABLED': True, 'ALIAS': 'responses', 'TIMEOUT': 60,
+        'LOCK_TIMEOUT': 30, 'POLL_INTERVAL': 0.01,
+    })
+    def test_waiters_stop_once_lock_released(self):
+        """Test waiters compute as soon as the lock goes without a value."""
+        caches['responses'].add('uncacheable-key:lock', 1)
+        results = []
+
+        def read():
+            results.append(cache.get_or_compute(
+                'uncacheable-key', lambda: ('value', False)
+            ))
+
+        thread = Thread(target=read)
+        thread.start()
+        time.sleep(0.1)
+        caches['responses'].delete('uncacheable-key:lock')
+        thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, ['value'])
+
+    def test_stream_takes_no_lock(self):
+        """Test streamed lists skip the cache lock entirely."""
+        with patch('recipe.cache.get_or_compute') as get_or_compute:
+            res = self.client.get(TAGS_URL, {'stream': 1})
+
+        self.assertTrue(res.streaming)
+        get_or_compute.assert_not_called()
@@ -0,0 +1,295 @@
+"""
+Tests for the bulk recipe import.
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.importer import RowError, import_recipes, read_csv, read_jsonl
+
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def jsonl(*rows):
+    """Return ``rows`` as JSON Lines bytes."""
+    return b''.join(json.dumps(row).encode() + b'\n' for row in rows)
+
+
+def recipe(title='Soup', **params):
+    """Return the data of an importable recipe."""
+    return {'title': title, 'time_minutes': 10, 'price': '4.50', **params}
+
+
+class ReaderTests(SimpleTestCase):
+    """Test rows are read from JSON Lines and CSV."""
+
+    def test_read_jsonl(self):
+        """Test objects are read and bad lines become errors."""
+        lines = [b'\xef\xbb\xbf{"title": "A"}\n', b'\n', b'[1]\n', b'{x\n',
+                 b'\xff\n']
+
+        rows = list(read_jsonl(lines))
+
+        self.assertEqual(rows[0], (1, {'title': 'A'}))
+        self.assertEqual([line for line, _ in rows], [1, 3, 4, 5])
+        for _, data in rows[1:]:
+            self.assertIsInstance(data, RowError)
+
+    def test_read_csv(self):
+        """Test records are read with their lists and end lines."""
+        lines = [
+            b'title,time_minutes,price,tags,link\n',
+            b'"Two\n', b'lines",5,1.00,"vegan, quick,",\n',
+            b'Stew,20,3.00,,\n',
+            b'Bad,1,1.00,a,b,extra\n',
+        ]
+
+        rows = list(read_csv(lines))
+
+        self.assertEqual(rows[0], (3, {
+            'title': 'Two\nlines', 'time_minutes': '5', 'price': '1.00',
+            'tags': [{'name': 'vegan'}, {'name': 'quick'}],
+        }))
+        self.assertEqual(rows[1], (4, {
+            'title': 'Stew', 'time_minutes': '20', 'price': '3.00',
+        }))
+        self.assertEqual(rows[2][0], 5)
+        self.assertIsInstance(rows[2][1], RowError)
+
+    def test_read_csv_invalid_utf8(self):
+        """Test only the record with undecodable bytes fails."""
+        lines = [b'title\n', b'A\xff\n', b'B\n']
+
+        rows = list(read_csv(lines))
+
+        self.assertIsInstance(rows[0][1], RowError)
+        self.assertEqual(rows[1], (3, {'title': 'B'}))
+
+
+class ImportRecipesTests(TestCase):
+    """Test recipes are validated and written in batches."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'Test123!'
+        )
+
+    def test_batch_queries(self):
+        """Test a batch costs the same queries whatever its size."""
+        rows = [
+            (i, recipe(f'Recipe {i}', tags=[{'name': f'tag {i % 7}'}],
+                       ingredients=[{'name': f'ing {i}'}]))
+            for i in range(1, 101)
+        ]
+
+        with self.assertNumQueries(11):
+            report = import_recipes(self.user, rows, batch_size=100)
+
+        self.assertEqual(report.created, 100)
+        self.assertEqual(Tag.objects.count(), 7)
+        self.assertEqual(Ingredient.objects.count(), 100)
+        self.assertEqual(Recipe.tags.through.objects.count(), 100)
+
+    def test_reuses_names_ignoring_case(self):
+        """Test existing items are linked and repeats are linked once."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        rows = [(1, recipe(tags=[{'name': 'vegan'}, {'name': 'VEGAN'}]))]
+
+        import_recipes(self.user, rows)
+
+        soup = Recipe.objects.get()
+        self.assertEqual(list(soup.tags.all()), [vegan])
+        self.assertEqual(soup.user, self.user)
+        self.assertEqual(soup.price, Decimal('4.50'))
+
+    def test_failed_rows_reported(self):
+        """Test invalid rows are skipped and the rest are imported."""
+        rows = [
+            (1, recipe('Good')),
+            (2, {'title': 'No time', 'price': '1.00'}),
+            (3, RowError({'non_field_errors': ['Invalid JSON.']})),
+            (4, recipe('Also good')),
+        ]
+
+        report = import_recipes(self.user, rows, batch_size=2, max_errors=1)
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(report.errors[0]['line'], 2)
+        self.assertIn('time_minutes', report.errors[0]['errors'])
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Also good', 'Good'],
+        )
+
+    def test_unresolved_names_fail_the_batch(self):
+        """Test a batch whose tags cannot be resolved is rolled back."""
+        rows = [
+            (1, recipe('Tagged', tags=[{'name': 'vegan'}])),
+            (2, recipe('Plain')),
+            (3, recipe('Next batch')),
+        ]
+
+        # Tag inserts that hit rows this transaction cannot see.
+        with patch.object(Tag.objects, 'bulk_create'):
+            report = import_recipes(self.user, rows, batch_size=2)
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([e['line'] for e in report.errors], [1, 2])
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Next batch'],
+        )
+
+
+@override_settings(RECIPE_IMPORT={'BATCH_SIZE': 2, 'MAX_ERRORS': 10})
+class ImportAPITests(TestCase):
+    """Test the bulk import endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'Test123!'
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, body, content_type):
+        return self.client.generic('POST', IMPORT_URL, body, content_type)
+
+    def titles(self):
+        """Return the titles of the user's recipes as the API lists them."""
+        res = self.client.get(RECIPES_URL)
+        return sorted(recipe['title'] for recipe in res.data['results'])
+
+    def test_auth_required(self):
+        """Test anonymous imports are refused."""
+        res = APIClient().post(IMPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_import_jsonl(self):
+        """Test a JSON Lines body is imported with a report of failures."""
+        body = jsonl(
+            recipe('A', tags=[{'name': 'quick'}]), recipe('B'),
+            {'title': 'C'}, recipe('D', ingredients=[{'name': 'salt'}]),
+        )
+
+        res = self.post(body, 'application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 3)
+        self.assertEqual(res.data['failed'], 1)
+        self.assertEqual(res.data['errors'][0]['line'], 3)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertTrue(Recipe.objects.filter(
+            title='D', ingredients__name='salt'
+        ).exists())
+
+    def test_cached_list_shows_each_batch(self):
+        """Test a list cached before an import shows every new batch."""
+        self.assertEqual(self.titles(), [])
+        seen = []
+
+        def rows():
+            yield 1, recipe('A')
+            yield 2, recipe('B')
+            # Read once the first batch has been written.
+            seen.append(self.titles())
+            yield 3, recipe('C')
+
+        import_recipes(self.user, rows(), batch_size=2)
+
+        self.assertEqual(seen, [['A', 'B']])
+        self.assertEqual(self.titles(), ['A', 'B', 'C'])
+
+    def test_cached_list_shows_imported_recipes(self):
+        """Test a list fetched before an import shows the new recipes."""
+        self.assertEqual(self.titles(), [])
+
+        self.post(jsonl(recipe('A'), recipe('B'), recipe('C')),
+                  'application/x-ndjson')
+
+        self.assertEqual(self.titles(), ['A', 'B', 'C'])
+
+    def test_import_csv(self):
+        """Test a CSV body is imported."""
+        body = b'title,time_minutes,price,tags\nA,5,1.00,"x,y"\n'
+
+        res = self.post(body, 'text/csv')
+
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(Recipe.objects.get().tags.count(), 2)
+
+    def test_import_file(self):
+        """Test an uploaded file is read by its extension."""
+        upload = SimpleUploadedFile(
+            'recipes.csv', b'title,time_minutes,price\nA,5,1.00\n'
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+
+    def test_no_input(self):
+        """Test a request without a body or file is a bad request."""
+        res = self.client.post(IMPORT_URL, {}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unsupported_type(self):
+        """Test other media types are refused."""
+        res = self.post(b'<recipes/>', 'application/xml')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+
+class ImportCommandTests(TestCase):
+    """Test the import_recipes command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'Test123!'
+        )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'recipes.jsonl')
+
+    def test_import_file(self):
+        """Test the file is imported and failed rows are printed."""
+        with open(self.path, 'wb') as out:
+            out.write(jsonl(recipe('A'), {'title': 'B'}))
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            'import_recipes', self.path, '--user', 'user@example.com',
+            stdout=out, stderr=err,
+        )
+
+        self.assertIn('Imported 1 recipes, 1 failed', out.getvalue())
+        self.assertIn('line 2:', err.getvalue())
+        self.assertEqual(Recipe.objects.get().user, self.user)
+
+    def test_unknown_user(self):
+        """Test an unknown owner is an error."""
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_recipes', self.path, '--user', 'nobody@example.com'
+            )
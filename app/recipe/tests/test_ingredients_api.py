@@ -2,6 +2,7 @@
 Test for the ingredients API.
 """
 from decimal import Decimal
+import json
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -62,7 +63,7 @@ class PrivateIngredientsAPITests(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test retrieving only ingredients owned by specific user."""
@@ -76,10 +77,10 @@ class PrivateIngredientsAPITests(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_update_ingredient(self):
         """Test updating an ingredient."""
@@ -121,8 +122,8 @@ class PrivateIngredientsAPITests(TestCase):
         s1 = IngredientSerializer(in1)
         s2 = IngredientSerializer(in2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filter_ingredients_unique(self):
         """Test filtered ingredients returns an unique list."""
@@ -145,4 +146,62 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_stream_assigned_ingredients(self):
+        """Test streaming honours the assigned_only filter."""
+        in1 = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Fries',
+            time_minutes=20,
+            price=Decimal('3.00')
+        )
+        recipe.ingredients.add(in1)
+
+        res = self.client.get(
+            INGREDIENTS_URL, {'stream': 1, 'assigned_only': 1}
+        )
+
+        data = json.loads(b''.join(res.streaming_content))
+        self.assertEqual(data, [{'id': in1.id, 'name': 'Salt'}])
+
+    def test_autocomplete_prefix_first(self):
+        """Test autocomplete ranks prefix matches before fuzzy ones."""
+        Ingredient.objects.create(user=self.user, name='Green tomato')
+        Ingredient.objects.create(user=self.user, name='Tomato')
+        Ingredient.objects.create(user=self.user, name='Carrot')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'tom'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['name'], 'Tomato')
+        self.assertNotIn('Carrot', [i['name'] for i in res.data])
+
+    def test_autocomplete_fuzzy_match(self):
+        """Test autocomplete tolerates typos."""
+        Ingredient.objects.create(user=self.user, name='Mozzarella')
+        Ingredient.objects.create(user=self.user, name='Carrot')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'mozarela'})
+
+        self.assertEqual([i['name'] for i in res.data], ['Mozzarella'])
+
+    def test_autocomplete_limit(self):
+        """Test autocomplete returns at most ``limit`` matches."""
+        for i in range(5):
+            Ingredient.objects.create(user=self.user, name=f'Pepper {i}')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'pepper', 'limit': 3})
+
+        self.assertEqual(len(res.data), 3)
+
+    def test_autocomplete_limited_to_user(self):
+        """Test autocomplete only matches the user's ingredients."""
+        other_user = create_user(email='other@example.com')
+        Ingredient.objects.create(user=other_user, name='Basil')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'basil'})
+
+        self.assertEqual(res.data, [])
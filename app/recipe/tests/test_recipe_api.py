@@ -8,12 +8,21 @@ import os
 from PIL import Image
 
 from core.models import Recipe, Tag, Ingredient
-from django.test import TestCase
+from threading import Barrier, Thread
+from unittest.mock import patch
+
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    get_or_create_by_name,
+)
 
 RECIPES_URL = reverse('recipe:recipe-list')
 
@@ -80,7 +89,7 @@ class PrivateRecipeAPITest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_limited_to_user(self):
         """Test that the recipe return only if the user is owner."""
@@ -97,7 +106,7 @@ class PrivateRecipeAPITest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         """Test get recipe detail."""
@@ -259,6 +268,36 @@ class PrivateRecipeAPITest(TestCase):
             )
             self.assertTrue(exists)
 
+    def test_create_recipe_with_duplicate_tag_names(self):
+        """Test repeated tag names in a payload create a single tag."""
+        payload = {
+            'title': 'My Recipe',
+            'time_minutes': 30,
+            'price': Decimal('23.55'),
+            'tags': [{'name': 'Tag1'}, {'name': 'Tag1'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_create_recipe_reuses_tag_ignoring_case(self):
+        """Test a tag is matched by name regardless of case."""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        payload = {
+            'title': 'My Recipe',
+            'time_minutes': 30,
+            'price': Decimal('23.55'),
+            'tags': [{'name': 'breakfast'}, {'name': 'BREAKFAST'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
     def test_create_tag_on_update(self):
         """Test creating a new tag when user updates a recipe."""
         recipe = create_recipe(user=self.user)
@@ -303,6 +342,119 @@ class PrivateRecipeAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_update_unchanged_tags_writes_nothing(self):
+        """Test resending the same tags does not touch the links."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Tag1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag2')
+        recipe.tags.add(tag1, tag2)
+        payload = {'tags': [{'name': 'Tag2'}, {'name': 'Tag1'}]}
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                recipe_detail(recipe.id), payload, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            if 'core_recipe_tags' in query['sql']:
+                self.assertTrue(query['sql'].startswith('SELECT'))
+        self.assertEqual(set(recipe.tags.all()), {tag1, tag2})
+
+    def test_update_tags_only_changes_difference(self):
+        """Test replacing tags keeps the links that are still wanted."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Tag1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag2')
+        recipe.tags.add(tag1, tag2)
+        kept = recipe.tags.through.objects.get(recipe=recipe, tag=tag1)
+        payload = {'tags': [{'name': 'Tag1'}, {'name': 'Tag3'}]}
+
+        res = self.client.patch(
+            recipe_detail(recipe.id), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Tag1', 'Tag3'},
+        )
+        self.assertTrue(
+            recipe.tags.through.objects.filter(id=kept.id).exists()
+        )
+
+    def test_add_and_remove_tags_on_update(self):
+        """Test adding and removing single tags without the full list."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Tag1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag2')
+        recipe.tags.add(tag1, tag2)
+        payload = {
+            'add_tags': [{'name': 'Tag3'}],
+            'remove_tags': [{'name': 'Tag1'}],
+        }
+
+        res = self.client.patch(
+            recipe_detail(recipe.id), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Tag2', 'Tag3'},
+        )
+        self.assertNotIn('add_tags', res.data)
+        self.assertTrue(Tag.objects.filter(id=tag1.id).exists())
+
+    def test_add_and_remove_ingredients_on_update(self):
+        """Test adding and removing single ingredients."""
+        recipe = create_recipe(user=self.user)
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.ingredients.add(salt)
+        payload = {
+            'add_ingredients': [{'name': 'Pepper'}],
+            'remove_ingredients': [{'name': 'Salt'}],
+        }
+
+        res = self.client.patch(
+            recipe_detail(recipe.id), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(recipe.ingredients.values_list('name', flat=True)),
+            ['Pepper'],
+        )
+
+    def test_tags_with_add_tags_returns_error(self):
+        """Test replacing and adding tags in one request is rejected."""
+        recipe = create_recipe(user=self.user)
+        payload = {
+            'tags': [{'name': 'Tag1'}],
+            'add_tags': [{'name': 'Tag2'}],
+        }
+
+        res = self.client.patch(
+            recipe_detail(recipe.id), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(recipe.tags.exists())
+
+    def test_add_tags_on_create_returns_error(self):
+        """Test add/remove operations are rejected when creating."""
+        payload = {
+            'title': 'My Recipe',
+            'time_minutes': 30,
+            'price': Decimal('23.55'),
+            'add_tags': [{'name': 'Tag1'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_create_recipe_with_new_ingredients(self):
         """Test creating a recipe with new ingredients."""
         payload = {
@@ -407,9 +559,9 @@ class PrivateRecipeAPITest(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering by Ingredients."""
@@ -427,9 +579,331 @@ class PrivateRecipeAPITest(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_all_tags(self):
+        """Test match=all only returns recipes with every tag."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        r1 = create_recipe(user=self.user, title='Salad')
+        r1.tags.add(tag1, tag2)
+        r2 = create_recipe(user=self.user, title='Curry')
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [r1.id]
+        )
+
+    def test_filter_by_all_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ing1 = Ingredient.objects.create(user=self.user, name='Lentils')
+        ing2 = Ingredient.objects.create(user=self.user, name='Rice')
+        r1 = create_recipe(user=self.user, title='Dal')
+        r1.tags.add(tag)
+        r1.ingredients.add(ing1, ing2)
+        r2 = create_recipe(user=self.user, title='Rice bowl')
+        r2.tags.add(tag)
+        r2.ingredients.add(ing2)
+
+        params = {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ing1.id},{ing2.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [r1.id]
+        )
+
+    def test_exclude_tags(self):
+        """Test -tags removes recipes linked to any of the given tags."""
+        tag1 = Tag.objects.create(user=self.user, name='Meat')
+        tag2 = Tag.objects.create(user=self.user, name='Fish')
+        r1 = create_recipe(user=self.user, title='Steak')
+        r1.tags.add(tag1)
+        r2 = create_recipe(user=self.user, title='Sushi')
+        r2.tags.add(tag2)
+        r3 = create_recipe(user=self.user, title='Salad')
+
+        res = self.client.get(RECIPES_URL, {'-tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [r3.id]
+        )
+
+    def test_include_and_exclude_ingredients(self):
+        """Test combining ingredient filters with exclusions."""
+        ing1 = Ingredient.objects.create(user=self.user, name='Rice')
+        ing2 = Ingredient.objects.create(user=self.user, name='Chicken')
+        r1 = create_recipe(user=self.user, title='Rice bowl')
+        r1.ingredients.add(ing1)
+        r2 = create_recipe(user=self.user, title='Chicken rice')
+        r2.ingredients.add(ing1, ing2)
+
+        params = {'ingredients': f'{ing1.id}', '-ingredients': f'{ing2.id}'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [r1.id]
+        )
+
+    def test_filter_uses_exists_without_distinct(self):
+        """Test filtering recipes is done with EXISTS, not DISTINCT."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                RECIPES_URL, {'tags': f'{tag.id}', 'match': 'all'}
+            )
+
+        self.assertEqual(len(res.data['results']), 1)
+        sql = next(
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "core_recipe"' in query['sql']
+        )
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_invalid_match_returns_error(self):
+        """Test an unknown match mode is rejected."""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        """Test searching recipes by title and description."""
+        r1 = create_recipe(user=self.user, title='Spicy Lentil Soup')
+        r2 = create_recipe(
+            user=self.user,
+            title='Weeknight Dal',
+            description='A quick lentil stew.',
+        )
+        create_recipe(user=self.user, title='Fish and Chips')
+
+        res = self.client.get(RECIPES_URL, {'search': 'lentils'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [r1.id, r2.id],
+        )
+
+    def test_search_limited_to_user(self):
+        """Test search only returns the user's recipes."""
+        other_user = create_user(email='other@example.com', password='x')
+        create_recipe(user=other_user, title='Lentil Soup')
+        recipe = create_recipe(user=self.user, title='Lentil Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'lentil'})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [recipe.id]
+        )
+
+    def test_search_with_tag_filter(self):
+        """Test search combines with the tag filter."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        r1 = create_recipe(user=self.user, title='Lentil Soup')
+        r1.tags.add(tag)
+        create_recipe(user=self.user, title='Lentil and Bacon Soup')
+
+        res = self.client.get(
+            RECIPES_URL, {'search': 'soup', 'tags': f'{tag.id}'}
+        )
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [r1.id]
+        )
+
+    def test_search_sees_updated_title(self):
+        """Test the search index follows title changes."""
+        recipe = create_recipe(user=self.user, title='Pancakes')
+        self.client.patch(recipe_detail(recipe.id), {'title': 'Waffles'})
+
+        res = self.client.get(RECIPES_URL, {'search': 'waffles'})
+        self.assertEqual(len(res.data['results']), 1)
+        res = self.client.get(RECIPES_URL, {'search': 'pancakes'})
+        self.assertEqual(len(res.data['results']), 0)
+
+    def test_search_paginated_by_rank(self):
+        """Test walking ranked search results page by page."""
+        for i in range(4):
+            create_recipe(user=self.user, title=f'Soup {i}')
+        for i in range(3):
+            create_recipe(
+                user=self.user, title=f'Stew {i}', description='Not a soup.'
+            )
+
+        ids = []
+        url = RECIPES_URL
+        params = {'search': 'soup', 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            ids += [recipe['id'] for recipe in res.data['results']]
+            url, params = res.data['next'], None
+
+        full = self.client.get(RECIPES_URL, {'search': 'soup'})
+        expected = [recipe['id'] for recipe in full.data['results']]
+        self.assertEqual(len(expected), 7)
+        self.assertEqual(ids, expected)
+        titles = [Recipe.objects.get(id=i).title for i in ids]
+        self.assertTrue(all(t.startswith('Soup') for t in titles[:4]))
+
+    def test_previous_page_link(self):
+        """Test following the previous link returns the prior page."""
+        for _ in range(5):
+            create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+
+        res = self.client.get(second.data['previous'])
+
+        self.assertEqual(res.data['results'], first.data['results'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_invalid_cursor_returns_not_found(self):
+        """Test a tampered cursor is rejected."""
+        res = self.client.get(RECIPES_URL, {'cursor': 'cD1ub3Rqc29u'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipes_paginated(self):
+        """Test walking every page of recipes with the cursor."""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        ids = []
+        url = RECIPES_URL
+        params = {'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids += [recipe['id'] for recipe in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(ids, sorted([r.id for r in recipes], reverse=True))
+
+    def test_pagination_avoids_count_and_offset(self):
+        """Test later pages use keyset lookups instead of COUNT/OFFSET."""
+        for _ in range(5):
+            create_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(res.data['results']), 2)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_filtered_pagination_unique(self):
+        """Test paging a filtered list returns each recipe once."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        for _ in range(3):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(tag1, tag2)
+
+        ids = []
+        url = RECIPES_URL
+        params = {'tags': f'{tag1.id},{tag2.id}', 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            ids += [recipe['id'] for recipe in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 3)
+
+
+class ConcurrentNameResolutionTests(TransactionTestCase):
+    """Test resolving tag names from concurrent requests."""
+
+    def test_concurrent_requests_share_one_tag(self):
+        """Test racing requests for the same name create a single tag."""
+        user = create_user(email='user@example.com', password='Test123!')
+        workers = 8
+        barrier = Barrier(workers)
+        results = []
+
+        def resolve(name):
+            try:
+                barrier.wait()
+                tags = get_or_create_by_name(Tag, user, [{'name': name}])
+                results.append(tags[0].id)
+            finally:
+                connection.close()
+
+        threads = [
+            Thread(target=resolve, args=(name,))
+            for name in ['Vegan', 'vegan'] * (workers // 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Tag.objects.filter(user=user).count(), 1)
+        self.assertEqual(len(results), workers)
+        self.assertEqual(set(results), {Tag.objects.get(user=user).id})
+
+
+class UnresolvedNameTests(TestCase):
+    """Test names that are neither found nor created are not dropped."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='Test123!')
+        self.client.force_authenticate(self.user)
+        # Inserts that hit a conflicting row this transaction cannot see.
+        lost_insert = patch.object(Tag.objects, 'bulk_create')
+        lost_insert.start()
+        self.addCleanup(lost_insert.stop)
+
+    def test_get_or_create_by_name_raises(self):
+        """Test an unresolved name raises instead of being left out."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        with self.assertRaisesMessage(IntegrityError, 'Quick'):
+            get_or_create_by_name(
+                Tag, self.user, [{'name': 'vegan'}, {'name': 'Quick'}]
+            )
+
+    def test_create_recipe_rolled_back(self):
+        """Test the recipe is not saved without its tags."""
+        payload = {
+            'title': 'Curry', 'time_minutes': 30, 'price': Decimal('5.50'),
+            'tags': [{'name': 'Quick'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_update_recipe_rolled_back(self):
+        """Test an update is not half applied."""
+        recipe = create_recipe(user=self.user, title='Curry')
+        payload = {'title': 'Stew', 'tags': [{'name': 'Quick'}]}
+
+        res = self.client.patch(
+            recipe_detail(recipe.id), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Curry')
 
 
 class ImageUploadTests(TestCase):
@@ -469,3 +943,115 @@ class ImageUploadTests(TestCase):
 
         res = self.client.post(url, payload, format='multipart')
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryBudgetTests(TestCase):
+    """Test the recipe API runs a fixed number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='Test123!')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """Create recipes each linked to a tag and an ingredient."""
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+
+    def test_list_query_budget(self):
+        """Test listing recipes does not run a query per recipe."""
+        self._create_recipes(10)
+
+        # The data version, the page and one prefetch per relation.
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
+        self.assertEqual(len(res.data['results'][0]['tags']), 1)
+        self.assertEqual(len(res.data['results'][0]['ingredients']), 1)
+
+    def test_filtered_list_query_budget(self):
+        """Test filtering recipes does not run a query per recipe."""
+        self._create_recipes(10)
+        tag_ids = ','.join(str(tag.id) for tag in Tag.objects.all())
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL, {'tags': tag_ids})
+
+        self.assertEqual(len(res.data['results']), 10)
+
+    def test_detail_query_budget(self):
+        """Test retrieving a recipe runs a fixed number of queries."""
+        self._create_recipes(1)
+        recipe = Recipe.objects.get(user=self.user)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(recipe_detail(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_query_budget(self):
+        """Test creating a recipe runs a fixed number of queries."""
+        payload = {
+            'title': 'My Recipe',
+            'time_minutes': 30,
+            'price': Decimal('23.55'),
+        }
+
+        # Includes the savepoint and release around the write.
+        with self.assertNumQueries(5):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_update_query_budget(self):
+        """Test updating a recipe runs a fixed number of queries."""
+        self._create_recipes(1)
+        recipe = Recipe.objects.get(user=self.user)
+        payload = {'title': 'New title'}
+
+        with self.assertNumQueries(6):
+            res = self.client.patch(recipe_detail(recipe.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_with_nested_query_budget(self):
+        """Test creating with many tags/ingredients is a fixed cost."""
+        Tag.objects.create(user=self.user, name='Tag 0')
+        Ingredient.objects.create(user=self.user, name='Ing 0')
+        payload = {
+            'title': 'My Recipe',
+            'time_minutes': 30,
+            'price': Decimal('23.55'),
+            'tags': [{'name': f'Tag {i}'} for i in range(30)],
+            'ingredients': [{'name': f'Ing {i}'} for i in range(30)],
+        }
+
+        with self.assertNumQueries(13):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tags']), 30)
+        self.assertEqual(len(res.data['ingredients']), 30)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 30)
+
+    def test_update_with_nested_query_budget(self):
+        """Test replacing many tags is a fixed cost."""
+        self._create_recipes(1)
+        recipe = Recipe.objects.get(user=self.user)
+        payload = {'tags': [{'name': f'New {i}'} for i in range(30)]}
+
+        with self.assertNumQueries(12):
+            res = self.client.patch(
+                recipe_detail(recipe.id), payload, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 30)
@@ -2,15 +2,19 @@
 Test for tags API.
 """
 from decimal import Decimal
+import json
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core import models
+from recipe.filters import autocomplete
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
@@ -58,7 +62,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_for_user(self):
         """Test retreiving tags is limited to authenticated user."""
@@ -69,9 +73,9 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(tag.name, res.data[0]['name'])
-        self.assertEqual(tag.id, res.data[0]['id'])
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(tag.name, res.data['results'][0]['name'])
+        self.assertEqual(tag.id, res.data['results'][0]['id'])
 
     def test_update_tag(self):
         """Test updating a tag with PATCH."""
@@ -85,6 +89,19 @@ class PrivateTagsAPITests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_to_existing_name_returns_error(self):
+        """Test renaming a tag to a name the user already has."""
+        models.Tag.objects.create(name="Vegan", user=self.user)
+        tag = models.Tag.objects.create(name="My tag", user=self.user)
+
+        payload = {"name": "vegan"}
+        url = detail_url(tag.id)
+        res = self.client.patch(url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "My tag")
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = models.Tag.objects.create(user=self.user, name="My Tag")
@@ -113,8 +130,8 @@ class PrivateTagsAPITests(TestCase):
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_tags_unique(self):
         """Test filtered tags returns a unique list."""
@@ -137,4 +154,188 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_paginated(self):
+        """Test walking every page of tags with the cursor."""
+        for name in ['Apple', 'Banana', 'Cherry', 'Date', 'Elderberry']:
+            models.Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        url = TAGS_URL
+        params = {'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            names += [tag['name'] for tag in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(
+            names, ['Elderberry', 'Date', 'Cherry', 'Banana', 'Apple']
+        )
+
+    def test_stream_tags(self):
+        """Test streaming returns every tag as a single JSON list."""
+        for i in range(5):
+            models.Tag.objects.create(user=self.user, name=f'Tag{i}')
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=other_user, name='Other')
+
+        res = self.client.get(TAGS_URL, {'stream': 1, 'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        data = json.loads(b''.join(res.streaming_content))
+        tags = models.Tag.objects.filter(user=self.user).order_by('-name')
+        self.assertEqual(data, TagSerializer(tags, many=True).data)
+
+    def test_stream_empty(self):
+        """Test streaming with no tags returns an empty list."""
+        res = self.client.get(TAGS_URL, {'stream': 1})
+
+        self.assertEqual(json.loads(b''.join(res.streaming_content)), [])
+
+    def test_autocomplete_tags(self):
+        """Test autocomplete returns the best matching tags."""
+        models.Tag.objects.create(user=self.user, name='Breakfast')
+        models.Tag.objects.create(user=self.user, name='Brunch')
+        models.Tag.objects.create(user=self.user, name='Dinner')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL, {'q': 'br'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [tag['name'] for tag in res.data], ['Breakfast', 'Brunch']
+        )
+        # The data version, then the matches.
+        self.assertEqual(len(queries.captured_queries), 2)
+
+    def test_autocomplete_invalid_limit(self):
+        """Test a non-numeric limit is rejected."""
+        res = self.client.get(TAGS_URL, {'q': 'br', 'limit': 'all'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AutocompleteIndexTests(TestCase):
+    """Test autocomplete is answered by the trigram index on name."""
+
+    def setUp(self):
+        self.user = create_user()
+        models.Tag.objects.bulk_create([
+            models.Tag(user=self.user, name=name)
+            for name in ['Brunch', 'BR_unch', '50% off', '500 grams']
+        ] + [
+            models.Tag(user=self.user, name=f'Tag {i}') for i in range(500)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_tag')
+            # Make the planner show whether an index can serve the filter.
+            cursor.execute('SET enable_seqscan = off')
+        self.addCleanup(self._reset_seqscan)
+
+    def _reset_seqscan(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def assertUsesTrigramIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertIn('tag_name_trgm_idx', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_prefix_uses_index(self):
+        """Test the prefix match compiles to an indexable ILIKE."""
+        queryset = models.Tag.objects.filter(name__iprefix='br')
+
+        self.assertIn('ILIKE', str(queryset.query))
+        self.assertUsesTrigramIndex(queryset)
+
+    def test_autocomplete_uses_index(self):
+        """Test both the prefix and the fuzzy branch use the index."""
+        self.assertUsesTrigramIndex(autocomplete(models.Tag.objects, 'br'))
+
+    def test_prefix_escapes_wildcards(self):
+        """Test % and _ in the text match only themselves."""
+        tags = models.Tag.objects.filter(user=self.user)
+
+        self.assertEqual(
+            list(tags.filter(name__iprefix='br_').values_list(
+                'name', flat=True
+            )),
+            ['BR_unch'],
+        )
+        self.assertEqual(
+            list(tags.filter(name__iprefix='50%').values_list(
+                'name', flat=True
+            )),
+            ['50% off'],
+        )
+
+
+class AssignedOnlyBenchmarkTests(TestCase):
+    """Benchmark the assigned_only filter against recipe link growth."""
+
+    tag_count = 50
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = models.Tag.objects.bulk_create([
+            models.Tag(user=self.user, name=f'Tag {i}')
+            for i in range(self.tag_count)
+        ])
+
+    def _link_recipes(self, recipe_count):
+        """Link every tag to ``recipe_count`` new recipes."""
+        recipes = models.Recipe.objects.bulk_create([
+            models.Recipe(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            for i in range(recipe_count)
+        ])
+        through = models.Recipe.tags.through
+        through.objects.bulk_create([
+            through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes for tag in self.tags
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_tag, core_recipe_tags')
+
+    def _rows_processed(self):
+        """Return the rows every plan node of the tag list handled."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data['results']), self.tag_count)
+        self.assertEqual(len(queries.captured_queries), 2)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN (ANALYZE, FORMAT JSON) '
+                + queries.captured_queries[-1]['sql']
+            )
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        def walk(node):
+            rows = node['Actual Rows'] * node['Actual Loops']
+            return rows + sum(walk(n) for n in node.get('Plans', []))
+
+        return walk(plan[0]['Plan'])
+
+    def test_assigned_only_scales_with_tags_not_links(self):
+        """Test 100x more recipe links does not add work to the query."""
+        self._link_recipes(2)
+        sparse = self._rows_processed()
+
+        self._link_recipes(198)
+        dense = self._rows_processed()
+
+        self.assertLessEqual(dense, sparse)
+        self.assertLess(dense, self.tag_count * 10)
@@ -5,6 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from recipe import views
+from recipe.async_views import async_reads
 
 router = DefaultRouter()
 router.register('recipes', views.RecipeViewSet)
@@ -16,3 +17,8 @@ app_name = 'recipe'
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+# Served in place of urlpatterns by the ASGI application, see app/asgi.py.
+async_urlpatterns = [
+    path('', include(async_reads(router.urls))),
+]
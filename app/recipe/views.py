@@ -1,26 +1,52 @@
 """
 Views for recipe API.
 """
+import json
+
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
     OpenApiTypes,
+    inline_serializer,
 )
 from rest_framework import (
+    fields,
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from recipe import serializers
+from rest_framework.utils.encoders import JSONEncoder
+from recipe import importer, serializers
+from recipe.cache import cached_read
+from recipe.filters import (
+    assigned_to_recipe,
+    autocomplete,
+    linked_to,
+    ranked_search,
+)
+from recipe.pagination import (
+    RecipeAttrCursorPagination,
+    RecipeCursorPagination,
+)
+from recipe.parsers import CSVParser, JSONLinesParser
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
+from core.profiling import ProfiledViewMixin
+from core.slow_queries import SlowQueryLogMixin
+from core.tracing import TracedViewMixin, traced
 from rest_framework.authentication import TokenAuthentication
+from user.authentication import SignedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 
@@ -36,33 +62,83 @@ from rest_framework.permissions import IsAuthenticated
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter.'
-            )
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Search titles and descriptions, best match first.'
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Match any (default) or all of the given IDs.'
+            ),
+            OpenApiParameter(
+                '-tags',
+                OpenApiTypes.STR,
+                description='Comma separated list of tag IDs to exclude.'
+            ),
+            OpenApiParameter(
+                '-ingredients',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs to skip.'
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    SlowQueryLogMixin,
+    TracedViewMixin,
+    ProfiledViewMixin,
+    viewsets.ModelViewSet,
+):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication, TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
 
+    @traced
     def get_queryset(self):
         """Return recipes to authenticated users."""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        params = self.request.query_params
+        match = params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': [_('Must be "any" or "all".')]})
+
+        queryset = self.queryset.filter(user=self.request.user)
+        for field in ('tags', 'ingredients'):
+            if params.get(field):
+                ids = self._params_to_ints(params[field])
+                queryset = queryset.filter(
+                    linked_to(field, ids, match_all=match == 'all')
+                )
+            if params.get(f'-{field}'):
+                ids = self._params_to_ints(params[f'-{field}'])
+                queryset = queryset.filter(~linked_to(field, ids))
+
+        queryset = queryset.defer('search_vector')
+        if params.get('search'):
+            queryset = ranked_search(
+                queryset, params['search']
+            ).order_by('-rank', '-id')
+        else:
+            queryset = queryset.order_by('-id')
 
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        if self.action in ('list', 'retrieve'):
+            # Writes discard the prefetch cache before rendering.
+            queryset = queryset.prefetch_related('tags', 'ingredients')
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        return queryset
+
+    @cached_read
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_read
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
@@ -74,12 +150,31 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'import_recipes':
+            return serializers.RecipeImportSerializer
 
         return self.serializer_class
 
+    def _save(self, serializer, **kwargs):
+        """Save the recipe together with its tags and ingredients.
+
+        A name that cannot be resolved rolls back the whole write instead
+        of saving the recipe without it.
+        """
+        try:
+            with transaction.atomic():
+                serializer.save(**kwargs)
+        except IntegrityError:
+            msg = _('Tags or ingredients changed while saving, try again.')
+            raise ValidationError({'non_field_errors': [msg]})
+
     def perform_create(self, serializer):
         """Create new Recipe."""
-        serializer.save(user=self.request.user)
+        self._save(serializer, user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Update a recipe."""
+        self._save(serializer)
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -93,6 +188,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request={
+            'application/x-ndjson': OpenApiTypes.BINARY,
+            'text/csv': OpenApiTypes.BINARY,
+            'multipart/form-data': inline_serializer(
+                'RecipeImportUpload', {'file': fields.FileField()}
+            ),
+        },
+        responses={200: OpenApiTypes.OBJECT},
+        description=(
+            'Create recipes from a JSON Lines or CSV body, or an uploaded '
+            'file. Rows are written in batches and the ones that fail are '
+            'reported with their line number and errors.'
+        ),
+    )
+    @action(
+        methods=['POST'], detail=False, url_path='import',
+        parser_classes=[JSONLinesParser, CSVParser, MultiPartParser],
+    )
+    def import_recipes(self, request):
+        """Import many recipes at once."""
+        rows = request.data.get('rows')
+        if rows is None:
+            upload = request.data.get('file')
+            if not upload:
+                msg = _('Send a JSON Lines or CSV body or file.')
+                raise ValidationError({'file': [msg]})
+            rows = importer.READERS[importer.format_of(upload.name)](upload)
+        report = importer.import_recipes(request.user, rows)
+
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -101,41 +228,118 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            OpenApiParameter(
+                'stream',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Stream every item as one unpaginated JSON list.'
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Return the best name matches for autocomplete.'
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Number of autocomplete matches (default 10).'
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    SlowQueryLogMixin,
+    TracedViewMixin,
+    ProfiledViewMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet
 ):
     """Base viewset for recipe attributes."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication, TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+    # Name of the Recipe many-to-many field pointing at ``queryset.model``.
+    recipe_field = None
+    autocomplete_limit = 10
+    max_autocomplete_limit = 50
+    stream_chunk_size = 2000
 
+    @traced
     def get_queryset(self):
         """Return tags that below to the authenticated user."""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(assigned_to_recipe(self.recipe_field))
+
+        return queryset.order_by('-name', '-id')
+
+    @cached_read
+    def list(self, request, *args, **kwargs):
+        """List the user's items, or the top matches when ``q`` is given."""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            if request.query_params.get('stream') == '1':
+                return self._stream(self.get_queryset())
+            return super().list(request, *args, **kwargs)
+
+        try:
+            limit = int(request.query_params.get(
+                'limit', self.autocomplete_limit
+            ))
+        except ValueError:
+            raise ValidationError({'limit': [_('Must be an integer.')]})
+        limit = max(1, min(limit, self.max_autocomplete_limit))
+
+        matches = autocomplete(self.get_queryset(), text)[:limit]
+        serializer = self.get_serializer(matches, many=True)
+        return Response(serializer.data)
+
+    def _stream(self, queryset):
+        """Return a JSON list response written while rows are read.
+
+        Rows come from a server-side cursor in chunks and are encoded one
+        at a time, so memory use does not grow with the number of items.
+        """
+        serializer = self.get_serializer()
+
+        def encode():
+            yield '['
+            rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+            for i, obj in enumerate(rows):
+                item = json.dumps(
+                    serializer.to_representation(obj), cls=JSONEncoder
+                )
+                yield f',{item}' if i else item
+            yield ']'
+
+        return StreamingHttpResponse(
+            encode(), content_type='application/json'
+        )
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+    def perform_update(self, serializer):
+        """Update the item, rejecting a name the user already has."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            msg = _('An item with this name already exists.')
+            raise ValidationError({'name': [msg]})
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """View for manage tag APIs."""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage Ingredient in the database."""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
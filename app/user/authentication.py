@@ -0,0 +1,164 @@
+"""
+Stateless signed tokens for the user API.
+"""
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from rest_framework import authentication, exceptions
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+def _salt(kind):
+    return f'user.authentication.{kind}'
+
+
+def _lifetime(kind):
+    return settings.SIGNED_TOKENS[f'{kind.upper()}_LIFETIME']
+
+
+def _revocations():
+    return caches[settings.SIGNED_TOKENS['REVOCATION_CACHE']]
+
+
+def _token_key(jti):
+    return f'user-auth:revoked:{jti}'
+
+
+def _user_key(user_id):
+    return f'user-auth:not-before:{user_id}'
+
+
+def _load_not_before(user_id):
+    """Return the user's revoke-all time from the database and cache it.
+
+    Deleted and deactivated users get an infinite time, which fails every
+    token they hold. The value is cached for the access token lifetime,
+    so a deactivation is noticed within that time.
+    """
+    row = get_user_model().objects.filter(pk=user_id).values_list(
+        'is_active', 'tokens_revoked_at'
+    ).first()
+    if row is None or not row[0]:
+        not_before = math.inf
+    else:
+        not_before = row[1].timestamp() if row[1] else 0
+    _revocations().add(
+        _user_key(user_id), not_before, timeout=_lifetime(ACCESS)
+    )
+
+    return not_before
+
+
+def issue_token(user, kind):
+    """Return a new signed ``kind`` token for ``user``."""
+    claims = {'uid': user.pk, 'jti': uuid.uuid4().hex, 'iat': time.time()}
+    return signing.dumps(claims, salt=_salt(kind))
+
+
+def issue_tokens(user):
+    """Return a new access and refresh token pair for ``user``."""
+    return {
+        ACCESS: issue_token(user, ACCESS),
+        REFRESH: issue_token(user, REFRESH),
+    }
+
+
+def verify_token(token, kind):
+    """Return the user and claims of a valid, unrevoked ``kind`` token.
+
+    The signature and expiry are checked in memory, and both the token's
+    own revocation and the user's revoke-all time are read from the
+    revocation cache with a single ``get_many``. Only a cache miss for the
+    revoke-all time reads the database. The user is built from the
+    claims: it holds the primary key and loads other fields when first
+    read.
+    """
+    try:
+        claims = signing.loads(
+            token, salt=_salt(kind), max_age=_lifetime(kind)
+        )
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed(_('Token has expired.'))
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    token_key, user_key = _token_key(claims['jti']), _user_key(claims['uid'])
+    revoked = _revocations().get_many([token_key, user_key])
+    if token_key in revoked:
+        raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+    not_before = revoked.get(user_key)
+    if not_before is None:
+        not_before = _load_not_before(claims['uid'])
+    if claims['iat'] <= not_before:
+        raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+
+    user = get_user_model().from_db(
+        DEFAULT_DB_ALIAS, ['id'], [claims['uid']]
+    )
+
+    return user, claims
+
+
+def revoke_token(claims, kind):
+    """Revoke one token until it would have expired anyway."""
+    remaining = claims['iat'] + _lifetime(kind) - time.time()
+    if remaining > 0:
+        _revocations().set(
+            _token_key(claims['jti']), True, timeout=math.ceil(remaining)
+        )
+
+
+def revoke_user_tokens(user):
+    """Revoke every token issued to ``user`` up to now.
+
+    The time is kept on the user's row, which survives cache restarts,
+    and is written to the revocation cache that verify_token() reads.
+    """
+    now = timezone.now()
+    get_user_model().objects.filter(pk=user.pk).update(
+        tokens_revoked_at=now
+    )
+    _revocations().set(
+        _user_key(user.pk), now.timestamp(), timeout=_lifetime(ACCESS)
+    )
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate ``Authorization: Bearer <access token>`` headers.
+
+    The token is verified without touching the database; see
+    verify_token(). ``request.user`` holds only the primary key, which is
+    all the recipe views need to scope their querysets, and loads its
+    other fields when first read. ``request.auth`` holds the token claims.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            msg = _('Invalid token header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return verify_token(token, ACCESS)
+
+    def authenticate_header(self, request):
+        return self.keyword
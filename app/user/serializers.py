@@ -8,9 +8,20 @@ from django.contrib.auth import (
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.profiling import ProfiledSerializerMixin
+from user.authentication import (
+    REFRESH,
+    revoke_user_tokens,
+    verify_token,
+)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(
+    ProfiledSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for the user object."""
 
     class Meta:
@@ -30,6 +41,7 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             user.set_password(password)
             user.save()
+            revoke_user_tokens(user)
 
         return user
 
@@ -57,3 +69,35 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging a refresh token."""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Validate the refresh token and load its active user."""
+        try:
+            user, claims = verify_token(attrs['refresh'], REFRESH)
+        except AuthenticationFailed as exc:
+            raise serializers.ValidationError(
+                {'refresh': [exc.detail]}, code='authorization'
+            )
+
+        attrs['user'] = user
+        return attrs
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    """Serializer for revoking signed tokens."""
+    refresh = serializers.CharField(required=False, trim_whitespace=False)
+    all = serializers.BooleanField(default=False)
+
+    def validate_refresh(self, value):
+        """Return the claims of the refresh token to revoke."""
+        try:
+            user, claims = verify_token(value, REFRESH)
+        except AuthenticationFailed as exc:
+            raise serializers.ValidationError(exc.detail)
+
+        return claims
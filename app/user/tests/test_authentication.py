@@ -0,0 +1,367 @@
+"""
+Tests for stateless signed token authentication.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import tracing
+from core.models import Recipe
+from user.authentication import issue_tokens
+
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    defaults = {'email': 'test@example.com', 'password': 'testpass123'}
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+class SignedTokenTests(TestCase):
+    """Test issuing, using, refreshing and revoking signed tokens."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = create_user(name='Test Name')
+        self.client = APIClient()
+
+    def bearer(self, token):
+        """Authenticate the client with a signed access token."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_create_token_returns_signed_tokens(self):
+        """Test logging in returns access and refresh tokens."""
+        payload = {'email': 'test@example.com', 'password': 'testpass123'}
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+        self.assertIn('access', res.data)
+        self.assertIn('refresh', res.data)
+
+    def test_access_token_authenticates_without_queries(self):
+        """Test a signed token is verified without the database."""
+        self.bearer(issue_tokens(self.user)['access'])
+        self.client.get(RECIPES_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            self.assertNotIn('tokens_revoked_at', query['sql'])
+            self.assertNotIn('authtoken_token', query['sql'])
+            if 'core_user' in query['sql']:
+                # The response cache's version, not auth.
+                self.assertIn('data_version', query['sql'])
+
+    def test_revoke_all_read_from_database_on_cache_miss(self):
+        """Test a missing cache entry falls back to the user row."""
+        self.bearer(issue_tokens(self.user)['access'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPES_URL)
+
+        lookups = [
+            query['sql'] for query in queries.captured_queries
+            if 'tokens_revoked_at' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_user_is_not_a_blank_stub(self):
+        """Test saving the token user keeps the fields it did not load."""
+        self.bearer(issue_tokens(self.user)['access'])
+        res = self.client.get(RECIPES_URL)
+        user = res.wsgi_request.user
+
+        user.name = 'Renamed'
+        user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Renamed')
+        self.assertEqual(self.user.email, 'test@example.com')
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_access_token_scopes_recipes(self):
+        """Test the token user only sees their own recipes."""
+        other = create_user(email='other@example.com')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=Decimal('1')
+        )
+        self.bearer(issue_tokens(self.user)['access'])
+        payload = {'title': 'Mine', 'time_minutes': 1, 'price': '1.00'}
+
+        self.client.post(RECIPES_URL, payload)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            [r['title'] for r in res.data['results']], ['Mine']
+        )
+
+    def test_me_with_access_token(self):
+        """Test the profile endpoint loads the user's fields."""
+        self.bearer(issue_tokens(self.user)['access'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data, {
+            'email': 'test@example.com', 'name': 'Test Name'
+        })
+
+    def test_tampered_token_rejected(self):
+        """Test a token with a bad signature is rejected."""
+        token = issue_tokens(self.user)['access']
+        self.bearer(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB'))
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_not_accepted_as_access(self):
+        """Test a refresh token cannot be used to call the API."""
+        self.bearer(issue_tokens(self.user)['refresh'])
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SIGNED_TOKENS={
+        'ACCESS_LIFETIME': 60,
+        'REFRESH_LIFETIME': 3600,
+        'REVOCATION_CACHE': 'shared',
+    })
+    def test_expired_access_token_rejected(self):
+        """Test an access token stops working after its lifetime."""
+        token = issue_tokens(self.user)['access']
+        self.bearer(token)
+
+        with patch('django.core.signing.time.time',
+                   return_value=time.time() + 120):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_issues_access_token(self):
+        """Test exchanging a refresh token for a new access token."""
+        tokens = issue_tokens(self.user)
+
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.bearer(res.data['access'])
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK
+        )
+
+    def test_refresh_inactive_user_rejected(self):
+        """Test a deactivated user cannot refresh."""
+        tokens = issue_tokens(self.user)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_current_and_refresh_tokens(self):
+        """Test revoking stops both the access and refresh token."""
+        tokens = issue_tokens(self.user)
+        self.bearer(tokens['access'])
+
+        res = self.client.post(REVOKE_URL, {'refresh': tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_all_tokens(self):
+        """Test revoking every token issued to the user."""
+        first = issue_tokens(self.user)
+        second = issue_tokens(self.user)
+        self.bearer(first['access'])
+
+        self.client.post(REVOKE_URL, {'all': True})
+
+        self.bearer(second['access'])
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.bearer(issue_tokens(self.user)['access'])
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK
+        )
+
+    def test_revoke_all_survives_cache_loss(self):
+        """Test revoking every token does not depend on the cache."""
+        tokens = issue_tokens(self.user)
+        self.bearer(tokens['access'])
+
+        self.client.post(REVOKE_URL, {'all': True})
+        caches['shared'].clear()
+
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleted_user_rejected(self):
+        """Test the token of a deleted user stops working."""
+        self.bearer(issue_tokens(self.user)['access'])
+        self.user.delete()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stale_save_keeps_revocation(self):
+        """Test saving a user loaded before a revoke-all keeps it revoked."""
+        tokens = issue_tokens(self.user)
+        stale = get_user_model().objects.get(pk=self.user.pk)
+        self.bearer(tokens['access'])
+        self.client.post(REVOKE_URL, {'all': True})
+
+        stale.name = 'Renamed'
+        stale.save()
+        caches['shared'].clear()
+
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_password_change_revokes_tokens(self):
+        """Test changing the password revokes earlier tokens."""
+        tokens = issue_tokens(self.user)
+        self.bearer(tokens['access'])
+
+        self.client.patch(ME_URL, {'password': 'newpass12345'})
+
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+
+class TracedSignedTokenTests(TestCase):
+    """Test the user views with signed tokens and tracing forced on."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = create_user(name='Test Name')
+        self.client = APIClient()
+        self.tokens = issue_tokens(self.user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}'
+        )
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'traces.jsonl')
+        override = override_settings(TRACING={
+            **settings.TRACING, 'ENABLED': True, 'SAMPLE_RATE': 1,
+            'EXPORTER': 'file', 'FILE': self.path,
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def span_names(self):
+        """Return the span names of every exported trace."""
+        tracing.flush(timeout=10)
+        with open(self.path) as traces:
+            return [
+                span['name']
+                for line in traces
+                for span in json.loads(
+                    line
+                )['resourceSpans'][0]['scopeSpans'][0]['spans']
+            ]
+
+    def test_update_keeps_other_fields(self):
+        """Test updating the profile does not wipe the unchanged fields."""
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'email': 'test@example.com', 'name': 'New Name'
+        })
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'test@example.com')
+        self.assertTrue(self.user.check_password('testpass123'))
+        self.assertIn('authenticate SignedTokenAuthentication',
+                      self.span_names())
+
+    def test_revoke_logs_out_access_token(self):
+        """Test revoking stops the access token the request used."""
+        res = self.client.post(REVOKE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.client.get(ME_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertIn('authenticate SignedTokenAuthentication',
+                      self.span_names())
+
+
+class AuthSchemeBenchmarkTests(TestCase):
+    """Compare the database cost of the two authentication schemes."""
+
+    requests = 20
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = create_user()
+        self.client = APIClient()
+
+    def _run(self, header):
+        """Return the queries and seconds spent on repeated reads."""
+        self.client.credentials(HTTP_AUTHORIZATION=header)
+        caches['responses'].clear()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(self.requests):
+                res = self.client.get(RECIPES_URL, {'page_size': i + 1})
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return len(queries.captured_queries), time.perf_counter() - start
+
+    def test_signed_tokens_need_no_auth_queries(self):
+        """Test signed tokens save one query per authenticated read."""
+        token = Token.objects.create(user=self.user)
+        db_queries, db_seconds = self._run(f'Token {token.key}')
+
+        access = issue_tokens(self.user)['access']
+        signed_queries, signed_seconds = self._run(f'Bearer {access}')
+
+        # Only the first read fills the cached revoke-all time.
+        self.assertEqual(db_queries - signed_queries, self.requests - 1)
+        self.assertGreater(db_seconds, 0)
+        self.assertGreater(signed_seconds, 0)
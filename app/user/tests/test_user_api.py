@@ -1,17 +1,26 @@
 """
 Tests for the user API.
 """
-from django.test import TestCase
+import asyncio
+import concurrent.futures
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import AsyncClient, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core import hashing
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
 
 
 def create_user(**params):
@@ -154,3 +163,82 @@ class PrivateUserAPITest(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class OffloadedHashingApiTests(TestCase):
+    """Test sign-up and login hash outside the request thread."""
+
+    def setUp(self):
+        self.payload = {'email': 'test@example.com', 'password': 'test-123'}
+        self.user = create_user(**self.payload)
+        self.token = Token.objects.create(user=self.user)
+
+    async def test_logins_do_not_block_other_requests(self):
+        """Test other requests complete while logins wait on the workers."""
+        client = AsyncClient()
+        hashes = []
+        all_queued = asyncio.Event()
+
+        def submit(fn, *args):
+            # Stands in for the worker pool: each hash waits until the test
+            # lets it run.
+            future = concurrent.futures.Future()
+            hashes.append((future, fn, args))
+            if len(hashes) == 4:
+                all_queued.set()
+            return future
+
+        with patch.object(hashing, '_submit', submit):
+            logins = [
+                asyncio.ensure_future(client.post(
+                    TOKEN_URL, self.payload, content_type='application/json'
+                ))
+                for _ in range(4)
+            ]
+            await asyncio.wait_for(all_queued.wait(), timeout=10)
+
+            other = await asyncio.wait_for(client.get(
+                RECIPES_URL, authorization=f'Token {self.token.key}'
+            ), timeout=10)
+
+            self.assertEqual(other.status_code, status.HTTP_200_OK)
+            self.assertFalse(any(login.done() for login in logins))
+            for future, fn, args in hashes:
+                future.set_result(fn(*args))
+            responses = await asyncio.gather(*logins)
+
+        for res in responses:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_user_json(self):
+        """Test sign-up through the async path hashes the password."""
+        payload = {
+            'email': 'new@example.com',
+            'password': 'pass12345',
+            'name': 'New',
+        }
+        res = APIClient().post(CREATE_USER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email=payload['email'])
+        self.assertTrue(user.check_password(payload['password']))
+
+    def test_login_wrong_password_json(self):
+        """Test a failed check computed ahead still rejects the login."""
+        payload = {**self.payload, 'password': 'wrong-123'}
+        res = APIClient().post(TOKEN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PASSWORD_HASHING={
+        **settings.PASSWORD_HASHING, 'WORKERS': 1, 'MAX_PENDING': 0,
+    })
+    def test_full_queue_returns_503(self):
+        """Test logins are refused with Retry-After when the pool is full."""
+        for fmt in ('json', 'multipart'):
+            res = APIClient().post(TOKEN_URL, self.payload, format=fmt)
+
+            self.assertEqual(
+                res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            self.assertEqual(res['Retry-After'], '1')
@@ -1,33 +1,220 @@
 """
 Views for the users API.
 """
-from rest_framework import generics, authentication, permissions
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import RequestDataTooBig
+from django.http import JsonResponse
+from django.http.multipartparser import MultiPartParserError
+from rest_framework import generics, authentication, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from core import hashing
+from core.metrics import AUTH_FAILURES
+from core.profiling import ProfiledViewMixin
+from core.tracing import TracedViewMixin
+from user.authentication import (
+    ACCESS,
+    REFRESH,
+    SignedTokenAuthentication,
+    issue_token,
+    issue_tokens,
+    revoke_token,
+    revoke_user_tokens,
+)
 from user.serializers import (
     UserSerializer,
-    AuthTokenSerializer
+    AuthTokenSerializer,
+    RefreshTokenSerializer,
+    RevokeTokenSerializer,
 )
 
 
+def _request_data(request):
+    """Best-effort parse of the body before DRF sees the request."""
+    try:
+        if request.content_type == 'application/json':
+            data = json.loads(request.body)
+            return data if isinstance(data, dict) else {}
+        request.body
+        return request.POST
+    except (ValueError, RequestDataTooBig, MultiPartParserError):
+        return {}
+
+
+def hash_ahead(prehash):
+    """Give a view an async entry point that awaits ``prehash`` first.
+
+    ``prehash`` hashes in the worker pool while the event loop serves other
+    requests, and the view then finds the results in hashing.precomputed
+    instead of blocking the thread shared by sync views.
+    """
+    def decorator(view):
+        sync_view = sync_to_async(view)
+
+        async def wrapper(request, *args, **kwargs):
+            try:
+                memo = await prehash(_request_data(request))
+            except hashing.HashingBusy as exc:
+                return JsonResponse(
+                    {'detail': exc.detail},
+                    status=exc.status_code,
+                    headers={'Retry-After': str(exc.wait)},
+                )
+            token = hashing.precomputed.set(memo)
+            try:
+                return await sync_view(request, *args, **kwargs)
+            finally:
+                hashing.precomputed.reset(token)
+
+        return functools.update_wrapper(wrapper, view)
+
+    return decorator
+
+
+def _stored_password(email):
+    user_model = get_user_model()
+    return user_model._default_manager.filter(
+        **{user_model.USERNAME_FIELD: email}
+    ).values_list('password', flat=True).first()
+
+
+async def _hash_new_password(data):
+    password = data.get('password')
+    serializer = UserSerializer(data=data)
+    if not isinstance(password, str):
+        return {}
+    if not await sync_to_async(serializer.is_valid)():
+        return {}
+
+    return {('make', password): await hashing.amake_password(password)}
+
+
+async def _check_credentials(data):
+    email, password = data.get('email'), data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str):
+        return {}
+    encoded = await sync_to_async(_stored_password)(email.strip())
+    if encoded is None:
+        # ModelBackend hashes anyway for unknown users to hide them.
+        return {('make', password): await hashing.amake_password(password)}
+
+    return {
+        ('check', password, encoded):
+            await hashing.acheck_password(password, encoded),
+    }
+
+
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
 
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return hash_ahead(_hash_new_password)(super().as_view(**initkwargs))
+
 
 class CreateTokenView(ObtainAuthToken):
-    """Create a new auth token for user."""
+    """Create a new auth token for user.
+
+    Besides the stored ``token`` the response carries a short-lived signed
+    ``access`` token and a ``refresh`` token to renew it.
+    """
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return hash_ahead(_check_credentials)(super().as_view(**initkwargs))
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            valid = serializer.is_valid()
+        except hashing.HashingBusy:
+            AUTH_FAILURES.labels('busy').inc()
+            raise
+        if not valid:
+            reason = (
+                'invalid_credentials'
+                if api_settings.NON_FIELD_ERRORS_KEY in serializer.errors
+                else 'invalid_request'
+            )
+            AUTH_FAILURES.labels(reason).inc()
+            raise ValidationError(serializer.errors)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+
+        return Response({'token': token.key, **issue_tokens(user)})
+
+
+class RefreshTokenView(APIView):
+    """Exchange a refresh token for a new access token."""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        return Response({ACCESS: issue_token(user, ACCESS)})
+
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class RevokeTokenView(TracedViewMixin, ProfiledViewMixin, APIView):
+    """Revoke the current access token and optionally others.
+
+    A ``refresh`` token in the body is revoked too, and ``all`` revokes
+    every token issued to the user so far.
+    """
+    serializer_class = RevokeTokenSerializer
+    authentication_classes = [
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    ]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data.get('refresh')
+
+        if isinstance(request.auth, dict):
+            # Signed tokens authenticate with their claims.
+            revoke_token(request.auth, ACCESS)
+        if refresh and refresh['uid'] == request.user.pk:
+            revoke_token(refresh, REFRESH)
+        if serializer.validated_data['all']:
+            revoke_user_tokens(request.user)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(
+    TracedViewMixin, ProfiledViewMixin, generics.RetrieveUpdateAPIView
+):
     """Manage the autenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        SignedTokenAuthentication,
+        authentication.TokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
+        user = self.request.user
+        if user.get_deferred_fields():
+            # Signed tokens load only the fields they check.
+            user = get_user_model().objects.get(pk=user.pk)
+
+        return user